@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class AccountsConfig(AppConfig):
     name = "accounts"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+        from .fragments import forget_user_fragments
+
+        User = self.get_model('User')
+        post_save.connect(forget_user_fragments, sender=User, dispatch_uid='accounts.forget_user_fragments')
+        post_delete.connect(forget_user_fragments, sender=User, dispatch_uid='accounts.forget_user_fragments')
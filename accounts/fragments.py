@@ -0,0 +1,74 @@
+"""
+Memoized representations of users nested in other serializers.
+
+A page of jobs or applications repeats the same few employers and
+workers, and each row would serialize them again. ``UserFragmentMixin``
+keeps the representation of each (serializer, user, updated_at) for the
+rest of the request, so a repeated user costs a dictionary lookup. With
+USER_FRAGMENT_CACHE naming a cache, fragments are also shared between
+requests there, under one key per user that is deleted whenever the user
+is saved; a fragment whose updated_at no longer matches the user's is
+ignored.
+"""
+import zlib
+from django.conf import settings
+from django.core.cache import caches
+
+
+def _shared_cache():
+    return caches[settings.USER_FRAGMENT_CACHE] if settings.USER_FRAGMENT_CACHE else None
+
+
+def _shared_key(user_id):
+    return f'user_fragment:{user_id}'
+
+
+def forget_user_fragments(sender, instance, **kwargs):
+    """Drop a saved or deleted user's shared fragments (post_save/post_delete receiver)"""
+    cache = _shared_cache()
+    if cache is not None:
+        cache.delete(_shared_key(instance.pk))
+
+
+class UserFragmentMixin:
+    """Serializer mixin memoizing a nested user's representation per request and in USER_FRAGMENT_CACHE"""
+
+    def _fragment_label(self):
+        # Changing the serializer's fields changes the label, so old fragments are not reused
+        fields = ','.join(self.Meta.fields)
+        return f'{type(self).__module__}.{type(self).__qualname__}:{zlib.crc32(fields.encode())}'
+
+    def _request_fragments(self):
+        # On the request when there is one, else on the outermost serializer
+        owner = self.context.get('request') or self.root
+        fragments = getattr(owner, '_user_fragments', None)
+        if fragments is None:
+            fragments = {}
+            owner._user_fragments = fragments
+        return fragments
+
+    def to_representation(self, instance):
+        label = self._fragment_label()
+        key = (label, instance.pk, instance.updated_at)
+        fragments = self._request_fragments()
+        data = fragments.get(key)
+        if data is None:
+            data = self._shared_fragment(label, instance)
+            fragments[key] = data
+        # Rows must not share one dict that a view might modify
+        return dict(data)
+
+    def _shared_fragment(self, label, instance):
+        cache = _shared_cache()
+        if cache is None:
+            return super().to_representation(instance)
+        key = _shared_key(instance.pk)
+        updated_at, by_label = cache.get(key) or (None, {})
+        if updated_at != instance.updated_at:
+            by_label = {}
+        data = by_label.get(label)
+        if data is None:
+            data = super().to_representation(instance)
+            by_label[label] = dict(data)
+            cache.set(key, (instance.updated_at, by_label), settings.USER_FRAGMENT_CACHE_TIMEOUT)
+        return data
@@ -1,3 +1,95 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import caches
+from unittest import mock
+from django.test import TestCase, override_settings
+from jobs.models import Job
+from worksite import ratelimit
+from .fragments import _shared_key
+from .models import User
 
-# Create your tests here.
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={'login': {'ip': '10/min'}},
+                   PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginRateLimitTests(TestCase):
+    """Per-IP sliding-window limit on POST /api/auth/login"""
+
+    def setUp(self):
+        caches['ratelimit'].clear()
+        ratelimit._previous_counts.clear()
+        User.objects.create_user(email='worker@example.com', password='secret-pass-1', full_name='Worker',
+                                 role='worker')
+
+    def fail_login(self, **headers):
+        return self.client.post('/api/auth/login', {'email': 'worker@example.com', 'password': 'wrong'},
+                                content_type='application/json', **headers)
+
+    def test_limited_after_ten_attempts(self):
+        for _ in range(10):
+            self.assertEqual(self.fail_login().status_code, 401)
+        response = self.fail_login()
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+
+    def test_forged_forwarded_for_is_ignored(self):
+        for attempt in range(10):
+            self.assertEqual(self.fail_login(HTTP_X_FORWARDED_FOR=f'10.0.0.{attempt}').status_code, 401)
+        self.assertEqual(self.fail_login(HTTP_X_FORWARDED_FOR='10.0.1.1').status_code, 429)
+
+    def test_behind_a_proxy_the_address_it_appended_counts(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            # The proxy appends the real client address after whatever the client sent
+            for attempt in range(10):
+                response = self.fail_login(HTTP_X_FORWARDED_FOR=f'10.0.0.{attempt}, 203.0.113.7')
+                self.assertEqual(response.status_code, 401)
+            self.assertEqual(self.fail_login(HTTP_X_FORWARDED_FOR='10.0.1.1, 203.0.113.7').status_code, 429)
+            self.assertEqual(self.fail_login(HTTP_X_FORWARDED_FOR='203.0.113.8').status_code, 401)
+
+    def test_rejections_are_counted_per_scope_and_rule(self):
+        for _ in range(12):
+            self.fail_login()
+        self.assertEqual(ratelimit.rejection_counts(), {'login': {'ip': 2}})
+        admin = User.objects.create_user(email='admin@example.com', password='x', full_name='Admin', role='admin')
+        self.client.force_login(admin)
+        response = self.client.get('/api/rate-limits')
+        self.assertEqual(response.json(), {'rejections': {'login': {'ip': 2}}})
+
+    def test_views_without_a_scope_skip_the_limiter(self):
+        self.client.force_login(User.objects.get(email='worker@example.com'))
+        with mock.patch.object(ratelimit.SlidingWindowThrottle, 'allow_request', return_value=True) as allow:
+            self.assertEqual(self.client.get('/api/applications/my').status_code, 200)
+            self.assertEqual(self.client.get('/api/auth/status').status_code, 200)
+        allow.assert_not_called()
+
+
+@override_settings(USER_FRAGMENT_CACHE='default')
+class UserFragmentTests(TestCase):
+    """Nested employer blocks shared between requests through USER_FRAGMENT_CACHE"""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        self.employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                                 role='employer', city='Pune')
+        Job.objects.create(employer=self.employer, title='Mason', description='Walls', daily_wage=800,
+                           required_workers=2)
+        self.client.force_login(self.employer)
+
+    def employer_name(self):
+        [job] = self.client.get('/api/jobs/').json()['results']
+        return job['employer']['full_name']
+
+    def test_saving_a_user_drops_their_fragment(self):
+        self.assertEqual(self.employer_name(), 'Employer')
+        self.assertIsNotNone(caches['default'].get(_shared_key(self.employer.pk)))
+
+        self.employer.full_name = 'Renamed'
+        self.employer.save()
+        self.assertIsNone(caches['default'].get(_shared_key(self.employer.pk)))
+        self.assertEqual(self.employer_name(), 'Renamed')
+
+    def test_a_fragment_from_another_version_of_the_user_is_ignored(self):
+        self.assertEqual(self.employer_name(), 'Employer')
+        updated_at, by_label = caches['default'].get(_shared_key(self.employer.pk))
+        stale = {label: dict(data, full_name='Stale') for label, data in by_label.items()}
+        caches['default'].set(_shared_key(self.employer.pk), (updated_at.replace(year=2020), stale))
+        self.assertEqual(self.employer_name(), 'Employer')
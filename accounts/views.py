@@ -1,9 +1,11 @@
 from rest_framework import status, generics, viewsets
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.contrib.auth import authenticate, login, logout, get_user_model
 from django.conf import settings
+from worksite.counting import CountModePagination
+from worksite.ratelimit import scoped
 from .serializers import (
     UserRegistrationSerializer, 
     UserLoginSerializer,
@@ -12,7 +14,6 @@ from .serializers import (
     UserListSerializer
 )
 from .permissions import IsAdmin
-import requests
 from urllib.parse import urlencode
 
 User = get_user_model()
@@ -20,6 +21,7 @@ User = get_user_model()
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([scoped('register')])
 def register_view(request):
     """Register a new user with email and password"""
     serializer = UserRegistrationSerializer(data=request.data)
@@ -34,6 +36,7 @@ def register_view(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([scoped('login')])
 def login_view(request):
     """Login user with email and password"""
     serializer = UserLoginSerializer(data=request.data)
@@ -88,6 +91,9 @@ def google_auth_initiate(request):
 @permission_classes([AllowAny])
 def google_auth_callback(request):
     """Handle Google OAuth callback"""
+    # requests (and urllib3) is only needed here; importing it lazily keeps it out of worker cold starts
+    import requests
+    
     code = request.GET.get('code')
     
     if not code:
@@ -201,6 +207,7 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserListSerializer
     permission_classes = [IsAdmin]
+    pagination_class = CountModePagination
     
     def destroy(self, request, *args, **kwargs):
         """Delete a user"""
@@ -1,16 +1,77 @@
 from django.contrib import admin
-from .models import Job, Application
+from django.contrib.auth import get_user_model
+from worksite.admin_perf import PerformanceModeAdmin
+from worksite.sharding import PRIMARY, is_sharded, locate, on_shard, select_users, shards, use_shard
+from .models import Job, Application, ArchivedJob, ArchivedApplication
+
+User = get_user_model()
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """The shard whose rows are listed; a change list reads one database"""
+    title = 'shard'
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        return [(alias, alias) for alias in shards()]
+
+    def choices(self, changelist):
+        current = self.value() if self.value() in shards() else PRIMARY
+        for alias, title in self.lookup_choices:
+            yield {
+                'selected': alias == current,
+                'query_string': changelist.get_query_string({self.parameter_name: alias}),
+                'display': title,
+            }
+
+    def queryset(self, request, queryset):
+        return on_shard(queryset, self.value() if self.value() in shards() else PRIMARY)
+
+
+class ShardedAdmin(PerformanceModeAdmin):
+    """Admin for a model stored on the city shards; objects are opened on the shard holding them"""
+
+    # Relations into users: joined on one database, prefetched from default across shards
+    user_select_related = ()
+
+    def get_queryset(self, request):
+        return select_users(super().get_queryset(request), *self.user_select_related)
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        return [ShardListFilter, *list_filter] if is_sharded() else list_filter
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        lookup = self.indexed_search.get('email')
+        if is_sharded() and lookup and '@' in term:
+            # Users are not on the shards: find the user on default first
+            relation = lookup.rsplit('__', 1)[0]
+            users = list(User.objects.filter(email=term).values_list('pk', flat=True))
+            return queryset.filter(**{f'{relation}__in': users}), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        with use_shard(locate(self.model, object_id)):
+            return super().change_view(request, object_id, form_url, extra_context)
+
+    def delete_view(self, request, object_id, extra_context=None):
+        with use_shard(locate(self.model, object_id)):
+            return super().delete_view(request, object_id, extra_context)
 
 
 @admin.register(Job)
-class JobAdmin(admin.ModelAdmin):
+class JobAdmin(ShardedAdmin):
     """Admin interface for Job model"""
     list_display = ('title', 'employer', 'daily_wage', 'required_workers', 
                    'filled_slots', 'status', 'created_at')
     list_filter = ('status', 'created_at')
+    list_select_related = ()
+    user_select_related = ('employer',)
     search_fields = ('title', 'description', 'employer__full_name', 'employer__email')
+    indexed_search = {'email': 'employer__email', 'text': 'title__startswith'}
     ordering = ('-created_at',)
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('expires_at', 'created_at', 'updated_at')
     
     fieldsets = (
         ('Job Details', {
@@ -19,6 +80,9 @@ class JobAdmin(admin.ModelAdmin):
         ('Capacity', {
             'fields': ('required_workers', 'filled_slots', 'status')
         }),
+        ('Schedule', {
+            'fields': ('start_date', 'end_date', 'application_deadline', 'expires_at')
+        }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
             'classes': ('collapse',)
@@ -27,11 +91,15 @@ class JobAdmin(admin.ModelAdmin):
 
 
 @admin.register(Application)
-class ApplicationAdmin(admin.ModelAdmin):
+class ApplicationAdmin(ShardedAdmin):
     """Admin interface for Application model"""
     list_display = ('worker', 'job', 'status', 'applied_at')
     list_filter = ('status', 'applied_at')
+    # job's __str__ reads its employer
+    list_select_related = ('job',)
+    user_select_related = ('worker', 'job__employer')
     search_fields = ('worker__full_name', 'worker__email', 'job__title')
+    indexed_search = {'email': 'worker__email', 'text': 'job__title__startswith'}
     ordering = ('-applied_at',)
     readonly_fields = ('applied_at', 'updated_at')
     
@@ -44,3 +112,38 @@ class ApplicationAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(ArchivedJob)
+class ArchivedJobAdmin(PerformanceModeAdmin):
+    """Read-only admin for archived jobs"""
+    list_display = ('title', 'employer', 'daily_wage', 'required_workers',
+                   'filled_slots', 'created_at', 'archived_at')
+    list_filter = ('archived_at',)
+    list_select_related = ('employer',)
+    search_fields = ('title', 'employer__full_name', 'employer__email')
+    indexed_search = {'email': 'employer__email', 'text': 'title__startswith'}
+    ordering = ('-created_at',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedApplication)
+class ArchivedApplicationAdmin(PerformanceModeAdmin):
+    """Read-only admin for applications of archived jobs"""
+    list_display = ('worker', 'job', 'status', 'applied_at')
+    list_filter = ('status',)
+    list_select_related = ('worker', 'job__employer')
+    search_fields = ('worker__full_name', 'worker__email', 'job__title')
+    indexed_search = {'email': 'worker__email', 'text': 'job__title__startswith'}
+    ordering = ('-applied_at',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class JobsConfig(AppConfig):
     name = "jobs"
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.models.signals import post_save, pre_delete
+        from .shards import delete_user_rows, restamp_employer_city
+
+        pre_delete.connect(delete_user_rows, sender=settings.AUTH_USER_MODEL, dispatch_uid='jobs.delete_user_rows')
+        post_save.connect(restamp_employer_city, sender=settings.AUTH_USER_MODEL,
+                          dispatch_uid='jobs.restamp_employer_city')
@@ -0,0 +1,106 @@
+"""
+Hot/cold storage for jobs.
+
+Jobs closed for a while are moved, with their applications, from the hot
+``jobs``/``applications`` tables into ``jobs_archive``/``applications_archive``.
+Rows keep their ids, so links and history stay valid. With city shards
+the archive is on default and each shard is archived in turn; the copy
+commits before the shard's rows are deleted, and a chunk that is copied
+twice after a crash in between is simply not inserted again.
+``CombinedListing`` lets list endpoints read both tables (or several
+shards) as one ordered, paginated sequence.
+"""
+import heapq
+from itertools import islice
+from django.db import transaction
+from django.utils import timezone
+from worksite.sharding import PRIMARY, use_shard
+from .models import Job, Application, ArchivedJob, ArchivedApplication
+from .dashboard import invalidate_dashboard
+
+JOB_FIELDS = [field.attname for field in Job._meta.concrete_fields]
+APPLICATION_FIELDS = [field.attname for field in Application._meta.concrete_fields]
+
+
+def archive_chunk(closed_before, chunk_size=500, shard=PRIMARY):
+    """
+    Move up to chunk_size jobs closed before closed_before, whose
+    applications have also settled since, from shard into the archive.
+    Returns (jobs, applications) moved.
+    """
+    with transaction.atomic(using=shard), transaction.atomic(), use_shard(shard):
+        job_ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status='closed', updated_at__lt=closed_before)
+            .exclude(applications__updated_at__gte=closed_before)
+            .order_by('updated_at')
+            .values_list('id', flat=True)[:chunk_size]
+        )
+        if not job_ids:
+            return 0, 0
+
+        now = timezone.now()
+        ArchivedJob.objects.bulk_create([
+            ArchivedJob(archived_at=now, **row)
+            for row in Job.objects.filter(pk__in=job_ids).values(*JOB_FIELDS)
+        ], batch_size=1000, ignore_conflicts=shard != PRIMARY)
+
+        applications = Application.objects.filter(job_id__in=job_ids)
+        ArchivedApplication.objects.bulk_create(
+            (ArchivedApplication(**row) for row in applications.values(*APPLICATION_FIELDS).iterator()),
+            batch_size=1000, ignore_conflicts=shard != PRIMARY,
+        )
+        moved_applications, _ = applications.delete()
+        jobs = Job.objects.filter(pk__in=job_ids)
+        # Pending applications on these jobs leave the employers' totals
+        invalidate_dashboard(*set(jobs.values_list('employer_id', flat=True)))
+        jobs.delete()
+    return len(job_ids), moved_applications
+
+
+class CombinedListing:
+    """
+    Read-only merge of querysets that are each ordered by the same field,
+    descending. Supports what the paginator needs: count() and slicing.
+    """
+
+    def __init__(self, querysets, field):
+        self.querysets = querysets
+        self.field = field
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        # Merge only (key, pk) pairs; the first `stop` entries of the merge
+        # come from the first `stop` entries of each part
+        stop = index.stop
+        keyed = []
+        for part, queryset in enumerate(self.querysets):
+            pairs = queryset.values_list(self.field, 'pk')
+            if stop is not None:
+                pairs = pairs[:stop]
+            keyed.append(_tagged(pairs, part))
+        merged = heapq.merge(*keyed, key=lambda entry: entry[0], reverse=True)
+        wanted = list(islice(merged, stop))[index.start:stop:index.step]
+
+        # Then load the full rows for just this slice
+        rows = {}
+        for part, queryset in enumerate(self.querysets):
+            pks = [pk for _, entry_part, pk in wanted if entry_part == part]
+            if pks:
+                rows.update(((part, obj.pk), obj) for obj in queryset.filter(pk__in=pks))
+        return [rows[(part, pk)] for _, part, pk in wanted]
+
+
+def _tagged(pairs, part):
+    for key, pk in pairs:
+        yield key, part, pk
@@ -0,0 +1,60 @@
+"""
+Job listing sizes per (status, city) for ``?count=estimated``.
+
+The JobCount rows are kept up as jobs change, in the transaction on
+default that makes the change (``JobCount.add``): ``Job.save`` moves a
+job between counters when it is posted, fills or changes status, and the
+bulk insert, expiry sweep, reopening ``.update()`` calls, deletes and an
+employer's city change adjust them by the jobs they touch. Closed jobs
+count in the hot and archive tables together, so archiving moves nothing.
+
+``refresh_job_counts`` reconciles them with one grouped query per table
+(and shard), catching what the writes above miss (admin deletes, raw
+SQL). Open jobs past their expiry count as open until the expiry sweep
+closes them, although listings already hide them, so the numbers are
+reported as estimates. Counters the command has not refreshed for
+JOB_COUNTS_MAX_AGE_MINUTES are ignored.
+"""
+from collections import Counter
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from worksite.sharding import fan_out
+from .models import ArchivedJob, Job, JobCount
+
+
+def tally(queryset):
+    """queryset's jobs per (status, city), as JobCount keys"""
+    counts = Counter()
+    for status, city, jobs in queryset.order_by().values_list('status', 'city').annotate(jobs=Count('pk')):
+        counts[status, city or ''] += jobs
+    return counts
+
+
+def refresh_job_counts():
+    """Recount jobs per (status, city); returns the number of rows written"""
+    counts = Counter()
+    for queryset in (*fan_out(Job.objects.all()), ArchivedJob.objects.all()):
+        counts.update(tally(queryset))
+
+    now = timezone.now()
+    with transaction.atomic():
+        JobCount.objects.all().delete()
+        JobCount.objects.bulk_create(
+            JobCount(status=status, city=city, jobs=jobs, refreshed_at=now)
+            for (status, city), jobs in counts.items()
+        )
+    return len(counts)
+
+
+def counted_jobs(status, city=None):
+    """Listed jobs with status (in city) per the counters, or None without fresh counters"""
+    fresh = timezone.now() - timedelta(minutes=settings.JOB_COUNTS_MAX_AGE_MINUTES)
+    by_city = dict(JobCount.objects.filter(status=status, refreshed_at__gte=fresh).values_list('city', 'jobs'))
+    if not by_city:
+        return None
+    if city:
+        return by_city.get(city, 0)
+    return sum(by_city.values())
@@ -0,0 +1,111 @@
+"""
+Employer dashboard rollups.
+
+One grouped query over the employer's jobs (pending applications come
+from a correlated count on the (job, status) index) and their archived
+jobs, glued together with UNION ALL; with city shards the other shards
+get one query each and the rows are added up. Time to fill runs from
+created_at to filled_at, which is stamped when the last slot is taken,
+so later edits and the expiry sweep (both bump updated_at) leave it be. The result is cached per employer until a hiring
+write for that employer commits, or DASHBOARD_CACHE_TIMEOUT expires.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, DurationField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from worksite.sharding import fan_out
+from .models import Job, Application, ArchivedJob
+
+# A job counts as filled when it closed with every slot taken
+FILLED = Q(filled_slots__gte=F('required_workers'))
+
+FIELDS = ('open_jobs', 'closed_jobs', 'slots', 'slots_filled', 'pending_applications',
+          'filled_jobs', 'fill_time', 'wage_commitment')
+
+
+def _total(values):
+    """Sum of the values that are not None, or None if there are none"""
+    values = [value for value in values if value is not None]
+    return sum(values[1:], values[0]) if values else None
+
+
+def cache_key(employer_id):
+    return f'employer-dashboard:{employer_id}'
+
+
+def compute_dashboard(employer_id):
+    """Totals for one employer, hot and archived jobs together"""
+    pending = (Application.objects.filter(job=OuterRef('pk'), status='pending')
+               .values('job').annotate(count=Count('*')).values('count'))
+    filled = FILLED & Q(status='closed', filled_at__isnull=False)
+    time_to_fill = Sum(F('filled_at') - F('created_at'), filter=filled, output_field=DurationField())
+    hot = [
+        jobs.order_by().annotate(pending=Coalesce(Subquery(pending), 0)).values('employer_id').annotate(
+            open_jobs=Count('id', filter=Q(status='open')),
+            closed_jobs=Count('id', filter=Q(status='closed')),
+            slots=Sum('required_workers'),
+            slots_filled=Sum('filled_slots'),
+            pending_applications=Sum('pending'),
+            filled_jobs=Count('id', filter=filled),
+            fill_time=time_to_fill,
+            wage_commitment=Sum(F('daily_wage') * F('filled_slots')),
+        )
+        for jobs in fan_out(Job.objects.filter(employer_id=employer_id))
+    ]
+    # Same columns in the same order, so the archive rides along with the
+    # first (default) shard's query as a UNION ALL
+    archived = ArchivedJob.objects.using(hot[0].db).filter(employer_id=employer_id).order_by().values(
+        'employer_id'
+    ).annotate(
+        open_jobs=Value(0),
+        closed_jobs=Count('id'),
+        slots=Sum('required_workers'),
+        slots_filled=Sum('filled_slots'),
+        pending_applications=Value(0),
+        filled_jobs=Count('id', filter=FILLED & Q(filled_at__isnull=False)),
+        fill_time=Sum(F('filled_at') - F('created_at'), filter=FILLED & Q(filled_at__isnull=False),
+                      output_field=DurationField()),
+        wage_commitment=Value(Decimal(0), output_field=DecimalField()),
+    )
+    rows = list(hot[0].union(archived, all=True)) + [row for jobs in hot[1:] for row in jobs]
+    totals = {key: _total(row[key] for row in rows) for key in FIELDS}
+
+    required = totals['slots'] or 0
+    filled = totals['slots_filled'] or 0
+    filled_jobs = totals['filled_jobs'] or 0
+    fill_time = totals['fill_time'] or timedelta()
+    wage_commitment = totals['wage_commitment'] or Decimal(0)
+    return {
+        'open_jobs': totals['open_jobs'] or 0,
+        'closed_jobs': totals['closed_jobs'] or 0,
+        'required_workers': required,
+        'filled_slots': filled,
+        'fill_rate': round(filled / required, 4) if required else None,
+        'pending_applications': totals['pending_applications'] or 0,
+        'filled_jobs': filled_jobs,
+        'average_time_to_fill_hours': (
+            round(fill_time.total_seconds() / filled_jobs / 3600, 2) if filled_jobs else None
+        ),
+        # Daily wages owed to everyone hired on jobs not yet archived
+        'daily_wage_commitment': str(wage_commitment.quantize(Decimal('0.01'))),
+        'generated_at': timezone.now().isoformat(),
+    }
+
+
+def get_dashboard(employer_id):
+    key = cache_key(employer_id)
+    dashboard = cache.get(key)
+    if dashboard is None:
+        dashboard = compute_dashboard(employer_id)
+        cache.set(key, dashboard, settings.DASHBOARD_CACHE_TIMEOUT)
+    return dashboard
+
+
+def invalidate_dashboard(*employer_ids):
+    """Drop cached dashboards once the current transaction commits"""
+    keys = [cache_key(employer_id) for employer_id in employer_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,119 @@
+"""
+Live job and application events for ``GET /api/events`` (server-sent events).
+
+An in-process hub fans events out to the event streams open in this
+process. Write paths call ``job_changed`` / ``application_changed`` inside
+their transaction; the event is published once it commits, and only
+costs a query when someone is watching that job.
+
+Each stream holds one bounded queue. A client that falls behind by more
+than EVENTS_QUEUE_SIZE events gets a single ``resync`` event, telling it
+to refetch, instead of an ever-growing backlog.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from django.db import transaction
+from worksite.sharding import on_shard, shard_of
+
+JOB_FIELDS = ('id', 'filled_slots', 'required_workers', 'status')
+
+# Event that replaces a backlog the client could not keep up with
+RESYNC = b'event: resync\ndata: {}\n\n'
+
+
+def encode(kind, data):
+    """One SSE message, encoded once and shared by every subscriber"""
+    return f'event: {kind}\ndata: {json.dumps(data, default=str)}\n\n'.encode()
+
+
+class Subscription:
+    """A stream's queue of encoded events; lives on the stream's event loop"""
+
+    def __init__(self, channels, maxsize):
+        self.channels = channels
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def deliver(self, message):
+        if self.queue.full():
+            # Drop the backlog rather than grow without bound
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = RESYNC
+        self.queue.put_nowait(message)
+
+
+class EventHub:
+    """Channel -> subscriptions; publish is safe from any thread"""
+
+    def __init__(self):
+        self._channels = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channels, maxsize):
+        subscription = Subscription(channels, maxsize)
+        with self._lock:
+            for channel in channels:
+                self._channels[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._channels[channel]
+
+    def has_subscribers(self, channel):
+        return channel in self._channels
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+            except RuntimeError:  # the stream's loop has shut down
+                self.unsubscribe(subscription)
+
+
+hub = EventHub()
+
+
+def job_channel(job_id):
+    return f'job:{job_id}'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def job_changed(job):
+    """Publish the job's current slots and status to its watchers after commit"""
+    model, job_id, shard = type(job), job.pk, shard_of(job)
+
+    def publish():
+        channel = job_channel(job_id)
+        if not hub.has_subscribers(channel):
+            return
+        # Read after commit: callers often changed the row with an F() update
+        data = on_shard(model.objects.filter(pk=job_id), shard).values(*JOB_FIELDS).first()
+        if data is not None:
+            hub.publish(channel, encode('job', data))
+
+    transaction.on_commit(publish)
+
+
+def application_changed(application, status=None):
+    """Publish an application's status (or `status`, e.g. 'removed') to its worker after commit"""
+    channel = user_channel(application.worker_id)
+    message = encode('application', {
+        'id': application.pk,
+        'job_id': application.job_id,
+        'status': status or application.status,
+    })
+    transaction.on_commit(lambda: hub.publish(channel, message))
@@ -0,0 +1,47 @@
+"""
+Closing jobs past their application deadline or end date.
+
+``Job.expires_at`` is derived from the schedule on save. Open listings
+already hide expired jobs (``unexpired()``); ``close_expired_chunk`` then
+closes them for good in bounded batches, found through the
+(status, expires_at) index, with one set-based UPDATE per batch, one
+shard at a time.
+
+In the same transaction as each batch, the jobs leave every
+recommendation list (one DELETE through the job index), move from the
+open to the closed JobCount of their city, and their watchers get a
+``job`` event once it commits, as when an employer closes a job.
+"""
+from collections import Counter
+from django.utils import timezone
+from worksite.sharding import PRIMARY, shard_transaction
+from notifications.outbox import enqueue_jobs_closed
+from .dashboard import invalidate_dashboard
+from .events import job_changed
+from .models import Job, JobCount
+from .recommendations import withdraw_jobs
+
+
+def close_expired_chunk(now=None, chunk_size=500, shard=PRIMARY):
+    """Close up to chunk_size open jobs on shard that expired by now; returns how many were closed"""
+    now = now or timezone.now()
+    with shard_transaction(shard):
+        expired = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status='open', expires_at__lte=now)
+            .order_by('expires_at')
+            .only('id', 'employer_id', 'city')[:chunk_size]
+        )
+        if not expired:
+            return 0
+        job_ids = [job.pk for job in expired]
+        Job.objects.filter(pk__in=job_ids).update(status='closed', updated_at=now)
+        closed = Counter(job.city or '' for job in expired)
+        JobCount.add({**{('open', city): -jobs for city, jobs in closed.items()},
+                      **{('closed', city): jobs for city, jobs in closed.items()}})
+        withdraw_jobs(job_ids)
+        enqueue_jobs_closed(job_ids)
+        for job in expired:
+            job_changed(job)
+        invalidate_dashboard(*{job.employer_id for job in expired})
+    return len(job_ids)
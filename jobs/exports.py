@@ -0,0 +1,169 @@
+"""
+Streaming exports of jobs, applications and users.
+
+Rows are read in primary key order with ``iterator(chunk_size=...)`` (a
+server-side cursor on PostgreSQL), so the database never sorts or
+materializes the result and memory stays flat however many rows there
+are. Output is CSV or NDJSON, written in batches of CHUNK_SIZE rows;
+the CSV header goes out before the query runs. With city shards, jobs
+and applications are read one shard after another, and the user names
+they cannot join to there are looked up on default once per batch.
+Used by ``GET /api/exports/<dataset>.<format>`` and ``manage.py export_data``.
+"""
+import csv
+import io
+import json
+from collections import namedtuple
+from itertools import islice
+from django.contrib.auth import get_user_model
+from worksite.sharding import fan_out, is_sharded, is_sharded_model
+from .models import Job, Application
+
+User = get_user_model()
+
+# Rows per database fetch and per streamed write
+CHUNK_SIZE = 2000
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# columns: (header, lookup) pairs read with values_list
+# filters: query parameter -> lookup; the job filters match JobViewSet
+Dataset = namedtuple('Dataset', 'model columns filters')
+
+# Columns from the users table: lookup -> (user id column, user field)
+USER_COLUMNS = {
+    'employer__full_name': ('employer_id', 'full_name'),
+    'worker__full_name': ('worker_id', 'full_name'),
+}
+
+DATASETS = {
+    'jobs': Dataset(
+        Job,
+        [
+            ('id', 'id'),
+            ('title', 'title'),
+            ('description', 'description'),
+            ('daily_wage', 'daily_wage'),
+            ('required_workers', 'required_workers'),
+            ('filled_slots', 'filled_slots'),
+            ('status', 'status'),
+            ('start_date', 'start_date'),
+            ('end_date', 'end_date'),
+            ('application_deadline', 'application_deadline'),
+            ('employer_id', 'employer_id'),
+            ('employer_name', 'employer__full_name'),
+            ('city', 'city'),
+            ('created_at', 'created_at'),
+            ('updated_at', 'updated_at'),
+        ],
+        {'status': 'status', 'city': 'city', 'employer': 'employer_id'},
+    ),
+    'applications': Dataset(
+        Application,
+        [
+            ('id', 'id'),
+            ('job_id', 'job_id'),
+            ('job_title', 'job__title'),
+            ('employer_id', 'job__employer_id'),
+            ('worker_id', 'worker_id'),
+            ('worker_name', 'worker__full_name'),
+            ('status', 'status'),
+            ('applied_at', 'applied_at'),
+            ('updated_at', 'updated_at'),
+        ],
+        {
+            'status': 'status',
+            'job': 'job_id',
+            'worker': 'worker_id',
+            'employer': 'job__employer_id',
+            'city': 'job__city',
+        },
+    ),
+    'users': Dataset(
+        User,
+        [
+            ('id', 'id'),
+            ('email', 'email'),
+            ('full_name', 'full_name'),
+            ('role', 'role'),
+            ('city', 'city'),
+            ('oauth_provider', 'oauth_provider'),
+            ('is_active', 'is_active'),
+            ('created_at', 'created_at'),
+        ],
+        {'role': 'role', 'city': 'city'},
+    ),
+}
+
+
+def export_rows(name, params):
+    """Rows of a dataset filtered by params, as tuples; raises ValueError on bad input"""
+    if name not in DATASETS:
+        raise ValueError(f"Unknown dataset '{name}'; choose from {', '.join(DATASETS)}")
+    dataset = DATASETS[name]
+    queryset = dataset.model.objects.all()
+    for param, lookup in dataset.filters.items():
+        value = params.get(param)
+        if not value:
+            continue
+        if lookup.endswith('_id') and not value.isdigit():
+            raise ValueError(f'{param} must be an id')
+        queryset = queryset.filter(**{lookup: value})
+    lookups = [lookup for _, lookup in dataset.columns]
+    if not (is_sharded() and is_sharded_model(dataset.model)):
+        return queryset.order_by('pk').values_list(*lookups).iterator(chunk_size=CHUNK_SIZE)
+    # Shard by shard, in primary key order within each
+    local = [USER_COLUMNS[lookup][0] if lookup in USER_COLUMNS else lookup for lookup in lookups]
+    return _with_user_columns(
+        (row for shard in fan_out(queryset.order_by('pk').values_list(*local))
+         for row in shard.iterator(chunk_size=CHUNK_SIZE)),
+        lookups,
+    )
+
+
+def _with_user_columns(rows, lookups):
+    """Replace user ids with the USER_COLUMNS values, one users query per batch and column"""
+    columns = [(index, USER_COLUMNS[lookup][1]) for index, lookup in enumerate(lookups) if lookup in USER_COLUMNS]
+    for batch in _batches(rows):
+        batch = [list(row) for row in batch]
+        for index, field in columns:
+            values = dict(User.objects.filter(pk__in={row[index] for row in batch}).values_list('pk', field))
+            for row in batch:
+                row[index] = values.get(row[index])
+        yield from batch
+
+
+def _batches(rows):
+    rows = iter(rows)
+    while batch := list(islice(rows, CHUNK_SIZE)):
+        yield batch
+
+
+def stream_csv(headers, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    yield buffer.getvalue()
+    for batch in _batches(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def stream_ndjson(headers, rows):
+    # Decimals and datetimes go out as strings, as in the CSV
+    for batch in _batches(rows):
+        yield ''.join(json.dumps(dict(zip(headers, row)), default=str) + '\n' for row in batch)
+
+
+def stream_export(name, fmt, params):
+    """Chunks of text for a whole export; the query runs lazily as it is consumed"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'; choose from {', '.join(FORMATS)}")
+    rows = export_rows(name, params)
+    headers = [header for header, _ in DATASETS[name].columns]
+    return stream_csv(headers, rows) if fmt == 'csv' else stream_ndjson(headers, rows)
@@ -0,0 +1,155 @@
+"""
+Application status history.
+
+Every transition is appended to ``application_status_events`` and never
+updated. Rows carry their month bucket, so reports only touch the months
+they ask for and old months can be dropped wholesale.
+"""
+import math
+from datetime import date, timezone as dt_timezone
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import ApplicationStatusEvent
+
+PARTITION_PREFIX = 'application_status_events_'
+DEFAULT_PARTITION = 'application_status_events_default'
+
+
+def month_start(moment):
+    """First day of the UTC month containing moment"""
+    return moment.astimezone(dt_timezone.utc).date().replace(day=1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def record_transitions(transitions):
+    """
+    Append one event per (application, from_status, to_status) in a single
+    INSERT. Call it inside the transaction that changes the applications.
+    """
+    now = timezone.now()
+    month = month_start(now)
+    events = []
+    for application, from_status, to_status in transitions:
+        decision_seconds = None
+        if from_status == 'pending' and to_status in ('accepted', 'rejected'):
+            decision_seconds = max(0, int((now - application.applied_at).total_seconds()))
+        events.append(ApplicationStatusEvent(
+            application_id=application.pk,
+            job_id=application.job_id,
+            worker_id=application.worker_id,
+            from_status=from_status,
+            to_status=to_status,
+            applied_at=application.applied_at,
+            occurred_at=now,
+            decision_seconds=decision_seconds,
+            month=month,
+        ))
+    ApplicationStatusEvent.objects.bulk_create(events)
+
+
+def record_transition(application, from_status, to_status):
+    record_transitions([(application, from_status, to_status)])
+
+
+def decision_time_percentiles(month, percentiles=(50, 90, 99)):
+    """
+    Time-to-decision percentiles (seconds) for one month bucket.
+
+    Each percentile walks the month's (month, decision_seconds) index up to
+    its rank (an OFFSET), so neither the applications table nor other months
+    are read.
+    """
+    decisions = (ApplicationStatusEvent.objects
+                 .filter(month=month, decision_seconds__isnull=False)
+                 .order_by('decision_seconds')
+                 .values_list('decision_seconds', flat=True))
+    count = decisions.count()
+    result = {'month': month, 'decisions': count}
+    for pct in percentiles:
+        if not count:
+            result[f'p{pct}'] = None
+            continue
+        offset = max(1, math.ceil(pct / 100.0 * count)) - 1
+        result[f'p{pct}'] = decisions[offset]
+    return result
+
+
+def existing_partitions():
+    """Month partitions that exist on PostgreSQL, keyed by month"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [ApplicationStatusEvent._meta.db_table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in names:
+        suffix = name[len(PARTITION_PREFIX):]
+        if name.startswith(PARTITION_PREFIX) and len(suffix) == 7 and suffix[4] == '_':
+            partitions[date(int(suffix[:4]), int(suffix[5:]), 1)] = name
+    return partitions
+
+
+def create_partition(month):
+    """
+    Create the PostgreSQL partition for a month if it doesn't exist yet.
+
+    Rows for the month may already sit in the DEFAULT partition (written
+    before the partition was created), and PostgreSQL refuses to create a
+    partition whose range the DEFAULT one holds rows for. In that case the
+    DEFAULT partition is detached, the month's rows are moved into the new
+    partition, and it is attached again, all in one transaction.
+    """
+    name = f'{PARTITION_PREFIX}{month:%Y_%m}'
+    table = ApplicationStatusEvent._meta.db_table
+    quote = connection.ops.quote_name
+    bounds = [month.isoformat(), add_months(month, 1).isoformat()]
+    in_month = 'month >= %s AND month < %s'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [name])
+        if cursor.fetchone()[0]:
+            return name
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {quote(DEFAULT_PARTITION)} WHERE {in_month})', bounds)
+        stranded = cursor.fetchone()[0]
+        if stranded:
+            cursor.execute(f'ALTER TABLE {quote(table)} DETACH PARTITION {quote(DEFAULT_PARTITION)}')
+        cursor.execute(
+            f"CREATE TABLE {quote(name)} PARTITION OF {quote(table)} "
+            f"FOR VALUES FROM ('{bounds[0]}') TO ('{bounds[1]}')"
+        )
+        if stranded:
+            cursor.execute(
+                f'INSERT INTO {quote(name)} SELECT * FROM {quote(DEFAULT_PARTITION)} WHERE {in_month}', bounds
+            )
+            cursor.execute(f'DELETE FROM {quote(DEFAULT_PARTITION)} WHERE {in_month}', bounds)
+            cursor.execute(f'ALTER TABLE {quote(table)} ATTACH PARTITION {quote(DEFAULT_PARTITION)} DEFAULT')
+    return name
+
+
+def drop_months_before(cutoff):
+    """Discard history older than the cutoff month; returns what was dropped"""
+    if connection.vendor == 'postgresql':
+        dropped = []
+        with connection.cursor() as cursor:
+            for month, name in sorted(existing_partitions().items()):
+                if month < cutoff:
+                    cursor.execute(f'DROP TABLE {connection.ops.quote_name(name)}')
+                    dropped.append(name)
+            # Months that never got a partition of their own
+            cursor.execute(
+                f'DELETE FROM {connection.ops.quote_name(DEFAULT_PARTITION)} WHERE month < %s', [cutoff.isoformat()]
+            )
+            if cursor.rowcount:
+                dropped.append(f'{cursor.rowcount} rows of {DEFAULT_PARTITION}')
+        return dropped
+    deleted, _ = ApplicationStatusEvent.objects.filter(month__lt=cutoff).delete()
+    return [f'{deleted} rows'] if deleted else []
@@ -0,0 +1,148 @@
+"""
+``Idempotency-Key`` support for the hiring write endpoints.
+
+A request carrying the header first claims (user, key) by inserting an
+IdempotencyKey row in a transaction of its own, so the claim never waits
+on (or holds locks for) the view's work. The view then runs in a second
+transaction that also stores the response in the row. A retry of a
+finished request is answered from that row alone, with no job or
+application locks. A duplicate that arrives while the first is still
+running, or that cannot claim the key because the database is busy,
+polls the row (on the primary) for up to IDEMPOTENCY_WAIT_SECONDS and
+then replays the first request's response, or runs itself if the first
+one released the key. Only if the wait runs out does it get 409 with
+``Retry-After``.
+
+5xx responses, exceptions and database lock errors release the key, so
+the client can retry them for real. A claim left without a response for
+CLAIM_TIMEOUT (its process died mid-request) is taken over. Rows expire
+after IDEMPOTENCY_KEY_TTL_HOURS and are deleted by
+``manage.py clear_idempotency_keys``.
+"""
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from worksite.db_router import PRIMARY
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# A claim still without a response after this is abandoned
+CLAIM_TIMEOUT = timedelta(minutes=5)
+RETRY_AFTER_SECONDS = 1
+# Seconds between looks at an in-flight duplicate's row: doubling, up to the maximum
+FIRST_POLL = 0.05
+MAX_POLL = 0.5
+# _try_claim when the key could not be read or claimed right now
+BUSY = object()
+
+
+def fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{payload}'.encode()).hexdigest()
+
+
+def _replay(record, request_fingerprint):
+    if record.fingerprint != request_fingerprint:
+        return Response({
+            'error': f'{HEADER} was already used for a different request'
+        }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    return Response(record.response_body, status=record.response_status, headers={'Idempotent-Replayed': 'true'})
+
+
+def _busy(message):
+    return Response({'error': message}, status=status.HTTP_409_CONFLICT,
+                    headers={'Retry-After': str(RETRY_AFTER_SECONDS)})
+
+
+def _claim(request, key, request_fingerprint, now):
+    """The key's existing row, or None once this request holds a new claim on it"""
+    # From the primary: a replica may not have the row, or its response, yet
+    record = IdempotencyKey.objects.using(PRIMARY).filter(user=request.user, key=key).first()
+    if record is not None:
+        abandoned = record.response_status is None and record.created_at <= now - CLAIM_TIMEOUT
+        if record.expires_at > now and not abandoned:
+            return record
+        IdempotencyKey.objects.filter(pk=record.pk).delete()
+    with transaction.atomic():
+        IdempotencyKey.objects.create(
+            user=request.user,
+            key=key,
+            fingerprint=request_fingerprint,
+            expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+        )
+    return None
+
+
+def _try_claim(request, key, request_fingerprint):
+    """_claim, or BUSY when a duplicate claimed the key since the lookup or the database is locked"""
+    try:
+        return _claim(request, key, request_fingerprint, timezone.now())
+    except (IntegrityError, OperationalError):
+        return BUSY
+
+
+def _release(request, key):
+    IdempotencyKey.objects.filter(user=request.user, key=key, response_status__isnull=True).delete()
+
+
+def idempotent(view):
+    """Honour an Idempotency-Key header on a view; the key is scoped to the user"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        request = next(arg for arg in args if isinstance(arg, Request))
+        key = request.headers.get(HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({
+                'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        request_fingerprint = fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        delay = FIRST_POLL
+        while True:
+            record = _try_claim(request, key, request_fingerprint)
+            if record is None:
+                break
+            if record is not BUSY and (record.response_status is not None
+                                       or record.fingerprint != request_fingerprint):
+                return _replay(record, request_fingerprint)
+            # In flight elsewhere, or the database is busy: wait for the outcome
+            if time.monotonic() + delay > deadline:
+                return _busy(f'A request with this {HEADER} is still in progress; retry it')
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_POLL)
+
+        try:
+            with transaction.atomic():
+                response = view(*args, **kwargs)
+                if response.status_code >= 500:
+                    transaction.set_rollback(True)
+                else:
+                    IdempotencyKey.objects.filter(user=request.user, key=key).update(
+                        response_status=response.status_code,
+                        response_body=response.data,
+                    )
+        except OperationalError:
+            _release(request, key)
+            return _busy(f'The database was busy; retry the request with this {HEADER}')
+        except BaseException:
+            _release(request, key)
+            raise
+        if response.status_code >= 500:
+            # Release the key, along with whatever the view did
+            _release(request, key)
+        return response
+
+    return wrapper
@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from jobs.archive import archive_chunk
+from worksite.sharding import shards
+
+
+class Command(BaseCommand):
+    help = 'Move long-closed jobs and their applications into the archive tables, in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.JOB_ARCHIVE_AFTER_DAYS,
+                            help='Archive jobs closed more than this many days ago')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Jobs moved per transaction')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between chunks to spread the write load')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--days and --chunk-size must be positive')
+
+        closed_before = timezone.now() - timedelta(days=options['days'])
+        total_jobs = total_applications = 0
+        for shard in shards():
+            while True:
+                jobs, applications = archive_chunk(closed_before, options['chunk_size'], shard)
+                if not jobs:
+                    break
+                total_jobs += jobs
+                total_applications += applications
+                self.stdout.write(f'Archived {jobs} jobs, {applications} applications')
+                if options['pause']:
+                    time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {total_jobs} jobs and {total_applications} applications '
+            f'closed before {closed_before:%Y-%m-%d}'
+        ))
@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from jobs.expiry import close_expired_chunk
+from worksite.sharding import shards
+
+
+class Command(BaseCommand):
+    help = 'Close open jobs past their application deadline or end date, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Jobs closed per transaction')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between chunks to spread the write load')
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between sweeps when idle')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        while True:
+            total = 0
+            for shard in shards():
+                while True:
+                    closed = close_expired_chunk(chunk_size=options['chunk_size'], shard=shard)
+                    total += closed
+                    if closed < options['chunk_size']:
+                        break
+                    if options['pause']:
+                        time.sleep(options['pause'])
+            if total or not options['loop']:
+                self.stdout.write(f'Closed {total} expired jobs')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
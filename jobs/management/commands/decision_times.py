@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from jobs.history import add_months, decision_time_percentiles, month_start
+
+
+class Command(BaseCommand):
+    help = 'Report how long workers wait for an accept/reject decision, per month'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=3, help='Number of recent months to report')
+
+    def handle(self, *args, **options):
+        current = month_start(timezone.now())
+        self.stdout.write(f"{'month':<8} {'decisions':>10} {'p50':>10} {'p90':>10} {'p99':>10}")
+        for offset in range(options['months'] - 1, -1, -1):
+            row = decision_time_percentiles(add_months(current, -offset))
+            self.stdout.write(
+                f"{row['month']:%Y-%m} {row['decisions']:>10} "
+                f"{self._format(row['p50']):>10} {self._format(row['p90']):>10} {self._format(row['p99']):>10}"
+            )
+
+    def _format(self, seconds):
+        if seconds is None:
+            return '-'
+        if seconds < 3600:
+            return f'{seconds / 60:.1f}m'
+        if seconds < 86400:
+            return f'{seconds / 3600:.1f}h'
+        return f'{seconds / 86400:.1f}d'
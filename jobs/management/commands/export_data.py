@@ -0,0 +1,38 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from jobs.exports import DATASETS, FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream a dataset (jobs, applications, users) as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=DATASETS)
+        parser.add_argument('--format', dest='fmt', choices=FORMATS, default='csv')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+        parser.add_argument('--filter', action='append', default=[], metavar='NAME=VALUE',
+                            help='Same filters as the export endpoint, e.g. status=open; repeatable')
+
+    def handle(self, *args, **options):
+        params = {}
+        for item in options['filter']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f"--filter expects NAME=VALUE, got '{item}'")
+            params[name] = value
+        unknown = set(params) - set(DATASETS[options['dataset']].filters)
+        if unknown:
+            raise CommandError(f"Unknown filter(s) for {options['dataset']}: {', '.join(sorted(unknown))}")
+
+        try:
+            chunks = stream_export(options['dataset'], options['fmt'], params)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as handle:
+                handle.writelines(chunks)
+            self.stderr.write(f"Wrote {options['dataset']} to {options['output']}")
+        else:
+            # Not self.stdout: it would append a newline to every chunk
+            sys.stdout.writelines(chunks)
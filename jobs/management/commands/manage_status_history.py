@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from jobs.history import add_months, create_partition, drop_months_before, month_start
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly status-history partitions and drop months past retention'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--create-ahead', type=int, default=3,
+                            help='Months of partitions to keep ready after the current one (PostgreSQL)')
+        parser.add_argument('--retain-months', type=int, default=None,
+                            help='Drop history older than this many months')
+
+    def handle(self, *args, **options):
+        current = month_start(timezone.now())
+
+        if connection.vendor == 'postgresql':
+            for offset in range(options['create_ahead'] + 1):
+                month = add_months(current, offset)
+                try:
+                    with transaction.atomic():
+                        name = create_partition(month)
+                except DatabaseError as e:
+                    # e.g. a lock timeout while moving the month's rows out of DEFAULT
+                    self.stdout.write(self.style.WARNING(f'Could not create partition for {month:%Y-%m}: {e}'))
+                    continue
+                self.stdout.write(f'Partition {name} ready')
+
+        if options['retain_months'] is not None:
+            cutoff = add_months(current, -options['retain_months'])
+            dropped = drop_months_before(cutoff)
+            if dropped:
+                self.stdout.write(f"Dropped history before {cutoff:%Y-%m}: {', '.join(dropped)}")
+            else:
+                self.stdout.write(f'No history before {cutoff:%Y-%m}')
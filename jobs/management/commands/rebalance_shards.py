@@ -0,0 +1,43 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from jobs.models import Job
+from jobs.shards import misplaced_cities, move_chunk
+from worksite.sharding import shards
+
+
+class Command(BaseCommand):
+    help = 'Move jobs and their applications to the shard their city maps to, in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Jobs moved per transaction')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between chunks to spread the write load')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would move')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        total_jobs = total_applications = 0
+        for source in shards():
+            for city, target in misplaced_cities(source).items():
+                if options['dry_run']:
+                    jobs = Job.objects.using(source).filter(city=city).count()
+                    self.stdout.write(f'{city or "(no city)"}: {jobs} jobs {source} -> {target}')
+                    total_jobs += jobs
+                    continue
+                while True:
+                    jobs, applications = move_chunk(city, source, target, options['chunk_size'])
+                    if not jobs:
+                        break
+                    total_jobs += jobs
+                    total_applications += applications
+                    self.stdout.write(f'{city or "(no city)"}: moved {jobs} jobs, {applications} applications '
+                                      f'{source} -> {target}')
+                    if options['pause']:
+                        time.sleep(options['pause'])
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'{total_jobs} jobs would move'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Moved {total_jobs} jobs and {total_applications} applications'))
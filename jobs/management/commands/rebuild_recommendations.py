@@ -0,0 +1,63 @@
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from jobs.recommendations import open_candidates, rebuild_for_workers, run_queued
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Recompute every worker's preferences and recommended-jobs list, or do the queued recommendation work"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Workers rebuilt per transaction')
+        parser.add_argument('--worker', type=int, action='append', dest='workers',
+                            help='Only rebuild this worker (repeatable)')
+        parser.add_argument('--queued', action='store_true',
+                            help='Score queued new jobs and build queued workers\' lists instead')
+        parser.add_argument('--loop', action='store_true', help='With --queued, keep polling the queue')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls when idle')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+        if options['queued']:
+            return self.run_queued(options)
+
+        workers = User.objects.filter(role='worker').order_by('pk')
+        if options['workers']:
+            workers = workers.filter(pk__in=options['workers'])
+
+        started = time.perf_counter()
+        candidates = open_candidates()
+        total_workers = total_recommendations = 0
+        last_pk = 0
+        while True:
+            batch = list(workers.filter(pk__gt=last_pk)[:options['batch_size']])
+            if not batch:
+                break
+            with transaction.atomic():
+                total_recommendations += rebuild_for_workers(batch, candidates)
+            total_workers += len(batch)
+            last_pk = batch[-1].pk
+            self.stdout.write(f'{total_workers} workers rebuilt')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {total_recommendations} recommendations for {total_workers} workers '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def run_queued(self, options):
+        while True:
+            total = 0
+            while True:
+                done = run_queued(options['batch_size'])
+                total += done
+                if done < options['batch_size']:
+                    break
+            if total or not options['loop']:
+                self.stdout.write(f'Did {total} queued recommendation tasks')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
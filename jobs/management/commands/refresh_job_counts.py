@@ -0,0 +1,19 @@
+import time
+from django.core.management.base import BaseCommand
+from jobs.counts import refresh_job_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount jobs per (status, city), correcting drift in the counters job writes keep up'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep refreshing')
+        parser.add_argument('--interval', type=float, default=300.0, help='Seconds between refreshes')
+
+    def handle(self, *args, **options):
+        while True:
+            rows = refresh_job_counts()
+            if not options['loop']:
+                self.stdout.write(f'Refreshed {rows} job counts')
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,33 @@
+from django.apps import apps
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Max
+from jobs.models import Job, Application
+from jobs.shards import relax_foreign_keys
+from worksite.sharding import PRIMARY, is_sharded, reserve_ids, shards
+
+
+class Command(BaseCommand):
+    help = ('Migrate every city shard, drop the foreign key constraints that cross shards and move the id '
+            'sequences on default past the ids found on them')
+
+    def handle(self, *args, **options):
+        if not is_sharded():
+            self.stdout.write('No shards configured (DB_SHARDS); nothing to do')
+            return
+        for shard in shards():
+            if shard != PRIMARY:
+                self.stdout.write(f'Migrating {shard}')
+                call_command('migrate', database=shard, interactive=False, verbosity=options['verbosity'])
+        # Also for databases migrated before DB_SHARDS was set
+        for shard in shards():
+            with connections[shard].schema_editor() as schema_editor:
+                relax_foreign_keys(apps, schema_editor)
+
+        # New rows on any shard take their ids from default's sequences
+        for model in (Job, Application):
+            top = max(model._base_manager.using(shard).aggregate(top=Max('pk'))['top'] or 0 for shard in shards())
+            reserve_ids(model, top)
+            self.stdout.write(f'{model._meta.db_table}: new ids start after {top}')
+        self.stdout.write(self.style.SUCCESS(f"Shards ready: {', '.join(shards())}"))
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:22
+
+from django.db import migrations, models
+
+
+# On PostgreSQL the history is a range-partitioned table (one partition per
+# month, created by `manage.py manage_status_history`) with a DEFAULT
+# partition so inserts never fail. Other backends get a plain table that is
+# bucketed by the indexed month column.
+POSTGRES_CREATE = [
+    """
+    CREATE TABLE application_status_events (
+        id bigint GENERATED BY DEFAULT AS IDENTITY,
+        application_id bigint NOT NULL,
+        job_id bigint NOT NULL,
+        worker_id bigint NOT NULL,
+        from_status varchar(10) NULL,
+        to_status varchar(10) NOT NULL,
+        applied_at timestamp with time zone NOT NULL,
+        occurred_at timestamp with time zone NOT NULL,
+        decision_seconds integer NULL CHECK (decision_seconds >= 0),
+        month date NOT NULL,
+        PRIMARY KEY (id, month)
+    ) PARTITION BY RANGE (month)
+    """,
+    "CREATE TABLE application_status_events_default PARTITION OF application_status_events DEFAULT",
+    "CREATE INDEX status_events_decision_idx ON application_status_events (month, decision_seconds)",
+    "CREATE INDEX status_events_app_idx ON application_status_events (application_id)",
+]
+
+
+def create_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in POSTGRES_CREATE:
+            schema_editor.execute(sql)
+    else:
+        schema_editor.create_model(apps.get_model('jobs', 'ApplicationStatusEvent'))
+
+
+def drop_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE application_status_events CASCADE')
+    else:
+        schema_editor.delete_model(apps.get_model('jobs', 'ApplicationStatusEvent'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ApplicationStatusEvent',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('application_id', models.BigIntegerField()),
+                        ('job_id', models.BigIntegerField()),
+                        ('worker_id', models.BigIntegerField()),
+                        ('from_status', models.CharField(blank=True, max_length=10, null=True)),
+                        ('to_status', models.CharField(max_length=10)),
+                        ('applied_at', models.DateTimeField()),
+                        ('occurred_at', models.DateTimeField()),
+                        ('decision_seconds', models.PositiveIntegerField(blank=True, null=True)),
+                        ('month', models.DateField()),
+                    ],
+                    options={
+                        'db_table': 'application_status_events',
+                        'ordering': ['occurred_at'],
+                        'indexes': [models.Index(fields=['month', 'decision_seconds'], name='status_events_decision_idx'), models.Index(fields=['application_id'], name='status_events_app_idx')],
+                    },
+                ),
+            ],
+        ),
+        migrations.RunPython(create_table, drop_table),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0002_application_status_events'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedJob',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('daily_wage', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('required_workers', models.PositiveIntegerField()),
+                ('filled_slots', models.PositiveIntegerField(default=0)),
+                ('status', models.CharField(choices=[('open', 'Open'), ('closed', 'Closed')], default='closed', max_length=10)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('employer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'jobs_archive',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedApplication',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('accepted', 'Accepted'), ('rejected', 'Rejected')], max_length=10)),
+                ('applied_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_applications', to=settings.AUTH_USER_MODEL)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='applications', to='jobs.archivedjob')),
+            ],
+            options={
+                'db_table': 'applications_archive',
+                'ordering': ['-applied_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedjob',
+            index=models.Index(fields=['created_at'], name='jobs_archiv_created_922992_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedjob',
+            index=models.Index(fields=['employer'], name='jobs_archiv_employe_00a3b1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedapplication',
+            index=models.Index(fields=['worker', 'applied_at'], name='application_worker__c41331_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('jobs', '0003_job_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerPreference',
+            fields=[
+                ('worker', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='job_preference', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('city', models.CharField(blank=True, db_index=True, max_length=100, null=True)),
+                ('top_city', models.CharField(blank=True, db_index=True, max_length=100, null=True)),
+                ('city_shares', models.JSONField(default=dict)),
+                ('preferred_wage', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('applied_employers', models.JSONField(default=list)),
+                ('accepted_employers', models.JSONField(default=list)),
+                ('score_floor', models.PositiveSmallIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'worker_preferences',
+            },
+        ),
+        migrations.CreateModel(
+            name='JobRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveSmallIntegerField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='jobs.job')),
+                ('worker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='job_recommendations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'job_recommendations',
+                'indexes': [models.Index(fields=['worker', '-score', '-job'], name='job_recs_feed_idx')],
+                'unique_together': {('worker', 'job')},
+            },
+        ),
+    ]
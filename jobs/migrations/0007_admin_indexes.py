@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0006_idempotency_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['applied_at'], name='applications_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedapplication',
+            index=models.Index(fields=['applied_at'], name='apps_archive_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedjob',
+            index=models.Index(fields=['title'], name='jobs_archive_title_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['created_at'], name='jobs_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['title'], name='jobs_title_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
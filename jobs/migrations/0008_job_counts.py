@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0007_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('open', 'Open'), ('closed', 'Closed')], max_length=10)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('jobs', models.PositiveIntegerField()),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'job_counts',
+                'unique_together': {('status', 'city')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:29
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from jobs.shards import relax_foreign_keys
+
+
+def copy_employer_city(apps, schema_editor):
+    """One set-based UPDATE per table: each job takes its employer's current city"""
+    using = schema_editor.connection.alias
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    city = Subquery(User.objects.filter(pk=OuterRef('employer_id')).values('city')[:1])
+    for name in ('Job', 'ArchivedJob'):
+        apps.get_model('jobs', name).objects.using(using).update(city=city)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0008_job_counts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedjob',
+            name='city',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='city',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True),
+        ),
+        migrations.RunPython(copy_employer_city, migrations.RunPython.noop),
+        # Only with DB_SHARDS set: constraints of foreign keys that cross databases
+        migrations.RunPython(relax_foreign_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['city', 'status', 'created_at'], name='jobs_city_idx'),
+        ),
+    ]
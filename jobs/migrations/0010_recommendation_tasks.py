@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0009_job_city'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('job', 'Score a posted or reopened job'), ('worker', "Build a worker's list")], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'recommendation_tasks',
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:15
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def estimate_filled_at(apps, schema_editor):
+    """Best guess for jobs filled before the column existed: their last update"""
+    using = schema_editor.connection.alias
+    apps.get_model('jobs', 'Job').objects.using(using).filter(
+        status='closed', filled_slots__gte=F('required_workers')
+    ).update(filled_at=F('updated_at'))
+    apps.get_model('jobs', 'ArchivedJob').objects.using(using).filter(
+        filled_slots__gte=F('required_workers')
+    ).update(filled_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0010_recommendation_tasks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedjob',
+            name='filled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='filled_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(estimate_filled_at, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,18 @@
-from django.db import models
+from datetime import datetime, time, timedelta
+from django.db import models, transaction
+from django.db.models import F, Max, Q
+from django.db.models.functions import Greatest
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from worksite.sharding import allocate_ids, is_sharded, shard_for_city, shard_of
+from .events import job_changed
+
+
+def unexpired(prefix=''):
+    """Q for jobs still taking applications; compares expires_at as stored, so its index applies"""
+    return Q(**{f'{prefix}expires_at__isnull': True}) | Q(**{f'{prefix}expires_at__gt': timezone.now()})
 
 
 class Job(models.Model):
@@ -11,6 +23,8 @@ class Job(models.Model):
         ('closed', 'Closed'),
     )
     
+    # With city shards the database constraint is dropped on the shards
+    # (jobs.shards.relax_foreign_keys): the employer stays on default
     employer = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -23,22 +37,66 @@ class Job(models.Model):
     required_workers = models.PositiveIntegerField()
     filled_slots = models.PositiveIntegerField(default=0)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
+    # The employer's city (kept in step by restamp_employer_city): where it is listed, and the shard key
+    city = models.CharField(max_length=100, null=True, blank=True, editable=False)
+    # Optional schedule
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    application_deadline = models.DateTimeField(null=True, blank=True)
+    # When the job stops taking applications: derived from the schedule on save
+    expires_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # When the last slot was taken (cleared if one is freed): the end of time-to-fill
+    filled_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.title} - {self.employer.full_name}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        job = super().from_db(db, field_names, values)
+        # The JobCount row this job is counted in, to move it on save
+        if 'status' in job.__dict__ and 'city' in job.__dict__:
+            job._counted = (job.status, job.city or '')
+        return job
+    
     def clean(self):
         """Validate that filled_slots doesn't exceed required_workers"""
         if self.filled_slots > self.required_workers:
             raise ValidationError('Filled slots cannot exceed required workers')
     
+    def compute_expiry(self):
+        """The application deadline or the end of the last working day, whichever is sooner"""
+        candidates = []
+        if self.application_deadline:
+            candidates.append(self.application_deadline)
+        if self.end_date:
+            candidates.append(timezone.make_aware(datetime.combine(self.end_date + timedelta(days=1), time.min)))
+        return min(candidates) if candidates else None
+    
     def save(self, *args, **kwargs):
         """Auto-close job if all slots are filled"""
         if self.filled_slots >= self.required_workers:
             self.status = 'closed'
-        super().save(*args, **kwargs)
+            if self.filled_at is None:
+                self.filled_at = timezone.now()
+        self.expires_at = self.compute_expiry()
+        if self._state.adding:
+            if self.city is None:
+                self.city = self.employer.city
+            if self.pk is None and is_sharded():
+                # Manager.create() passes the default database; new jobs go to their city's shard
+                self.pk = allocate_ids(Job)[0]
+                kwargs.update(force_insert=True, using=shard_for_city(self.city))
+        # Counted as before unless this is a new job or one loaded without its status
+        counted = None if self._state.adding else getattr(self, '_counted', (self.status, self.city or ''))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._counted = (self.status, self.city or '')
+            if counted != self._counted:
+                JobCount.add({self._counted: 1, **({counted: -1} if counted else {})})
+        job_changed(self)
     
     @property
     def available_slots(self):
@@ -51,6 +109,12 @@ class Job(models.Model):
         indexes = [
             models.Index(fields=['status', 'created_at']),
             models.Index(fields=['employer']),
+            models.Index(fields=['status', 'expires_at'], name='jobs_expiry_idx'),
+            # Admin change list: default ordering and title prefix search
+            models.Index(fields=['created_at'], name='jobs_created_idx'),
+            models.Index(fields=['title'], name='jobs_title_prefix_idx', opclasses=['varchar_pattern_ops']),
+            # Listings by city, newest first
+            models.Index(fields=['city', 'status', 'created_at'], name='jobs_city_idx'),
         ]
 
 
@@ -64,6 +128,7 @@ class Application(models.Model):
     )
     
     job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='applications')
+    # Stored on the job's shard, apart from the worker (no constraint there)
     worker = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -77,6 +142,13 @@ class Application(models.Model):
     def __str__(self):
         return f"{self.worker.full_name} -> {self.job.title} ({self.status})"
     
+    def save(self, *args, **kwargs):
+        """Take an id unique across shards for a new application"""
+        if self._state.adding and self.pk is None and is_sharded():
+            self.pk = allocate_ids(Application)[0]
+            kwargs.update(force_insert=True, using=shard_of(self.job))
+        super().save(*args, **kwargs)
+    
     class Meta:
         db_table = 'applications'
         ordering = ['-applied_at']
@@ -84,4 +156,233 @@ class Application(models.Model):
         indexes = [
             models.Index(fields=['job', 'status']),
             models.Index(fields=['worker', 'status']),
+            models.Index(fields=['applied_at'], name='applications_applied_idx'),
+        ]
+
+
+class ApplicationStatusEvent(models.Model):
+    """Append-only log of application status transitions, bucketed by month"""
+    
+    # Plain ids rather than foreign keys: the history outlives removed
+    # applications and never takes part in joins with the hot tables
+    application_id = models.BigIntegerField()
+    job_id = models.BigIntegerField()
+    worker_id = models.BigIntegerField()
+    from_status = models.CharField(max_length=10, null=True, blank=True)
+    to_status = models.CharField(max_length=10)
+    applied_at = models.DateTimeField()
+    occurred_at = models.DateTimeField()
+    # Seconds from applying to the first accept/reject, null for other events
+    decision_seconds = models.PositiveIntegerField(null=True, blank=True)
+    # First day of the (UTC) month; the partition key on PostgreSQL
+    month = models.DateField()
+    
+    def __str__(self):
+        return f"Application {self.application_id}: {self.from_status} -> {self.to_status}"
+    
+    class Meta:
+        db_table = 'application_status_events'
+        ordering = ['occurred_at']
+        indexes = [
+            models.Index(fields=['month', 'decision_seconds'], name='status_events_decision_idx'),
+            models.Index(fields=['application_id'], name='status_events_app_idx'),
+        ]
+
+
+class ArchivedJob(models.Model):
+    """Closed job moved out of the hot jobs table; keeps its original id"""
+    
+    id = models.BigIntegerField(primary_key=True)
+    employer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_jobs'
+    )
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    daily_wage = models.DecimalField(max_digits=10, decimal_places=2)
+    required_workers = models.PositiveIntegerField()
+    filled_slots = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=Job.STATUS_CHOICES, default='closed')
+    city = models.CharField(max_length=100, null=True, blank=True)
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    application_deadline = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    filled_at = models.DateTimeField(null=True, blank=True)
+    # Copied verbatim from the hot row, so no auto_now here
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.title} - {self.employer.full_name} (archived)"
+    
+    @property
+    def available_slots(self):
+        """Return number of available slots"""
+        return self.required_workers - self.filled_slots
+    
+    class Meta:
+        db_table = 'jobs_archive'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['employer']),
+            models.Index(fields=['title'], name='jobs_archive_title_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+
+class ArchivedApplication(models.Model):
+    """Application of an archived job; keeps its original id"""
+    
+    id = models.BigIntegerField(primary_key=True)
+    job = models.ForeignKey(ArchivedJob, on_delete=models.CASCADE, related_name='applications')
+    worker = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_applications'
+    )
+    status = models.CharField(max_length=10, choices=Application.STATUS_CHOICES)
+    applied_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.worker.full_name} -> {self.job.title} ({self.status}, archived)"
+    
+    class Meta:
+        db_table = 'applications_archive'
+        ordering = ['-applied_at']
+        indexes = [
+            models.Index(fields=['worker', 'applied_at']),
+            models.Index(fields=['applied_at'], name='apps_archive_applied_idx'),
+        ]
+
+
+class WorkerPreference(models.Model):
+    """What a worker's application history says they look for; input to recommendations"""
+    
+    worker = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='job_preference'
+    )
+    city = models.CharField(max_length=100, null=True, blank=True, db_index=True)
+    # City the worker applies to most; with city, decides who sees a new job
+    top_city = models.CharField(max_length=100, null=True, blank=True, db_index=True)
+    # {city: share of past applications} for the most applied-to cities
+    city_shares = models.JSONField(default=dict)
+    # Average wage applied for, accepted jobs weighted higher
+    preferred_wage = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    applied_employers = models.JSONField(default=list)
+    accepted_employers = models.JSONField(default=list)
+    # Lowest stored score once the worker has a full list; new jobs must beat it
+    score_floor = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Preferences of user {self.worker_id}"
+    
+    class Meta:
+        db_table = 'worker_preferences'
+
+
+class JobRecommendation(models.Model):
+    """Precomputed ranking of open jobs for a worker"""
+    
+    worker = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='job_recommendations'
+    )
+    # With city shards jobs may be on another database (no constraint then)
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='recommendations')
+    score = models.PositiveSmallIntegerField()
+    
+    def __str__(self):
+        return f"Job {self.job_id} for user {self.worker_id} ({self.score})"
+    
+    class Meta:
+        db_table = 'job_recommendations'
+        unique_together = [['worker', 'job']]
+        indexes = [
+            models.Index(fields=['worker', '-score', '-job'], name='job_recs_feed_idx'),
         ]
+
+
+class RecommendationTask(models.Model):
+    """Recommendation work queued by a request, done by rebuild_recommendations --queued"""
+    
+    KIND_CHOICES = (
+        ('job', 'Score a posted or reopened job'),
+        ('worker', "Build a worker's list"),
+    )
+    
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # A job (on any shard) or worker id
+    object_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id}"
+    
+    class Meta:
+        db_table = 'recommendation_tasks'
+        unique_together = [['kind', 'object_id']]
+
+
+class JobCount(models.Model):
+    """Number of jobs per (status, city), kept up by job writes and reconciled by refresh_job_counts"""
+    
+    status = models.CharField(max_length=10, choices=Job.STATUS_CHOICES)
+    # Job's city; blank for jobs without one
+    city = models.CharField(max_length=100, blank=True)
+    jobs = models.PositiveIntegerField()
+    refreshed_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.status} in {self.city or '-'}: {self.jobs}"
+    
+    @classmethod
+    def add(cls, changes):
+        """
+        Add {(status, city): jobs} to the counters in the current transaction
+        on default; a no-op until refresh_job_counts has counted once.
+        """
+        for (status, city), jobs in changes.items():
+            if not jobs or cls.objects.filter(status=status, city=city).update(jobs=Greatest(F('jobs') + jobs, 0)):
+                continue
+            refreshed_at = cls.objects.aggregate(latest=Max('refreshed_at'))['latest']
+            if jobs < 0 or refreshed_at is None:
+                continue
+            # A city's first job since the last refresh
+            row, created = cls.objects.get_or_create(status=status, city=city,
+                                                     defaults={'jobs': jobs, 'refreshed_at': refreshed_at})
+            if not created:
+                cls.objects.filter(pk=row.pk).update(jobs=F('jobs') + jobs)
+    
+    class Meta:
+        db_table = 'job_counts'
+        unique_together = [['status', 'city']]
+
+
+class IdempotencyKey(models.Model):
+    """Outcome of a hiring write sent with an Idempotency-Key header, replayed to retries"""
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    key = models.CharField(max_length=255)
+    # Hash of method, path and body: the key may not be reused for another request
+    fingerprint = models.CharField(max_length=64)
+    # Empty until the first request finishes
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"{self.key} for user {self.user_id} ({self.response_status})"
+    
+    class Meta:
+        db_table = 'idempotency_keys'
+        unique_together = [['user', 'key']]
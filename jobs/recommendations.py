@@ -0,0 +1,337 @@
+"""
+Recommended jobs for workers.
+
+Each worker has a compact preference row (home city, where they apply,
+wages they go for, employers they know) and a top-N list of scored open
+jobs in ``job_recommendations``. Serving the feed is one lookup on the
+(worker, score) index. The lists are rebuilt in batches by
+``rebuild_recommendations`` and kept current in between:
+
+- ``recommend_jobs`` scores newly posted or reopened jobs for the workers
+  likely to want them. It reads every preference row in the job's city,
+  so requests only queue the jobs (``queue_jobs``, a RecommendationTask
+  row committed with the change) and ``run_queued`` scores them later
+- a worker without a list yet is queued the same way (``queue_worker``)
+  and served an empty feed until it is built
+- ``withdraw_job``/``withdraw_jobs`` drop jobs that closed
+- ``forget_recommendation`` drops a job the worker has applied to
+
+With city shards the lists stay on default while the jobs are spread
+out, so the feed checks a worker's listed jobs on each shard instead of
+joining to them.
+"""
+import heapq
+from collections import Counter, defaultdict, namedtuple
+from decimal import Decimal
+from itertools import islice
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+from worksite.sharding import fan_out, is_sharded, on_shard, select_users, shard_for_city, shard_of
+from .models import (
+    Job, Application, ArchivedApplication, WorkerPreference, JobRecommendation, RecommendationTask, unexpired,
+)
+
+# Score weights (a score fits in a PositiveSmallIntegerField)
+HOME_CITY = 40
+CITY_HISTORY = 25
+ACCEPTED_EMPLOYER = 20
+APPLIED_EMPLOYER = 8
+WAGE = 15
+# Wages this far above the preferred wage earn the full wage score
+WAGE_CEILING = 1.25
+ACCEPTED_WEIGHT = 3
+TOP_CITIES = 3
+
+# The job and preference fields scoring needs, in a form cheap to hold and compare
+Candidate = namedtuple('Candidate', 'id employer_id city wage created_at')
+Profile = namedtuple('Profile', 'city city_shares wage applied_employers accepted_employers')
+
+
+def profile(preference):
+    return Profile(
+        preference.city,
+        preference.city_shares,
+        float(preference.preferred_wage) if preference.preferred_wage else None,
+        set(preference.applied_employers),
+        set(preference.accepted_employers),
+    )
+
+
+def score(candidate, profile):
+    """Rank a job for a worker; higher is better"""
+    total = 0
+    if candidate.city and candidate.city == profile.city:
+        total += HOME_CITY
+    total += round(CITY_HISTORY * profile.city_shares.get(candidate.city, 0))
+    if candidate.employer_id in profile.accepted_employers:
+        total += ACCEPTED_EMPLOYER
+    elif candidate.employer_id in profile.applied_employers:
+        total += APPLIED_EMPLOYER
+    if profile.wage:
+        total += round(WAGE * min(candidate.wage / profile.wage, WAGE_CEILING) / WAGE_CEILING)
+    return total
+
+
+def build_preferences(workers):
+    """Unsaved WorkerPreference rows for the workers, from hot and archived applications"""
+    history = defaultdict(list)
+    for queryset in (*fan_out(Application.objects.all()), ArchivedApplication.objects.all()):
+        rows = (queryset.filter(worker__in=[worker.pk for worker in workers])
+                .values_list('worker_id', 'status', 'job__daily_wage', 'job__employer_id', 'job__city'))
+        for worker_id, status, wage, employer_id, city in rows.iterator():
+            history[worker_id].append((status, wage, employer_id, city))
+
+    preferences = []
+    for worker in workers:
+        cities = Counter()
+        applied, accepted = set(), set()
+        wage_total, wage_weight = Decimal(0), 0
+        for status, wage, employer_id, city in history.get(worker.pk, []):
+            weight = ACCEPTED_WEIGHT if status == 'accepted' else 1
+            if city:
+                cities[city] += weight
+            wage_total += wage * weight
+            wage_weight += weight
+            applied.add(employer_id)
+            if status == 'accepted':
+                accepted.add(employer_id)
+        total = sum(cities.values())
+        preferences.append(WorkerPreference(
+            worker=worker,
+            city=worker.city,
+            top_city=cities.most_common(1)[0][0] if cities else worker.city,
+            city_shares={city: count / total for city, count in cities.most_common(TOP_CITIES)},
+            preferred_wage=(wage_total / wage_weight).quantize(Decimal('0.01')) if wage_weight else None,
+            applied_employers=sorted(applied),
+            accepted_employers=sorted(accepted),
+        ))
+    return preferences
+
+
+def _rank(job_score, candidate):
+    """Sort key: score, then higher wage, then newer"""
+    return job_score, candidate.wage, candidate.created_at, candidate.id
+
+
+def open_candidates(cities=None, employers=(), per_city=None):
+    """
+    Open jobs with free slots, by employer and by city: every one, or only
+    the per_city best paid in each of cities plus those of employers. Each
+    city's list is sorted by wage (then newest first): within one city only
+    the wage part of a score varies for jobs from unknown employers, so a
+    worker's best such jobs there are always at the head of the list.
+    """
+    open_jobs = Job.objects.filter(unexpired(), status='open', filled_slots__lt=F('required_workers'))
+    if cities is None:
+        querysets = fan_out(open_jobs)
+    else:
+        querysets = [
+            on_shard(open_jobs.filter(city=city), shard_for_city(city))
+            .order_by('-daily_wage', '-created_at', '-id')[:per_city]
+            for city in cities if city
+        ]
+        if employers:
+            querysets += fan_out(open_jobs.filter(employer_id__in=employers))
+
+    by_city, by_employer = defaultdict(list), defaultdict(list)
+    seen = set()
+    for jobs in querysets:
+        jobs = jobs.values_list('id', 'employer_id', 'city', 'daily_wage', 'created_at')
+        for job_id, employer_id, city, wage, created_at in jobs.iterator():
+            if job_id in seen:
+                continue
+            seen.add(job_id)
+            candidate = Candidate(job_id, employer_id, city, float(wage), created_at)
+            by_city[city].append(candidate)
+            by_employer[employer_id].append(candidate)
+    for candidates in by_city.values():
+        candidates.sort(key=lambda candidate: (candidate.wage, candidate.created_at, candidate.id), reverse=True)
+    return by_city, by_employer
+
+
+def rebuild_for_workers(workers, candidates=None):
+    """
+    Recompute preferences and the full recommendation list for a batch of
+    workers. Without candidates (from open_candidates()), only the jobs
+    these workers can be offered are read: the best paid in their cities
+    and those of employers they applied to.
+    """
+    limit = settings.RECOMMENDATIONS_PER_WORKER
+    preferences = build_preferences(workers)
+    worker_ids = [worker.pk for worker in workers]
+    applied = defaultdict(set)
+    for applications in fan_out(Application.objects.filter(worker__in=worker_ids)):
+        for worker_id, job_id in applications.values_list('worker_id', 'job_id'):
+            applied[worker_id].add(job_id)
+    if candidates is None:
+        candidates = open_candidates(
+            cities={city for preference in preferences for city in (preference.city, *preference.city_shares)},
+            employers={employer for preference in preferences for employer in preference.applied_employers},
+            per_city=limit + max(map(len, applied.values()), default=0),
+        )
+    by_city, by_employer = candidates
+
+    recommendations = []
+    for preference in preferences:
+        worker_profile = profile(preference)
+        taken = applied.get(preference.worker_id, set())
+        pool = {}
+        for city in {preference.city, *preference.city_shares}:
+            for candidate in islice(by_city.get(city, ()), limit + len(taken)):
+                pool[candidate.id] = candidate
+        for employer_id in preference.applied_employers:
+            for candidate in by_employer.get(employer_id, ()):
+                pool[candidate.id] = candidate
+        best = heapq.nlargest(
+            limit,
+            (_rank(score(candidate, worker_profile), candidate)
+             for candidate in pool.values() if candidate.id not in taken),
+        )
+        best = [entry for entry in best if entry[0] > 0]
+        preference.score_floor = best[-1][0] if len(best) >= limit else 0
+        recommendations.extend((preference.worker_id, entry[-1], entry[0]) for entry in best)
+
+    # Everything above only reads, so the transaction starts with a write and
+    # holds its locks briefly. Rows a concurrent rebuild of the same worker
+    # (e.g. two first feed requests) inserted first are kept, not a conflict.
+    ops = connection.ops
+    insert = (
+        f'{ops.insert_statement(on_conflict=OnConflict.IGNORE)} {JobRecommendation._meta.db_table} '
+        f'(worker_id, job_id, score) VALUES (%s, %s, %s) '
+        f'{ops.on_conflict_suffix_sql(JobRecommendation._meta.concrete_fields, OnConflict.IGNORE, None, None)}'
+    )
+    with transaction.atomic():
+        WorkerPreference.objects.filter(worker__in=worker_ids).delete()
+        WorkerPreference.objects.bulk_create(preferences, batch_size=1000, ignore_conflicts=True)
+        JobRecommendation.objects.filter(worker__in=worker_ids).delete()
+        # Plain executemany: building a model instance per row costs more than the insert
+        with connection.cursor() as cursor:
+            cursor.executemany(insert, recommendations)
+    return len(recommendations)
+
+
+def recommend_jobs(jobs):
+    """Add newly posted or reopened jobs of one employer to the lists of workers they rank well for"""
+    now = timezone.now()
+    jobs = [
+        job for job in jobs
+        if job.status == 'open' and job.filled_slots < job.required_workers
+        and not (job.expires_at and job.expires_at <= now)
+    ]
+    if not jobs:
+        return 0
+    employer_id = jobs[0].employer_id
+    employer_city = jobs[0].city
+    # An employer's jobs share their city, and so their shard
+    applications = on_shard(Application.objects.all(), shard_of(jobs[0]))
+    # The jobs share employer and city, so for any one worker their scores
+    # only differ by wage: best paid first, stop at the first below the floor
+    candidates = sorted(
+        (Candidate(job.pk, employer_id, employer_city, float(job.daily_wage), job.created_at) for job in jobs),
+        key=lambda candidate: (candidate.wage, candidate.created_at, candidate.id), reverse=True,
+    )
+    limit = settings.RECOMMENDATIONS_PER_WORKER
+
+    # Workers who live or mostly apply in the jobs' city, or know the employer
+    known = set(applications.filter(job__employer_id=employer_id).values_list('worker_id', flat=True))
+    known.update(ArchivedApplication.objects.filter(job__employer_id=employer_id).values_list('worker_id', flat=True))
+    audience = Q(worker__in=known)
+    if employer_city:
+        audience |= Q(city=employer_city) | Q(top_city=employer_city)
+
+    already_applied = set(applications.filter(job__in=jobs).values_list('worker_id', 'job_id'))
+    audience = WorkerPreference.objects.filter(audience).values_list(
+        'worker_id', 'city', 'city_shares', 'preferred_wage', 'applied_employers', 'accepted_employers', 'score_floor'
+    )
+    recommendations = []
+    for worker_id, city, city_shares, wage, applied, accepted, floor in audience.iterator():
+        # List lookups on applied/accepted are cheaper than building sets for a few jobs
+        worker_profile = Profile(city, city_shares, float(wage) if wage else None, applied, accepted)
+        added = 0
+        for candidate in candidates:
+            if (worker_id, candidate.id) in already_applied:
+                continue
+            job_score = score(candidate, worker_profile)
+            if job_score <= floor:
+                break
+            recommendations.append(JobRecommendation(worker_id=worker_id, job_id=candidate.id, score=job_score))
+            added += 1
+            if added >= limit:
+                break
+    # Lists may grow past RECOMMENDATIONS_PER_WORKER until the next rebuild trims them
+    JobRecommendation.objects.bulk_create(recommendations, batch_size=1000, ignore_conflicts=True)
+    return len(recommendations)
+
+
+def withdraw_job(job):
+    """Remove a closed job from every list"""
+    JobRecommendation.objects.filter(job=job).delete()
+
+
+def withdraw_jobs(job_ids):
+    """withdraw_job for many jobs in one query"""
+    JobRecommendation.objects.filter(job_id__in=job_ids).delete()
+
+
+def forget_recommendation(worker, job):
+    """Remove a job the worker has applied to from their list"""
+    JobRecommendation.objects.filter(worker=worker, job=job).delete()
+
+
+def queue_jobs(jobs):
+    """Queue newly posted or reopened jobs for recommend_jobs; commits or rolls back with the caller's transaction"""
+    RecommendationTask.objects.bulk_create(
+        [RecommendationTask(kind='job', object_id=job.pk) for job in jobs], ignore_conflicts=True
+    )
+
+
+def queue_worker(worker):
+    """Queue a worker without a list for rebuild_for_workers"""
+    RecommendationTask.objects.bulk_create([RecommendationTask(kind='worker', object_id=worker.pk)],
+                                           ignore_conflicts=True)
+
+
+def run_queued(batch_size=500):
+    """Do up to batch_size queued tasks in one transaction; returns how many were done"""
+    with transaction.atomic():
+        tasks = list(RecommendationTask.objects.select_for_update(skip_locked=True).order_by('pk')[:batch_size])
+        if not tasks:
+            return 0
+        worker_ids = [task.object_id for task in tasks if task.kind == 'worker']
+        if worker_ids:
+            workers = list(get_user_model().objects.filter(pk__in=worker_ids, role='worker'))
+            if workers:
+                rebuild_for_workers(workers)
+        # recommend_jobs takes jobs of one employer and city
+        batches = defaultdict(list)
+        for jobs in fan_out(Job.objects.filter(pk__in=[task.object_id for task in tasks if task.kind == 'job'])):
+            for job in jobs:
+                batches[job.employer_id, job.city].append(job)
+        for jobs in batches.values():
+            recommend_jobs(jobs)
+        RecommendationTask.objects.filter(pk__in=[task.pk for task in tasks]).delete()
+    return len(tasks)
+
+
+def recommended_jobs(worker):
+    """The worker's recommendations of open jobs, best first; a worker without a list is queued for one"""
+    if not WorkerPreference.objects.filter(worker=worker).exists():
+        queue_worker(worker)
+    recommendations = JobRecommendation.objects.filter(worker=worker).order_by('-score', '-job_id')
+    if not is_sharded():
+        return recommendations.filter(unexpired('job__'), job__status='open').select_related('job', 'job__employer')
+
+    # The list is short: load it whole and keep the entries whose job is open on its shard
+    recommendations = list(recommendations)
+    jobs = {}
+    for queryset in fan_out(Job.objects.filter(unexpired(), status='open',
+                                               pk__in=[entry.job_id for entry in recommendations])):
+        jobs.update((job.pk, job) for job in select_users(queryset, 'employer'))
+    recommendations = [entry for entry in recommendations if entry.job_id in jobs]
+    for entry in recommendations:
+        entry.job = jobs[entry.job_id]
+    return recommendations
@@ -1,11 +1,30 @@
 from rest_framework import serializers
 from .models import Job, Application
+from accounts.fragments import UserFragmentMixin
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
 
-class EmployerSerializer(serializers.ModelSerializer):
+def validate_schedule(attrs, instance=None):
+    """Check start/end dates and the application deadline, falling back to the instance on partial updates"""
+    def current(name):
+        return attrs[name] if name in attrs else getattr(instance, name, None)
+    
+    start_date, end_date, deadline = current('start_date'), current('end_date'), current('application_deadline')
+    if start_date and end_date and end_date < start_date:
+        raise serializers.ValidationError({'end_date': 'End date cannot be before the start date'})
+    if 'end_date' in attrs and end_date and end_date < timezone.localdate():
+        raise serializers.ValidationError({'end_date': 'End date cannot be in the past'})
+    if 'application_deadline' in attrs and deadline and deadline <= timezone.now():
+        raise serializers.ValidationError({'application_deadline': 'Application deadline must be in the future'})
+    if deadline and end_date and timezone.localdate(deadline) > end_date:
+        raise serializers.ValidationError({'application_deadline': 'Application deadline cannot be after the end date'})
+    return attrs
+
+
+class EmployerSerializer(UserFragmentMixin, serializers.ModelSerializer):
     """Serializer for employer details in job listings"""
     
     class Meta:
@@ -13,7 +32,7 @@ class EmployerSerializer(serializers.ModelSerializer):
         fields = ('id', 'full_name', 'email', 'city')
 
 
-class WorkerSerializer(serializers.ModelSerializer):
+class WorkerSerializer(UserFragmentMixin, serializers.ModelSerializer):
     """Serializer for worker details in applications"""
     
     class Meta:
@@ -26,7 +45,11 @@ class JobCreateSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Job
-        fields = ('title', 'description', 'daily_wage', 'required_workers')
+        fields = ('title', 'description', 'daily_wage', 'required_workers',
+                  'start_date', 'end_date', 'application_deadline')
+    
+    def validate(self, attrs):
+        return validate_schedule(attrs)
     
     def create(self, validated_data):
         """Create job with employer from request"""
@@ -44,8 +67,12 @@ class JobListSerializer(serializers.ModelSerializer):
         model = Job
         fields = ('id', 'employer', 'title', 'description', 'daily_wage', 
                   'required_workers', 'filled_slots', 'available_slots', 
-                  'status', 'created_at')
-        read_only_fields = ('id', 'filled_slots', 'status', 'created_at')
+                  'status', 'start_date', 'end_date', 'application_deadline',
+                  'expires_at', 'created_at')
+        read_only_fields = ('id', 'filled_slots', 'status', 'expires_at', 'created_at')
+    
+    def validate(self, attrs):
+        return validate_schedule(attrs, self.instance)
 
 
 class ApplicationCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,149 @@
+"""
+Maintenance of the city shards (see ``worksite.sharding``).
+
+``move_chunk`` moves a city's jobs, with their applications, to another
+shard after SHARD_CITIES or DB_SHARDS change. Rows keep their ids and
+timestamps, so feeds, expiry and time-to-fill are unaffected and the
+recommendation lists on default keep pointing at them. The copy commits
+before the source rows are deleted, and a chunk copied twice after a
+crash in between is not inserted again.
+
+Two User signal receivers keep the shards in step with users on default:
+``delete_user_rows`` (pre_delete) removes what a deleted user leaves on
+the shards other than default, which the ORM cascade from the users
+table does not reach, and ``restamp_employer_city`` (post_save) moves an
+employer's jobs, hot and archived, to the employer's new city, as the
+listing filters on ``Job.city``. Both adjust the JobCount rows to match. With shards, ``rebalance_shards`` then
+moves those jobs to the new city's shard.
+
+The schema keeps its foreign key constraints. Only with DB_SHARDS set,
+``relax_foreign_keys`` (run by migration 0009 and ``setup_shards``) drops
+those whose rows can be on another database: a job's employer and an
+application's worker on the shards, a recommended job on default.
+"""
+import copy
+from collections import Counter
+from django.db import connections, transaction
+from django.db.models.constants import OnConflict
+from worksite.sharding import PRIMARY, fan_out, forget_locations, is_sharded, shard_for_city, shards
+from .counts import tally
+from .models import Job, Application, ArchivedJob, JobCount, JobRecommendation
+
+
+# (model, field) of foreign keys whose target can be on another database, per side
+CROSS_SHARD_KEYS = {
+    'primary': [('JobRecommendation', 'job')],
+    'shard': [('Job', 'employer'), ('Application', 'worker')],
+}
+
+
+def relax_foreign_keys(apps, schema_editor):
+    """
+    Drop the constraints of CROSS_SHARD_KEYS on schema_editor's database
+    when it is one of several shards; a no-op without DB_SHARDS. Takes
+    (apps, schema_editor) as a RunPython migration function does.
+    """
+    connection = schema_editor.connection
+    if not is_sharded() or connection.alias not in shards():
+        return
+    side = 'primary' if connection.alias == PRIMARY else 'shard'
+    for model_name, field_name in CROSS_SHARD_KEYS[side]:
+        model = apps.get_model('jobs', model_name)
+        field = model._meta.get_field(field_name)
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, model._meta.db_table)
+        if not any(info['foreign_key'] and info['columns'] == [field.column] for info in constraints.values()):
+            continue
+        relaxed = copy.copy(field)
+        relaxed.db_constraint = False
+        schema_editor.alter_field(model, field, relaxed)
+
+
+def _copy_rows(queryset, target, batch_size=1000):
+    """
+    Insert queryset's rows into target unchanged, skipping ids already
+    there. A raw INSERT, since the ORM would restamp the auto_now and
+    auto_now_add columns (created_at, updated_at, applied_at).
+    """
+    fields = queryset.model._meta.concrete_fields
+    connection = connections[target]
+    ops = connection.ops
+    sql = (
+        f"{ops.insert_statement(on_conflict=OnConflict.IGNORE)} {ops.quote_name(queryset.model._meta.db_table)} "
+        f"({', '.join(ops.quote_name(field.column) for field in fields)}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))}) "
+        f"{ops.on_conflict_suffix_sql(fields, OnConflict.IGNORE, None, None)}"
+    )
+    rows = queryset.values_list(*[field.attname for field in fields])
+    batch = []
+    with connection.cursor() as cursor:
+        for row in rows.iterator(chunk_size=batch_size):
+            batch.append([field.get_db_prep_save(value, connection) for field, value in zip(fields, row)])
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+
+
+def misplaced_cities(shard):
+    """Cities with jobs on shard that belong on another one: {city: target}"""
+    cities = Job.objects.using(shard).order_by().values_list('city', flat=True).distinct()
+    return {city: shard_for_city(city) for city in cities if shard_for_city(city) != shard}
+
+
+def move_chunk(city, source, target, chunk_size=500):
+    """Move up to chunk_size of city's jobs and their applications from source to target; returns (jobs, applications)"""
+    with transaction.atomic(using=source), transaction.atomic(using=target):
+        job_ids = list(
+            Job.objects.using(source).select_for_update()
+            .filter(city=city).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not job_ids:
+            return 0, 0
+        _copy_rows(Job.objects.using(source).filter(pk__in=job_ids), target)
+        applications = Application.objects.using(source).filter(job_id__in=job_ids)
+        application_ids = list(applications.values_list('pk', flat=True))
+        _copy_rows(applications, target)
+        # Raw deletes: the ORM cascade would also drop the jobs' recommendations
+        applications._raw_delete(source)
+        Job.objects.using(source).filter(pk__in=job_ids)._raw_delete(source)
+    forget_locations(Job, job_ids)
+    forget_locations(Application, application_ids)
+    return len(job_ids), len(application_ids)
+
+
+def delete_user_rows(sender, instance, **kwargs):
+    """Delete a user's jobs and applications on every shard but default (pre_delete receiver)"""
+    # Uncounted here for default too, where the cascade deletes them next
+    gone = tally(ArchivedJob.objects.filter(employer=instance))
+    for shard in shards():
+        gone.update(tally(Job.objects.using(shard).filter(employer=instance)))
+    JobCount.add({key: -jobs for key, jobs in gone.items()})
+    for shard in shards():
+        if shard == PRIMARY:
+            continue
+        with transaction.atomic(using=shard):
+            jobs = Job.objects.using(shard).filter(employer=instance)
+            job_ids = list(jobs.values_list('pk', flat=True))
+            Application.objects.using(shard).filter(worker=instance).delete()
+            jobs.delete()
+        # Lists on default pointing at them
+        JobRecommendation.objects.filter(job_id__in=job_ids).delete()
+
+
+def restamp_employer_city(sender, instance, update_fields=None, **kwargs):
+    """Give an employer's jobs on every shard, and archived ones, the employer's city (post_save receiver)"""
+    if instance.role != 'employer' or (update_fields is not None and 'city' not in update_fields):
+        return
+    city = instance.city or ''
+    with transaction.atomic():
+        for queryset in (*fan_out(Job.objects.filter(employer=instance)), ArchivedJob.objects.filter(employer=instance)):
+            moved = queryset.exclude(city=instance.city)
+            # Their counts follow them to the new city
+            changes = Counter()
+            for (status, old_city), jobs in tally(moved).items():
+                changes[status, old_city] -= jobs
+                changes[status, city] += jobs
+            moved.update(city=instance.city)
+            JobCount.add(changes)
@@ -0,0 +1,148 @@
+"""
+The ``GET /api/events`` endpoint as a plain ASGI app in front of Django.
+
+Served through Django's handler, every open request keeps a thread of
+its own for as long as it lasts (sync middleware runs thread-sensitive),
+so each idle stream would hold a thread and a database connection.
+Here a stream is only an asyncio task, its queue and a disconnect
+watcher; the session lookup and the snapshot run on the shared thread
+pool and release their database connections straight away.
+"""
+import asyncio
+import json
+from importlib import import_module
+from types import SimpleNamespace
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.db import close_old_connections
+from django.http.cookie import parse_cookie
+from django.http import QueryDict
+from worksite.sharding import fan_out
+from .events import JOB_FIELDS, encode, hub, job_channel, user_channel
+from .models import Job
+
+PATH = '/api/events'
+
+# Sent on idle streams so proxies do not close them
+KEEP_ALIVE = b': keep-alive\n\n'
+
+
+def _session_user_id(session_key):
+    """User id of a logged-in session, or None; same checks as AuthenticationMiddleware"""
+    close_old_connections()
+    try:
+        session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+        user = get_user(SimpleNamespace(session=session))
+        return user.pk if user.is_authenticated and user.is_active else None
+    finally:
+        close_old_connections()
+
+
+def _job_snapshot(job_ids):
+    close_old_connections()
+    try:
+        return [
+            job
+            for queryset in fan_out(Job.objects.filter(pk__in=job_ids))
+            for job in queryset.values(*JOB_FIELDS)
+        ]
+    finally:
+        close_old_connections()
+
+
+async def _disconnected(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class EventStreamApp:
+    """Serves PATH itself and hands every other request to the Django application"""
+
+    def __init__(self, django_application):
+        self.django_application = django_application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'].rstrip('/') != PATH:
+            return await self.django_application(scope, receive, send)
+
+        headers = {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+        cors_headers = []
+        origin = headers.get('origin')
+        if origin and origin in settings.CORS_ALLOWED_ORIGINS:
+            cors_headers = [
+                (b'access-control-allow-origin', origin.encode('latin-1')),
+                (b'access-control-allow-credentials', b'true'),
+                (b'vary', b'Origin'),
+            ]
+
+        async def respond(status, error):
+            body = json.dumps({'error': error}).encode()
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())] + cors_headers,
+            })
+            await send({'type': 'http.response.body', 'body': body})
+
+        if scope['method'] != 'GET':
+            return await respond(405, 'Method not allowed')
+
+        session_key = parse_cookie(headers.get('cookie', '')).get(settings.SESSION_COOKIE_NAME)
+        user_id = None
+        if session_key:
+            user_id = await sync_to_async(_session_user_id, thread_sensitive=False)(session_key)
+        if user_id is None:
+            return await respond(403, 'Authentication credentials were not provided.')
+
+        params = QueryDict(scope['query_string'])
+        job_ids = [job_id for job_id in params.get('jobs', '').split(',') if job_id]
+        if not all(job_id.isdigit() for job_id in job_ids):
+            return await respond(400, 'jobs must be a comma-separated list of ids')
+        job_ids = sorted({int(job_id) for job_id in job_ids})
+        if len(job_ids) > settings.EVENTS_MAX_JOBS:
+            return await respond(400, f'At most {settings.EVENTS_MAX_JOBS} jobs per stream')
+
+        channels = [user_channel(user_id)] + [job_channel(job_id) for job_id in job_ids]
+        subscription = hub.subscribe(channels, settings.EVENTS_QUEUE_SIZE)
+        disconnected = asyncio.ensure_future(_disconnected(receive))
+        getter = None
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    # Let a buffering proxy (nginx) pass events through as they happen
+                    (b'x-accel-buffering', b'no'),
+                ] + cors_headers,
+            })
+            # Current state, read after subscribing so no change in between is lost
+            snapshot = await sync_to_async(_job_snapshot, thread_sensitive=False)(job_ids)
+            body = b'retry: 5000\n\n' + b''.join(encode('job', data) for data in snapshot)
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+            while True:
+                if getter is None:
+                    getter = asyncio.ensure_future(subscription.queue.get())
+                done, _ = await asyncio.wait(
+                    {getter, disconnected},
+                    timeout=settings.EVENTS_HEARTBEAT_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnected in done:
+                    break
+                if getter in done:
+                    message, getter = getter.result(), None
+                else:
+                    message = KEEP_ALIVE
+                await send({'type': 'http.response.body', 'body': message, 'more_body': True})
+        except OSError:
+            # The client went away mid-write
+            pass
+        finally:
+            hub.unsubscribe(subscription)
+            disconnected.cancel()
+            if getter is not None:
+                getter.cancel()
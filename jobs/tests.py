@@ -1,3 +1,718 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import SkipTest, mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from accounts.models import User
+from .models import Job, Application, ApplicationStatusEvent, ArchivedApplication, ArchivedJob, IdempotencyKey, JobCount, JobRecommendation, RecommendationTask, WorkerPreference
+from .archive import archive_chunk
+from .counts import refresh_job_counts
+from .events import RESYNC, EventHub, encode
+from .expiry import close_expired_chunk
+from .history import decision_time_percentiles, month_start
+from .recommendations import rebuild_for_workers, run_queued
+from .shards import _copy_rows, move_chunk
 
-# Create your tests here.
+OLD = datetime(2020, 1, 1, 9, 30, tzinfo=dt_timezone.utc)
+
+
+class ShardTestCase(TestCase):
+    """TestCase with a second database, 'shard1', in a temporary SQLite file"""
+
+    @classmethod
+    def setUpClass(cls):
+        if connection.vendor != 'sqlite':
+            raise SkipTest('The temporary shard is a SQLite file')
+        cls._shard_dir = tempfile.TemporaryDirectory()
+        connections.settings['shard1'] = dict(
+            connections.settings['default'], NAME=os.path.join(cls._shard_dir.name, 'shard1.sqlite3')
+        )
+        # As a shard: without the constraints of foreign keys into default
+        with override_settings(JOB_SHARDS=['default', 'shard1']):
+            call_command('migrate', database='shard1', verbosity=0)
+        # Set here rather than on the class: the runner checks declared databases before any setup
+        cls.databases = {'default', 'shard1'}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['shard1'].close()
+        del connections['shard1']
+        del connections.settings['shard1']
+        cls._shard_dir.cleanup()
+
+
+class MoveChunkTests(ShardTestCase):
+
+    def setUp(self):
+        employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                            role='employer', city='Pune')
+        self.worker = User.objects.create_user(email='worker@example.com', password='x', full_name='Worker',
+                                               role='worker', city='Pune')
+        self.job = Job.objects.create(employer=employer, title='Mason', description='Walls', daily_wage=800,
+                                      required_workers=2)
+        self.application = Application.objects.create(job=self.job, worker=self.worker)
+        Job.objects.filter(pk=self.job.pk).update(created_at=OLD, updated_at=OLD)
+        Application.objects.filter(pk=self.application.pk).update(applied_at=OLD, updated_at=OLD)
+
+    def test_moves_jobs_and_applications_with_their_timestamps(self):
+        self.assertEqual(move_chunk('Pune', 'default', 'shard1'), (1, 1))
+
+        self.assertFalse(Job.objects.filter(pk=self.job.pk).exists())
+        self.assertFalse(Application.objects.filter(pk=self.application.pk).exists())
+        job = Job.objects.using('shard1').get(pk=self.job.pk)
+        application = Application.objects.using('shard1').get(pk=self.application.pk)
+        self.assertEqual((job.created_at, job.updated_at), (OLD, OLD))
+        self.assertEqual((application.applied_at, application.updated_at), (OLD, OLD))
+        self.assertEqual((job.city, job.employer_id, job.daily_wage), ('Pune', self.job.employer_id, 800))
+        self.assertEqual((application.job_id, application.worker_id), (self.job.pk, self.worker.pk))
+
+    def test_rows_already_copied_are_not_inserted_again(self):
+        # As after a crash between the copy's commit and the source delete
+        _copy_rows(Job.objects.filter(pk=self.job.pk), 'shard1')
+        _copy_rows(Application.objects.filter(pk=self.application.pk), 'shard1')
+
+        self.assertEqual(move_chunk('Pune', 'default', 'shard1'), (1, 1))
+        self.assertEqual(Job.objects.using('shard1').count(), 1)
+        self.assertEqual(Application.objects.using('shard1').count(), 1)
+        self.assertEqual(move_chunk('Pune', 'default', 'shard1'), (0, 0))
+
+    def test_other_cities_stay(self):
+        self.assertEqual(move_chunk('Mumbai', 'default', 'shard1'), (0, 0))
+        self.assertTrue(Job.objects.filter(pk=self.job.pk).exists())
+
+
+class ShardUserSignalTests(ShardTestCase):
+
+    def setUp(self):
+        self.employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                                 role='employer', city='Pune')
+        self.worker = User.objects.create_user(email='worker@example.com', password='x', full_name='Worker',
+                                               role='worker', city='Pune')
+        job = Job.objects.create(employer=self.employer, title='Mason', description='Walls', daily_wage=800,
+                                 required_workers=2)
+        Application.objects.create(job=job, worker=self.worker)
+        move_chunk('Pune', 'default', 'shard1')
+        self.job = Job.objects.using('shard1').get(pk=job.pk)
+
+    def test_deleting_a_user_deletes_their_rows_on_other_shards(self):
+        JobRecommendation.objects.create(worker=self.worker, job_id=self.job.pk, score=10)
+        with self.settings(JOB_SHARDS=['default', 'shard1']):
+            User.objects.filter(pk=self.employer.pk).delete()
+        self.assertFalse(Job.objects.using('shard1').exists())
+        self.assertFalse(Application.objects.using('shard1').exists())
+        self.assertFalse(JobRecommendation.objects.exists())
+
+    def test_deleting_a_worker_deletes_their_applications(self):
+        with self.settings(JOB_SHARDS=['default', 'shard1']):
+            self.worker.delete()
+        self.assertFalse(Application.objects.using('shard1').exists())
+        self.assertTrue(Job.objects.using('shard1').filter(pk=self.job.pk).exists())
+
+    def test_jobs_follow_their_employers_city(self):
+        self.employer.city = 'Mumbai'
+        with self.settings(JOB_SHARDS=['default', 'shard1']):
+            self.employer.save()
+        self.assertEqual(Job.objects.using('shard1').get(pk=self.job.pk).city, 'Mumbai')
+
+
+class QueuedRecommendationsTests(TestCase):
+
+    def setUp(self):
+        self.worker = User.objects.create_user(email='worker@example.com', password='x', full_name='Worker',
+                                               role='worker', city='Pune')
+        self.employers = {}
+        for city in ('Pune', 'Mumbai'):
+            self.employers[city] = User.objects.create_user(email=f'{city}@example.com', password='x',
+                                                            full_name=city, role='employer', city=city)
+            Job.objects.create(employer=self.employers[city], title='Mason', description='Walls', daily_wage=800,
+                               required_workers=2)
+
+    def test_first_request_queues_the_list(self):
+        self.client.force_login(self.worker)
+        response = self.client.get('/api/jobs/recommended')
+        self.assertEqual((response.status_code, response.json()['results']), (200, []))
+        self.assertFalse(WorkerPreference.objects.exists())
+        self.assertEqual(list(RecommendationTask.objects.values_list('kind', 'object_id')),
+                         [('worker', self.worker.pk)])
+
+        # Built from the worker's city only
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(run_queued(), 1)
+        job_queries = [query['sql'] for query in queries
+                       if query['sql'].startswith('SELECT') and 'FROM "jobs"' in query['sql']]
+        self.assertTrue(job_queries)
+        self.assertTrue(all('"jobs"."city" =' in sql or '"jobs"."employer_id" IN' in sql for sql in job_queries))
+        self.assertFalse(RecommendationTask.objects.exists())
+        jobs = self.client.get('/api/jobs/recommended').json()['results']
+        self.assertEqual([job['id'] for job in jobs], [Job.objects.get(city='Pune').pk])
+
+    def test_posted_jobs_are_scored_later(self):
+        rebuild_for_workers([self.worker])
+        self.client.force_login(self.employers['Pune'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/jobs/', {'title': 'Painter', 'description': 'Walls', 'daily_wage': '900',
+                                                       'required_workers': 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(any('worker_preferences' in query['sql'] for query in queries))
+        job = Job.objects.get(title='Painter')
+        self.assertFalse(JobRecommendation.objects.filter(job=job).exists())
+
+        self.assertEqual(run_queued(), 1)
+        self.assertTrue(JobRecommendation.objects.filter(worker=self.worker, job=job).exists())
+
+    def test_rebuild_tolerates_rows_a_concurrent_rebuild_inserted(self):
+        rebuild_for_workers([self.worker])
+        job_id = JobRecommendation.objects.get(worker=self.worker).job_id
+        # As if another first request inserted its rows after this one's deletes
+        with mock.patch('django.db.models.query.QuerySet.delete', return_value=(0, {})):
+            rebuild_for_workers([self.worker])
+        self.assertTrue(WorkerPreference.objects.filter(worker=self.worker).exists())
+        self.assertEqual(list(JobRecommendation.objects.values_list('job_id', flat=True)), [job_id])
+
+
+class IdempotencyKeyTests(TestCase):
+
+    def setUp(self):
+        employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                            role='employer', city='Pune')
+        self.worker = User.objects.create_user(email='worker@example.com', password='x', full_name='Worker',
+                                               role='worker', city='Pune')
+        self.job = Job.objects.create(employer=employer, title='Mason', description='Walls', daily_wage=800,
+                                      required_workers=2)
+        self.client.force_login(self.worker)
+
+    def apply(self, key='key-1', **data):
+        return self.client.post(f'/api/jobs/{self.job.pk}/apply/', data, content_type='application/json',
+                                HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_is_replayed(self):
+        first = self.apply()
+        self.assertEqual(first.status_code, 201)
+        retry = self.apply()
+        self.assertEqual((retry.status_code, retry.json()), (201, first.json()))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Application.objects.count(), 1)
+
+    def test_key_reused_for_another_request(self):
+        self.apply()
+        response = self.apply(note='different')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Application.objects.count(), 1)
+
+    def in_progress(self):
+        """Make the first request's key look unfinished; returns its stored response"""
+        self.apply()
+        stored = IdempotencyKey.objects.values('response_status', 'response_body').get()
+        IdempotencyKey.objects.update(response_status=None, response_body=None)
+        return stored
+
+    def test_waits_for_the_request_in_progress(self):
+        stored = self.in_progress()
+        with mock.patch('jobs.idempotency.time.sleep',
+                        side_effect=lambda seconds: IdempotencyKey.objects.update(**stored)) as sleep:
+            response = self.apply()
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual((response.status_code, response['Idempotent-Replayed']), (201, 'true'))
+        self.assertEqual(Application.objects.count(), 1)
+
+    def test_runs_when_the_request_in_progress_fails(self):
+        self.in_progress()
+        Application.objects.all().delete()
+        released = lambda seconds: IdempotencyKey.objects.all().delete()
+        with mock.patch('jobs.idempotency.time.sleep', side_effect=released):
+            response = self.apply()
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Application.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_gives_up_waiting(self):
+        self.in_progress()
+        response = self.apply()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_database_locked_while_claiming(self):
+        create = IdempotencyKey.objects.create
+        attempts = iter([OperationalError('database is locked')])
+
+        def locked_once(**kwargs):
+            error = next(attempts, None)
+            if error is not None:
+                raise error
+            return create(**kwargs)
+
+        with mock.patch.object(IdempotencyKey.objects, 'create', side_effect=locked_once), \
+                mock.patch('jobs.idempotency.time.sleep') as sleep:
+            response = self.apply()
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Application.objects.count(), 1)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_database_stays_locked(self):
+        with mock.patch.object(IdempotencyKey.objects, 'create', side_effect=OperationalError('database is locked')):
+            response = self.apply()
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Application.objects.exists())
+        self.assertEqual(self.apply().status_code, 201)
+
+class CloseExpiredTests(TestCase):
+
+    def setUp(self):
+        employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                            role='employer', city='Pune')
+        self.worker = User.objects.create_user(email='worker@example.com', password='x', full_name='Worker',
+                                               role='worker', city='Pune')
+        self.job = Job.objects.create(employer=employer, title='Mason', description='Walls', daily_wage=800,
+                                      required_workers=2)
+        rebuild_for_workers([self.worker])
+        Job.objects.filter(pk=self.job.pk).update(expires_at=OLD)
+
+    def test_closed_jobs_leave_recommendations_and_are_published(self):
+        self.assertTrue(JobRecommendation.objects.filter(job=self.job).exists())
+        with mock.patch('jobs.expiry.job_changed') as job_changed:
+            self.assertEqual(close_expired_chunk(now=OLD + timedelta(days=1)), 1)
+        self.assertEqual(Job.objects.get(pk=self.job.pk).status, 'closed')
+        self.assertFalse(JobRecommendation.objects.filter(job=self.job).exists())
+        self.assertEqual([call.args[0].pk for call in job_changed.call_args_list], [self.job.pk])
+
+
+class JobCityTests(TestCase):
+
+    def setUp(self):
+        self.employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                                 role='employer', city='Pune')
+        self.job = Job.objects.create(employer=self.employer, title='Mason', description='Walls', daily_wage=800,
+                                      required_workers=2)
+        self.client.force_login(self.employer)
+
+    def listed_in(self, city):
+        return [job['id'] for job in self.client.get('/api/jobs/', {'city': city}).json()['results']]
+
+    def test_jobs_are_listed_under_the_employers_new_city(self):
+        self.assertEqual(self.listed_in('Pune'), [self.job.pk])
+        self.employer.city = 'Mumbai'
+        self.employer.save()
+        self.assertEqual(self.listed_in('Pune'), [])
+        self.assertEqual(self.listed_in('Mumbai'), [self.job.pk])
+
+    def test_saves_without_the_city_leave_jobs_alone(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.employer.save(update_fields=['last_login'])
+        self.assertEqual(len(queries), 1)
+
+
+class DashboardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                                 role='employer', city='Pune')
+        worker = User.objects.create_user(email='worker@example.com', password='x', full_name='Worker',
+                                          role='worker', city='Pune')
+        self.open_job = Job.objects.create(employer=self.employer, title='Mason', description='Walls',
+                                           daily_wage=800, required_workers=2)
+        Application.objects.create(job=self.open_job, worker=worker)
+        self.filled_job = Job.objects.create(employer=self.employer, title='Painter', description='Walls',
+                                             daily_wage=500, required_workers=1, filled_slots=1)
+        # Filled two hours after posting, edited long after that
+        Job.objects.filter(pk=self.filled_job.pk).update(created_at=OLD, filled_at=OLD + timedelta(hours=2),
+                                                         updated_at=OLD + timedelta(days=30))
+        ArchivedJob.objects.create(id=10**9, employer=self.employer, title='Welder', description='Gates',
+                                   daily_wage=900, required_workers=3, filled_slots=3, created_at=OLD,
+                                   filled_at=OLD + timedelta(hours=6), updated_at=OLD + timedelta(days=60))
+        self.client.force_login(self.employer)
+
+    def test_totals_come_from_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/jobs/dashboard')
+        dashboard_queries = [query['sql'] for query in queries if 'jobs_archive' in query['sql']]
+        self.assertEqual(len(dashboard_queries), 1)
+        self.assertIn('UNION ALL', dashboard_queries[0])
+        dashboard = response.json()
+        self.assertEqual((dashboard['open_jobs'], dashboard['closed_jobs']), (1, 2))
+        self.assertEqual((dashboard['required_workers'], dashboard['filled_slots']), (6, 4))
+        self.assertEqual((dashboard['pending_applications'], dashboard['filled_jobs']), (1, 2))
+        # (2h + 6h) / 2, whatever updated_at says
+        self.assertEqual(dashboard['average_time_to_fill_hours'], 4.0)
+        self.assertEqual(dashboard['daily_wage_commitment'], '500.00')
+
+    def test_filled_at_is_stamped_on_fill_and_cleared_on_reopen(self):
+        self.assertIsNone(self.open_job.filled_at)
+        self.open_job.filled_slots = 2
+        self.open_job.save()
+        self.assertEqual(self.open_job.status, 'closed')
+        self.assertIsNotNone(self.open_job.filled_at)
+
+        worker = User.objects.get(email='worker@example.com')
+        Application.objects.filter(job=self.open_job).update(status='accepted')
+        response = self.client.delete(f'/api/jobs/{self.open_job.pk}/applications/{worker.pk}')
+        self.assertEqual(response.status_code, 204)
+        self.open_job.refresh_from_db()
+        self.assertEqual((self.open_job.status, self.open_job.filled_at), ('open', None))
+
+    def test_cache_is_dropped_when_the_write_commits(self):
+        self.assertEqual(self.client.get('/api/jobs/dashboard').json()['open_jobs'], 1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post('/api/jobs/', {'title': 'Carpenter', 'description': 'Doors',
+                                                       'daily_wage': '700', 'required_workers': 1},
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        # Not committed yet: still the cached totals
+        self.assertEqual(self.client.get('/api/jobs/dashboard').json()['open_jobs'], 1)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get('/api/jobs/dashboard').json()['open_jobs'], 2)
+
+
+class JobCountTests(TestCase):
+
+    def setUp(self):
+        self.employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                                 role='employer', city='Pune')
+        self.worker = User.objects.create_user(email='worker@example.com', password='x', full_name='Worker',
+                                               role='worker', city='Pune')
+        self.job = Job.objects.create(employer=self.employer, title='Mason', description='Walls', daily_wage=800,
+                                      required_workers=1)
+        refresh_job_counts()
+        self.client.force_login(self.employer)
+
+    def counts(self):
+        return {(row.status, row.city): row.jobs for row in JobCount.objects.filter(jobs__gt=0)}
+
+    def assertReconciled(self, expected):
+        self.assertEqual(self.counts(), expected)
+        refresh_job_counts()
+        self.assertEqual(self.counts(), expected)
+
+    def test_posting_filling_and_reopening_move_the_counts(self):
+        response = self.client.post('/api/jobs/bulk/', [
+            {'title': 'Painter', 'description': 'Walls', 'daily_wage': '900', 'required_workers': 1},
+            {'title': 'Welder', 'description': 'Gates', 'daily_wage': '900', 'required_workers': 1},
+        ], content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertReconciled({('open', 'Pune'): 3})
+
+        Application.objects.create(job=self.job, worker=self.worker, status='accepted')
+        self.job.filled_slots = 1
+        self.job.save()
+        self.assertReconciled({('open', 'Pune'): 2, ('closed', 'Pune'): 1})
+
+        response = self.client.delete(f'/api/jobs/{self.job.pk}/applications/{self.worker.pk}')
+        self.assertEqual(response.status_code, 204)
+        self.assertReconciled({('open', 'Pune'): 3})
+
+        self.assertEqual(self.client.delete(f'/api/jobs/{self.job.pk}/').status_code, 204)
+        self.assertReconciled({('open', 'Pune'): 2})
+
+    def test_the_expiry_sweep_closes_counted_jobs(self):
+        Job.objects.filter(pk=self.job.pk).update(expires_at=OLD)
+        self.assertEqual(close_expired_chunk(now=OLD + timedelta(days=1)), 1)
+        self.assertReconciled({('closed', 'Pune'): 1})
+
+    def test_counts_follow_the_employer_to_a_new_city(self):
+        self.employer.city = 'Mumbai'
+        self.employer.save()
+        self.assertReconciled({('open', 'Mumbai'): 1})
+
+    def test_deleted_employers_leave_the_counts(self):
+        self.employer.delete()
+        self.assertReconciled({})
+
+    @override_settings(COUNT_EXACT_BELOW=2)
+    def test_estimated_listings_use_the_counters(self):
+        for index in range(2):
+            Job.objects.create(employer=self.employer, title=f'Job {index}', description='Walls', daily_wage=900,
+                               required_workers=1)
+        JobCount.objects.filter(status='open', city='Pune').update(jobs=50)
+        with CaptureQueriesContext(connection) as queries:
+            body = self.client.get('/api/jobs/', {'count': 'estimated', 'city': 'Pune'}).json()
+        self.assertEqual((body['count'], body['count_type'], len(body['results'])), (50, 'estimated', 3))
+        self.assertFalse(any('COUNT(' in query['sql'] and 'FROM "jobs"' in query['sql'] for query in queries))
+
+        # Without count=estimated, or with filters the counters don't cover, counts are exact
+        body = self.client.get('/api/jobs/', {'city': 'Pune'}).json()
+        self.assertEqual((body['count'], body['count_type']), (3, 'exact'))
+        body = self.client.get('/api/jobs/', {'count': 'estimated', 'my_jobs': 'true'}).json()
+        self.assertEqual((body['count'], body['count_type']), (3, 'exact'))
+
+    @override_settings(COUNT_EXACT_BELOW=2, JOB_COUNTS_MAX_AGE_MINUTES=60)
+    def test_stale_or_small_estimates_fall_back_to_exact_counts(self):
+        JobCount.objects.update(refreshed_at=OLD)
+        body = self.client.get('/api/jobs/', {'count': 'estimated'}).json()
+        self.assertEqual((body['count'], body['count_type']), (1, 'exact'))
+        refresh_job_counts()
+        # Below COUNT_EXACT_BELOW
+        body = self.client.get('/api/jobs/', {'count': 'estimated'}).json()
+        self.assertEqual((body['count'], body['count_type']), (1, 'exact'))
+
+    def test_nothing_is_counted_before_the_first_refresh(self):
+        JobCount.objects.all().delete()
+        Job.objects.create(employer=self.employer, title='Painter', description='Walls', daily_wage=900,
+                           required_workers=1)
+        self.assertFalse(JobCount.objects.exists())
+
+
+class StatusHistoryTests(TestCase):
+
+    def setUp(self):
+        self.employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                                 role='employer', city='Pune')
+        self.worker = User.objects.create_user(email='worker@example.com', password='x', full_name='Worker',
+                                               role='worker', city='Pune')
+        self.job = Job.objects.create(employer=self.employer, title='Mason', description='Walls', daily_wage=800,
+                                      required_workers=2)
+
+    def test_every_transition_is_recorded(self):
+        self.client.force_login(self.worker)
+        self.assertEqual(self.client.post(f'/api/jobs/{self.job.pk}/apply/').status_code, 201)
+        application = Application.objects.get()
+        Application.objects.filter(pk=application.pk).update(applied_at=OLD)
+
+        self.client.force_login(self.employer)
+        response = self.client.put('/api/applications/status', {'application_id': application.pk,
+                                                                 'status': 'accepted'},
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.delete(f'/api/jobs/{self.job.pk}/applications/{self.worker.pk}')
+        self.assertEqual(response.status_code, 204)
+
+        events = ApplicationStatusEvent.objects.filter(application_id=application.pk)
+        self.assertEqual([(event.from_status, event.to_status) for event in events],
+                         [(None, 'pending'), ('pending', 'accepted'), ('accepted', 'removed')])
+        self.assertEqual([event.decision_seconds is not None for event in events], [False, True, False])
+        # Measured from applied_at, and the events outlive the application
+        self.assertGreater(events[1].decision_seconds, 86400 * 365)
+        self.assertFalse(Application.objects.exists())
+
+    def test_decision_time_percentiles_read_one_month(self):
+        month = month_start(OLD)
+        ApplicationStatusEvent.objects.bulk_create([
+            ApplicationStatusEvent(application_id=seconds, job_id=1, worker_id=1, from_status='pending',
+                                   to_status='accepted', applied_at=OLD, occurred_at=OLD,
+                                   decision_seconds=seconds, month=event_month)
+            for event_month in (month, month.replace(month=2))
+            for seconds in range(1, 101)
+        ])
+        ApplicationStatusEvent.objects.filter(month=month.replace(month=2)).update(decision_seconds=10000)
+        self.assertEqual(decision_time_percentiles(month),
+                         {'month': month, 'decisions': 100, 'p50': 50, 'p90': 90, 'p99': 99})
+        self.assertEqual(decision_time_percentiles(month.replace(month=3)),
+                         {'month': month.replace(month=3), 'decisions': 0, 'p50': None, 'p90': None, 'p99': None})
+
+
+class ArchiveTests(TestCase):
+
+    def setUp(self):
+        self.employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                                 role='employer', city='Pune')
+        self.worker = User.objects.create_user(email='worker@example.com', password='x', full_name='Worker',
+                                               role='worker', city='Pune')
+        self.jobs = []
+        for index in range(25):
+            job = Job.objects.create(employer=self.employer, title=f'Job {index}', description='Walls',
+                                     daily_wage=800, required_workers=1, status='closed')
+            Application.objects.create(job=job, worker=self.worker, status='rejected')
+            # Interleaved: every other job goes to the archive
+            Job.objects.filter(pk=job.pk).update(created_at=OLD + timedelta(hours=index),
+                                                 updated_at=OLD if index % 2 else OLD + timedelta(days=400))
+            self.jobs.append(job)
+        Application.objects.update(updated_at=OLD)
+
+    def test_settled_jobs_move_with_their_applications(self):
+        self.assertEqual(archive_chunk(closed_before=OLD + timedelta(days=1)), (12, 12))
+        archived = [job.pk for index, job in enumerate(self.jobs) if index % 2]
+        self.assertEqual(sorted(ArchivedJob.objects.values_list('pk', flat=True)), archived)
+        self.assertEqual(sorted(ArchivedApplication.objects.values_list('job_id', flat=True)), archived)
+        self.assertFalse(Job.objects.filter(pk__in=archived).exists())
+        self.assertEqual(ArchivedJob.objects.get(pk=archived[0]).created_at, OLD + timedelta(hours=1))
+        self.assertEqual(archive_chunk(closed_before=OLD + timedelta(days=1)), (0, 0))
+
+    def test_closed_listing_pages_through_hot_and_archived_jobs(self):
+        archive_chunk(closed_before=OLD + timedelta(days=1))
+        self.client.force_login(self.worker)
+        first = self.client.get('/api/jobs/', {'status': 'closed'}).json()
+        second = self.client.get('/api/jobs/', {'status': 'closed', 'page': 2}).json()
+        self.assertEqual((first['count'], len(first['results']), len(second['results'])), (25, 20, 5))
+        newest_first = [job.pk for job in reversed(self.jobs)]
+        self.assertEqual([job['id'] for job in first['results'] + second['results']], newest_first)
+
+        applications = self.client.get('/api/applications/my').json()
+        self.assertEqual(len(applications), 25)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        admin = User.objects.create_user(email='admin@example.com', password='x', full_name='Admin', role='admin')
+        self.employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                                 role='employer', city='Pune')
+        for index in range(5):
+            Job.objects.create(employer=self.employer, title=f'Job {index}', description='Walls, "plastered"',
+                               daily_wage='800.50', required_workers=2)
+        self.client.force_login(admin)
+
+    def export(self, name, **params):
+        response = self.client.get(f'/api/exports/{name}', params)
+        self.assertTrue(response.streaming)
+        self.chunks = list(response.streaming_content)
+        return response, b''.join(self.chunks).decode()
+
+    def test_csv_streams_in_id_order(self):
+        with mock.patch('jobs.exports.CHUNK_SIZE', 2):
+            response, body = self.export('jobs.csv')
+        # The header, then one write per batch of two rows
+        self.assertEqual(len(self.chunks), 4)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="jobs.csv"')
+        header, *rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(header[:3], ['id', 'title', 'description'])
+        self.assertEqual([int(row[0]) for row in rows], sorted(Job.objects.values_list('pk', flat=True)))
+        self.assertEqual(rows[0][2], 'Walls, "plastered"')
+        self.assertEqual(rows[0][header.index('employer_name')], 'Employer')
+
+    def test_ndjson_is_filtered_and_bad_filters_are_rejected(self):
+        Job.objects.filter(title='Job 0').update(status='closed')
+        response, body = self.export('jobs.ndjson', status='closed')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        [row] = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual((row['title'], row['daily_wage'], row['city']), ('Job 0', '800.50', 'Pune'))
+
+        self.assertEqual(self.client.get('/api/exports/jobs.ndjson', {'employer': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/exports/jobs.xml').status_code, 404)
+
+
+class BulkCreateTests(TestCase):
+
+    def setUp(self):
+        self.employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                                 role='employer', city='Pune')
+        self.client.force_login(self.employer)
+
+    def post(self, jobs):
+        return self.client.post('/api/jobs/bulk/', jobs, content_type='application/json')
+
+    def item(self, title, **fields):
+        return {'title': title, 'description': 'Walls', 'daily_wage': '800', 'required_workers': 2, **fields}
+
+    def test_errors_are_reported_per_item_and_nothing_is_created(self):
+        response = self.post([self.item('Mason'), self.item('Painter', daily_wage='lots'),
+                              self.item('Welder'), {'title': 'Helper'}])
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertEqual(body['error'], '2 of 4 jobs are invalid; none were created')
+        self.assertEqual([error['index'] for error in body['errors']], [1, 3])
+        self.assertIn('daily_wage', body['errors'][0]['errors'])
+        self.assertIn('description', body['errors'][1]['errors'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_valid_batches_are_inserted_together(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post([self.item(f'Job {index}') for index in range(3)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(response.json()['ids']), sorted(Job.objects.values_list('pk', flat=True)))
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT INTO "jobs"')]), 1)
+        self.assertEqual(set(Job.objects.values_list('city', 'employer_id')), {('Pune', self.employer.pk)})
+
+    @override_settings(JOB_BULK_CREATE_LIMIT=2)
+    def test_batches_over_the_limit_are_refused(self):
+        self.assertEqual(self.post([self.item('Mason')] * 3).status_code, 400)
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertFalse(Job.objects.exists())
+
+
+class EventHubTests(SimpleTestCase):
+
+    def run_stream(self, publish, maxsize=3):
+        """Subscribe to job:1, publish from another thread, return what the stream's queue holds"""
+        hub = EventHub()
+
+        async def stream():
+            subscription = hub.subscribe(['job:1'], maxsize)
+            await asyncio.to_thread(publish, hub)
+            # Let the loop run the deliveries publish scheduled
+            await asyncio.sleep(0)
+            messages = []
+            while not subscription.queue.empty():
+                messages.append(subscription.queue.get_nowait())
+            hub.unsubscribe(subscription)
+            self.assertFalse(hub.has_subscribers('job:1'))
+            return messages
+
+        return asyncio.run(stream())
+
+    def test_events_are_delivered_in_order(self):
+        def publish(hub):
+            hub.publish('job:1', encode('job', {'id': 1, 'filled_slots': 1}))
+            hub.publish('job:2', encode('job', {'id': 2}))
+        self.assertEqual(self.run_stream(publish), [b'event: job\ndata: {"id": 1, "filled_slots": 1}\n\n'])
+
+    def test_a_stream_that_falls_behind_is_told_to_resync(self):
+        def publish(hub):
+            for slots in range(5):
+                hub.publish('job:1', encode('job', {'id': 1, 'filled_slots': slots}))
+        # Three queued, the fourth replaces them with a resync, the fifth follows it
+        self.assertEqual(self.run_stream(publish),
+                         [RESYNC, b'event: job\ndata: {"id": 1, "filled_slots": 4}\n\n'])
+
+
+@override_settings(ADMIN_PERFORMANCE_MODE=True, ADMIN_EXACT_COUNT_BELOW=100)
+class PerformanceModeAdminTests(TestCase):
+
+    def setUp(self):
+        self.employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                                 role='employer', city='Pune')
+        for title in ('Mason', 'Master mason', 'Painter'):
+            Job.objects.create(employer=self.employer, title=title, description='Walls', daily_wage=800,
+                               required_workers=2)
+        admin = User.objects.create_superuser(email='admin@example.com', password='x', full_name='Admin')
+        self.client.force_login(admin)
+
+    def changelist(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/jobs/job/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['cl'], [query['sql'] for query in queries if 'FROM "jobs"' in query['sql']]
+
+    def test_search_uses_one_indexed_lookup(self):
+        changelist, queries = self.changelist(q='Mason')
+        # A title prefix: 'Master mason' only contains the term
+        self.assertEqual([job.title for job in changelist.result_list], ['Mason'])
+        self.assertTrue(any("LIKE 'Mason%'" in sql for sql in queries))
+        self.assertFalse(any("'%Mason%'" in sql for sql in queries))
+
+        changelist, _ = self.changelist(q='employer@example.com')
+        self.assertEqual(changelist.result_count, 3)
+        job = Job.objects.get(title='Painter')
+        changelist, _ = self.changelist(q=str(job.pk))
+        self.assertEqual(list(changelist.result_list), [job])
+
+    def test_counts_come_from_planner_statistics_above_the_threshold(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+            changelist, _ = self.changelist()
+            self.assertEqual(changelist.result_count, 3)
+            cursor.execute("UPDATE sqlite_stat1 SET stat = '5000 1' WHERE tbl = 'jobs'")
+            changelist, queries = self.changelist()
+        self.assertEqual(changelist.result_count, 5000)
+        self.assertFalse(any('COUNT(' in sql for sql in queries))
+        self.assertIsNone(changelist.full_result_count)
+        # Date filters scan the table: left out
+        self.assertEqual([spec.title for spec in changelist.filter_specs], ['status'])
+
+    @override_settings(ADMIN_PERFORMANCE_MODE=False)
+    def test_stock_admin_when_off(self):
+        changelist, _ = self.changelist(q='mason')
+        self.assertEqual(sorted(job.title for job in changelist.result_list), ['Mason', 'Master mason'])
+        self.assertEqual(changelist.full_result_count, 3)
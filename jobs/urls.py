@@ -9,6 +9,9 @@ urlpatterns = [
     # Application management
     path('applications/status', views.update_application_status, name='update-application-status'),
     path('applications/my', views.my_applications, name='my-applications'),
+    path('jobs/dashboard', views.employer_dashboard, name='employer-dashboard'),
+    path('jobs/recommended', views.recommended_jobs_feed, name='recommended-jobs'),
+    path('exports/<slug:dataset>.<slug:fmt>', views.export_data, name='export-data'),
     path('jobs/<int:job_id>/applications/<int:worker_id>', views.remove_worker_from_job, name='remove-worker'),
     
     # Job routes (includes apply endpoint as action)
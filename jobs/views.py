@@ -1,11 +1,17 @@
 from rest_framework import status, viewsets
-from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.decorators import api_view, permission_classes, throttle_classes, action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticated
+from collections import Counter
+from django.conf import settings
 from django.db import transaction
 from django.db.models import F
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from .models import Job, Application
+from django.utils import timezone
+from .models import Job, Application, ArchivedJob, ArchivedApplication, JobCount, unexpired
 from .serializers import (
     JobCreateSerializer,
     JobListSerializer,
@@ -13,23 +19,40 @@ from .serializers import (
     ApplicationSerializer,
     ApplicationStatusUpdateSerializer
 )
-from accounts.permissions import IsWorker, IsEmployer, IsEmployerOrAdmin, IsOwnerOrAdmin
+from accounts.permissions import IsAdmin, IsWorker, IsEmployer, IsEmployerOrAdmin, IsOwnerOrAdmin
+from notifications.outbox import enqueue_application_status, enqueue_job_closed
+from worksite.counting import CountModePagination, estimate_count
+from worksite.ratelimit import SlidingWindowThrottle, scoped
+from worksite.sharding import (
+    allocate_ids, fan_out, is_sharded, locate, on_shard, select_users, shard_for_city, shard_of, shard_transaction
+)
+from .history import record_transition
+from .archive import CombinedListing
+from .counts import counted_jobs
+from .recommendations import forget_recommendation, queue_jobs, recommended_jobs, withdraw_job
+from .dashboard import get_dashboard, invalidate_dashboard
+from .exports import DATASETS, FORMATS, stream_export
+from .events import application_changed, job_changed
+from .idempotency import idempotent
 
 
 class JobViewSet(viewsets.ModelViewSet):
     """ViewSet for job management"""
-    queryset = Job.objects.select_related('employer').all()
+    queryset = Job.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = CountModePagination
+    throttle_classes = [SlidingWindowThrottle]
+    throttle_scopes = {'create': 'jobs.create', 'bulk_create': 'jobs.create', 'apply': 'jobs.apply'}
     
     def get_serializer_class(self):
         """Return appropriate serializer class"""
-        if self.action == 'create':
+        if self.action in ('create', 'bulk_create'):
             return JobCreateSerializer
         return JobListSerializer
     
     def get_permissions(self):
         """Set permissions based on action"""
-        if self.action == 'create':
+        if self.action in ('create', 'bulk_create'):
             return [IsEmployer()]
         elif self.action in ['destroy', 'update', 'partial_update']:
             return [IsEmployerOrAdmin()]
@@ -37,7 +60,7 @@ class JobViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filter queryset based on query parameters"""
-        queryset = super().get_queryset()
+        queryset = select_users(super().get_queryset(), 'employer')
         
         # Filter by status
         status_filter = self.request.query_params.get('status')
@@ -47,10 +70,36 @@ class JobViewSet(viewsets.ModelViewSet):
             # Default to showing only open jobs
             queryset = queryset.filter(status='open')
         
+        # Open listings skip jobs past their deadline that the sweeper hasn't closed yet
+        if self.action == 'list' and status_filter in (None, '', 'open'):
+            queryset = queryset.filter(unexpired())
+        
+        queryset = self.filter_common(queryset).order_by('-created_at')
+        
+        # One job: the shard holding it
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if lookup is not None:
+            return on_shard(queryset, locate(Job, lookup))
+        
+        # One city's listing reads its shard; without a city every shard is read
+        city = self.request.query_params.get('city')
+        querysets = [on_shard(queryset, shard_for_city(city))] if city else fan_out(queryset)
+        
+        # Closed listings also include jobs moved to the archive tables
+        if self.action == 'list' and status_filter == 'closed':
+            archived = self.filter_common(ArchivedJob.objects.select_related('employer'))
+            querysets.append(archived.order_by('-created_at'))
+        
+        if len(querysets) > 1:
+            return CombinedListing(querysets, 'created_at')
+        return querysets[0]
+    
+    def filter_common(self, queryset):
+        """Apply the city and my_jobs filters shared by hot and archived jobs"""
         # Filter by city
         city = self.request.query_params.get('city')
         if city:
-            queryset = queryset.filter(employer__city=city)
+            queryset = queryset.filter(city=city)
         
         # Filter by employer (for employer's own jobs)
         if self.request.user.role == 'employer':
@@ -58,11 +107,26 @@ class JobViewSet(viewsets.ModelViewSet):
             if my_jobs == 'true':
                 queryset = queryset.filter(employer=self.request.user)
         
-        return queryset.order_by('-created_at')
+        return queryset
+    
+    def estimate_count(self, queryset):
+        """Listing size for ?count=estimated: the (status, city) counters when only those filters apply"""
+        params = self.request.query_params
+        if not (self.request.user.role == 'employer' and params.get('my_jobs') == 'true'):
+            estimate = counted_jobs(params.get('status') or 'open', params.get('city'))
+            if estimate is not None:
+                return estimate
+        return estimate_count(queryset)
     
     def perform_create(self, serializer):
         """Create job with current user as employer"""
-        serializer.save(employer=self.request.user)
+        job = serializer.save(employer=self.request.user)
+        queue_jobs([job])
+        invalidate_dashboard(job.employer_id)
+    
+    def perform_update(self, serializer):
+        job = serializer.save()
+        invalidate_dashboard(job.employer_id)
     
     def destroy(self, request, *args, **kwargs):
         """Delete job - only owner or admin"""
@@ -74,19 +138,71 @@ class JobViewSet(viewsets.ModelViewSet):
                 'error': 'You do not have permission to delete this job'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        job.delete()
+        with transaction.atomic():
+            job.delete()
+            JobCount.add({(job.status, job.city or ''): -1})
+        invalidate_dashboard(job.employer_id)
         return Response({
             'message': 'Job deleted successfully'
         }, status=status.HTTP_204_NO_CONTENT)
     
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request):
+        """Create a batch of jobs in one insert - all or nothing"""
+        if not isinstance(request.data, list) or not request.data:
+            return Response({
+                'error': 'Expected a non-empty list of jobs'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > settings.JOB_BULK_CREATE_LIMIT:
+            return Response({
+                'error': f'At most {settings.JOB_BULK_CREATE_LIMIT} jobs per request'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # One serializer instance validates every item
+        serializer = self.get_serializer()
+        validated, errors = [], []
+        for index, item in enumerate(request.data):
+            try:
+                validated.append(serializer.run_validation(item))
+            except ValidationError as e:
+                errors.append({'index': index, 'errors': e.detail})
+        if errors:
+            return Response({
+                'error': f'{len(errors)} of {len(request.data)} jobs are invalid; none were created',
+                'errors': errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        jobs = [Job(employer=request.user, city=request.user.city, **item) for item in validated]
+        for job in jobs:
+            # bulk_create skips Job.save(), which closes jobs without open
+            # slots, derives expires_at and takes ids unique across shards
+            if job.filled_slots >= job.required_workers:
+                job.status = 'closed'
+                job.filled_at = timezone.now()
+            job.expires_at = job.compute_expiry()
+        if is_sharded():
+            for job, pk in zip(jobs, allocate_ids(Job, len(jobs))):
+                job.pk = pk
+        with shard_transaction(shard_for_city(request.user.city)):
+            Job.objects.bulk_create(jobs, batch_size=1000)
+            JobCount.add(Counter((job.status, job.city or '') for job in jobs))
+            queue_jobs(jobs)
+            invalidate_dashboard(request.user.pk)
+        
+        return Response({
+            'message': f'{len(jobs)} jobs created successfully',
+            'ids': [job.pk for job in jobs]
+        }, status=status.HTTP_201_CREATED)
+    
     @action(detail=True, methods=['post'], permission_classes=[IsWorker])
+    @idempotent
     def apply(self, request, pk=None):
         """Apply for a job - atomic operation to prevent race conditions"""
         job = self.get_object()
         
         # Use transaction to ensure atomicity
         try:
-            with transaction.atomic():
+            with shard_transaction(shard_of(job)):
                 # Lock the job row for update
                 job = Job.objects.select_for_update().get(pk=job.pk)
                 
@@ -96,10 +212,19 @@ class JobViewSet(viewsets.ModelViewSet):
                         'error': 'This job is no longer accepting applications'
                     }, status=status.HTTP_400_BAD_REQUEST)
                 
+                # Past its deadline but not yet closed by close_expired_jobs
+                if job.expires_at and job.expires_at <= timezone.now():
+                    return Response({
+                        'error': 'The application deadline for this job has passed'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                
                 # Check if slots are available
                 if job.filled_slots >= job.required_workers:
                     job.status = 'closed'
                     job.save()
+                    enqueue_job_closed(job)
+                    withdraw_job(job)
+                    invalidate_dashboard(job.employer_id)
                     return Response({
                         'error': 'All positions have been filled'
                     }, status=status.HTTP_400_BAD_REQUEST)
@@ -116,6 +241,10 @@ class JobViewSet(viewsets.ModelViewSet):
                     worker=request.user,
                     status='pending'
                 )
+                record_transition(application, None, 'pending')
+                application_changed(application)
+                forget_recommendation(request.user, job)
+                invalidate_dashboard(job.employer_id)
                 
                 # Note: filled_slots is incremented when application is accepted
                 # not when application is submitted
@@ -145,13 +274,15 @@ class JobViewSet(viewsets.ModelViewSet):
                 'error': 'You do not have permission to view these applications'
             }, status=status.HTTP_403_FORBIDDEN)
         
-        applications = job.applications.select_related('worker').all()
+        applications = select_users(job.applications.all(), 'worker')
         serializer = ApplicationSerializer(applications, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 @api_view(['PUT'])
 @permission_classes([IsEmployer])
+@throttle_classes([scoped('applications.update')])
+@idempotent
 def update_application_status(request):
     """Update application status (accept/reject)"""
     application_id = request.data.get('application_id')
@@ -167,7 +298,7 @@ def update_application_status(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        with transaction.atomic():
+        with shard_transaction(locate(Application, application_id)):
             application = Application.objects.select_related('job').select_for_update().get(
                 id=application_id
             )
@@ -186,6 +317,7 @@ def update_application_status(request):
             
             old_status = application.status
             application.status = new_status
+            job_closed = None
             
             # If accepting, increment filled_slots atomically
             if new_status == 'accepted' and old_status != 'accepted':
@@ -207,16 +339,37 @@ def update_application_status(request):
                 if job.filled_slots >= job.required_workers:
                     job.status = 'closed'
                     job.save()
+                    job_closed = job
+                else:
+                    job_changed(job)
             
             # If rejecting a previously accepted application, decrement filled_slots
             elif old_status == 'accepted' and new_status == 'rejected':
                 Job.objects.filter(pk=application.job.pk).update(
                     filled_slots=F('filled_slots') - 1,
-                    status='open'  # Reopen job if it was closed
+                    status='open',  # Reopen job if it was closed
+                    filled_at=None
                 )
+                city = application.job.city or ''
+                if application.job.status == 'closed':
+                    JobCount.add({('closed', city): -1, ('open', city): 1})
+                job_changed(application.job)
             
             application.save()
             
+            # History and notifications commit with the status change
+            if new_status != old_status:
+                record_transition(application, old_status, new_status)
+                enqueue_application_status(application)
+                application_changed(application)
+                invalidate_dashboard(application.job.employer_id)
+            if job_closed is not None:
+                enqueue_job_closed(job_closed)
+                withdraw_job(job_closed)
+            elif old_status == 'accepted' and new_status == 'rejected' and application.job.status == 'closed':
+                # The freed slot reopened the job
+                queue_jobs([application.job])
+            
             return Response({
                 'message': f'Application {new_status} successfully',
                 'application': ApplicationSerializer(application).data
@@ -234,10 +387,11 @@ def update_application_status(request):
 
 @api_view(['DELETE'])
 @permission_classes([IsEmployer])
+@throttle_classes([scoped('applications.update')])
 def remove_worker_from_job(request, job_id, worker_id):
     """Remove a worker from a job"""
     try:
-        with transaction.atomic():
+        with shard_transaction(locate(Job, job_id)):
             job = Job.objects.select_for_update().get(pk=job_id)
             
             # Check if user is the job employer
@@ -253,11 +407,19 @@ def remove_worker_from_job(request, job_id, worker_id):
             if application.status == 'accepted':
                 Job.objects.filter(pk=job.pk).update(
                     filled_slots=F('filled_slots') - 1,
-                    status='open'
+                    status='open',
+                    filled_at=None
                 )
+                job_changed(job)
+                if job.status == 'closed':
+                    JobCount.add({('closed', job.city or ''): -1, ('open', job.city or ''): 1})
+                    queue_jobs([job])
             
-            # Delete the application
+            # Delete the application, keeping its history
+            record_transition(application, application.status, 'removed')
+            application_changed(application, 'removed')
             application.delete()
+            invalidate_dashboard(job.employer_id)
             
             return Response({
                 'message': 'Worker removed from job successfully'
@@ -281,6 +443,56 @@ def remove_worker_from_job(request, job_id, worker_id):
 @permission_classes([IsWorker])
 def my_applications(request):
     """Get current user's applications"""
-    applications = Application.objects.filter(worker=request.user).select_related('job', 'job__employer')
-    serializer = ApplicationSerializer(applications, many=True)
+    applications = [
+        select_users(queryset.select_related('job'), 'job__employer', 'worker')
+        for queryset in fan_out(Application.objects.filter(worker=request.user))
+    ]
+    archived = ArchivedApplication.objects.filter(worker=request.user).select_related('job', 'job__employer', 'worker')
+    serializer = ApplicationSerializer(CombinedListing([*applications, archived], 'applied_at'), many=True)
     return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsWorker])
+def recommended_jobs_feed(request):
+    """Open jobs ranked for the current worker"""
+    paginator = PageNumberPagination()
+    page = paginator.paginate_queryset(recommended_jobs(request.user), request)
+    serializer = JobListSerializer([recommendation.job for recommendation in page], many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsEmployerOrAdmin])
+def employer_dashboard(request):
+    """Hiring totals for the current employer (admins pass ?employer=<id>)"""
+    employer_id = request.user.pk
+    if request.user.role == 'admin':
+        employer_id = request.query_params.get('employer')
+        if not employer_id or not employer_id.isdigit():
+            return Response({
+                'error': 'employer is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+    return Response(get_dashboard(int(employer_id)), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def export_data(request, dataset, fmt):
+    """Stream a whole dataset as CSV or NDJSON"""
+    if dataset not in DATASETS or fmt not in FORMATS:
+        return Response({
+            'error': f"Export not found; datasets: {', '.join(DATASETS)}, formats: {', '.join(FORMATS)}"
+        }, status=status.HTTP_404_NOT_FOUND)
+    try:
+        chunks = stream_export(dataset, fmt, request.query_params)
+    except ValueError as e:
+        return Response({
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    response = StreamingHttpResponse(chunks, content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{fmt}"'
+    # Let a buffering proxy (nginx) pass chunks through as they are produced
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
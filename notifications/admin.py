@@ -0,0 +1,13 @@
+from django.contrib import admin
+from .models import OutboxMessage
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    """Admin interface for the notification outbox"""
+    list_display = ('id', 'recipient', 'kind', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('recipient__email', 'dedupe_key')
+    ordering = ('-id',)
+    list_select_related = ('recipient',)
+    readonly_fields = ('created_at', 'sent_at', 'next_attempt_at', 'last_error')
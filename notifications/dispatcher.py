@@ -0,0 +1,108 @@
+"""
+Batched outbox delivery.
+
+Each batch is claimed in a short transaction, then sent outside it over a
+single mail connection as one digest per recipient. Failed digests are
+retried with exponential backoff until ``max_attempts``.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import OutboxMessage
+
+MESSAGES = {
+    'application_accepted': "Your application for '{job_title}' was accepted.",
+    'application_rejected': "Your application for '{job_title}' was not successful.",
+    'job_closed': "'{job_title}' is no longer accepting applications.",
+}
+
+# Messages stuck in 'sending' this long (e.g. the dispatcher died) are retried
+STALE_CLAIM = timedelta(minutes=10)
+
+
+def dispatch_batch(batch_size=500, max_attempts=5):
+    """Deliver up to batch_size due messages; return (sent, superseded, failed)"""
+    messages = _claim(batch_size)
+    if not messages:
+        return 0, 0, 0
+
+    by_recipient = defaultdict(list)
+    for message in messages:
+        by_recipient[message.recipient_id].append(message)
+
+    sent, superseded, failed = [], [], []
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for message in messages:
+            message.last_error = f'Could not connect: {e}'
+        _finish([], [], messages, max_attempts)
+        return 0, 0, len(messages)
+    try:
+        for recipient_messages in by_recipient.values():
+            latest = {}
+            for message in recipient_messages:
+                previous = latest.get(message.dedupe_key)
+                if previous is not None:
+                    superseded.append(previous)
+                latest[message.dedupe_key] = message
+            deliver = sorted(latest.values(), key=lambda message: message.pk)
+            try:
+                connection.send_messages([_build_email(deliver)])
+            except Exception as e:
+                for message in deliver:
+                    message.last_error = str(e)
+                failed.extend(deliver)
+            else:
+                sent.extend(deliver)
+    finally:
+        connection.close()
+
+    _finish(sent, superseded, failed, max_attempts)
+    return len(sent), len(superseded), len(failed)
+
+
+def _claim(batch_size):
+    """Mark a batch of due messages as 'sending' and return them"""
+    now = timezone.now()
+    OutboxMessage.objects.filter(status='sending', next_attempt_at__lte=now - STALE_CLAIM).update(status='pending')
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .select_related('recipient')
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        OutboxMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+            status='sending', next_attempt_at=now
+        )
+    return messages
+
+
+def _build_email(messages):
+    recipient = messages[0].recipient
+    lines = [MESSAGES[message.kind].format(**message.payload) for message in messages]
+    if len(lines) == 1:
+        subject = f'WorkSite: {messages[0].get_kind_display()}'
+    else:
+        subject = f'WorkSite: {len(lines)} updates on your applications'
+    body = f"Hi {recipient.full_name},\n\n" + '\n'.join(f'- {line}' for line in lines) + '\n\nThe WorkSite team\n'
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [recipient.email])
+
+
+def _finish(sent, superseded, failed, max_attempts):
+    now = timezone.now()
+    OutboxMessage.objects.filter(pk__in=[message.pk for message in sent]).update(status='sent', sent_at=now)
+    OutboxMessage.objects.filter(pk__in=[message.pk for message in superseded]).update(status='superseded')
+    for message in failed:
+        message.attempts += 1
+        if message.attempts >= max_attempts:
+            message.status = 'failed'
+        else:
+            message.status = 'pending'
+            message.next_attempt_at = now + timedelta(minutes=2 ** message.attempts)
+    OutboxMessage.objects.bulk_update(failed, ['attempts', 'status', 'next_attempt_at', 'last_error'])
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from notifications.dispatcher import dispatch_batch
+
+
+class Command(BaseCommand):
+    help = 'Deliver pending outbox notifications in batches over one mail connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--max-attempts', type=int, default=5)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls when idle')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, superseded, failed = dispatch_batch(options['batch_size'], options['max_attempts'])
+            if sent or superseded or failed:
+                self.stdout.write(f'Sent {sent}, superseded {superseded}, failed {failed}')
+            elif not options['loop']:
+                self.stdout.write('Outbox is empty')
+            if not options['loop']:
+                return
+            # Drain back-to-back while there is work, otherwise wait
+            if sent + superseded + failed < options['batch_size']:
+                time.sleep(options['interval'])
@@ -0,0 +1,47 @@
+from django.db import models
+from django.conf import settings
+
+
+class OutboxMessage(models.Model):
+    """Notification written in the same transaction as the change it reports"""
+
+    KIND_CHOICES = (
+        ('application_accepted', 'Application accepted'),
+        ('application_rejected', 'Application rejected'),
+        ('job_closed', 'Job closed'),
+    )
+
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('superseded', 'Superseded'),
+        ('failed', 'Failed'),
+    )
+
+    recipient = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='outbox_messages'
+    )
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    # Messages about the same subject (e.g. one application) share a key;
+    # only the newest pending one is delivered
+    dedupe_key = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    next_attempt_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} -> user {self.recipient_id} ({self.status})"
+
+    class Meta:
+        db_table = 'notification_outbox'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
@@ -0,0 +1,39 @@
+"""
+Outbox writers.
+
+Call these inside the transaction that makes the change so the message
+commits (or rolls back) with it. Nothing here talks to the mail server;
+``dispatch_notifications`` delivers the messages later.
+"""
+from jobs.models import Application
+from .models import OutboxMessage
+
+
+def enqueue_application_status(application):
+    """Tell the worker their application was accepted or rejected"""
+    OutboxMessage.objects.create(
+        recipient_id=application.worker_id,
+        kind=f'application_{application.status}',
+        dedupe_key=f'application:{application.pk}',
+        payload={'job_id': application.job_id, 'job_title': application.job.title},
+    )
+
+
+def enqueue_job_closed(job):
+    """Tell workers still waiting on a decision that the job has closed"""
+    enqueue_jobs_closed([job.pk])
+
+
+def enqueue_jobs_closed(job_ids):
+    """enqueue_job_closed for many jobs in one query"""
+    pending = (Application.objects.filter(job_id__in=job_ids, status='pending')
+               .values_list('worker_id', 'job_id', 'job__title'))
+    OutboxMessage.objects.bulk_create([
+        OutboxMessage(
+            recipient_id=worker_id,
+            kind='job_closed',
+            dedupe_key=f'job:{job_id}:closed',
+            payload={'job_id': job_id, 'job_title': job_title},
+        )
+        for worker_id, job_id, job_title in pending.iterator()
+    ], batch_size=1000)
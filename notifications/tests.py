@@ -0,0 +1,43 @@
+from unittest import mock
+from django.core import mail
+from django.test import TestCase
+from accounts.models import User
+from jobs.models import Application, Job
+from .dispatcher import dispatch_batch
+from .models import OutboxMessage
+
+
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        self.employer = User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                                 role='employer', city='Pune')
+        self.worker = User.objects.create_user(email='worker@example.com', password='x', full_name='Worker',
+                                               role='worker', city='Pune')
+        self.job = Job.objects.create(employer=self.employer, title='Mason', description='Walls', daily_wage=800,
+                                      required_workers=2)
+        self.application = Application.objects.create(job=self.job, worker=self.worker)
+        self.client.force_login(self.employer)
+
+    def accept(self):
+        return self.client.put('/api/applications/status', {'application_id': self.application.pk,
+                                                             'status': 'accepted'},
+                               content_type='application/json')
+
+    def test_message_commits_with_the_status_change(self):
+        self.assertEqual(self.accept().status_code, 200)
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.recipient_id, message.kind, message.status),
+                         (self.worker.pk, 'application_accepted', 'pending'))
+        self.assertEqual(message.payload, {'job_id': self.job.pk, 'job_title': 'Mason'})
+        self.assertFalse(mail.outbox)
+
+        self.assertEqual(dispatch_batch(), (1, 0, 0))
+        self.assertEqual([email.to for email in mail.outbox], [['worker@example.com']])
+        self.assertEqual(OutboxMessage.objects.get().status, 'sent')
+
+    def test_message_rolls_back_with_the_status_change(self):
+        with mock.patch('jobs.views.application_changed', side_effect=RuntimeError('boom')):
+            self.assertEqual(self.accept().status_code, 500)
+        self.assertEqual(Application.objects.get(pk=self.application.pk).status, 'pending')
+        self.assertFalse(OutboxMessage.objects.exists())
@@ -0,0 +1,78 @@
+from datetime import timedelta
+from django.contrib import admin
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from .models import RequestProfile, SlowQuery
+from .slow_queries import top_queries
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Admin interface for profiled requests"""
+    list_display = ('id', 'method', 'path', 'view_name', 'status_code', 'duration_ms', 'queries', 'query_ms',
+                    'reason', 'created_at', 'flamegraph')
+    list_filter = ('reason', 'view_name')
+    search_fields = ('path',)
+    ordering = ('-created_at',)
+    exclude = ('stacks',)
+    readonly_fields = ('method', 'path', 'view_name', 'status_code', 'user', 'reason', 'duration_ms', 'queries',
+                       'query_ms', 'samples', 'interval_ms', 'created_at', 'flamegraph')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('stacks')
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Stacks')
+    def flamegraph(self, obj):
+        return format_html(
+            '<a href="{}">flamegraph</a> / <a href="{}">collapsed</a>',
+            reverse('request-profile-stacks', args=[obj.pk, 'svg']),
+            reverse('request-profile-stacks', args=[obj.pk, 'folded']),
+        )
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Admin interface for the slow query log, with a report of the slowest shapes"""
+    change_list_template = 'admin/perf/slowquery/change_list.html'
+    list_display = ('id', 'duration_ms', 'view_name', 'action', 'database', 'full_scan', 'short_shape', 'created_at')
+    list_filter = ('full_scan', 'database', 'view_name')
+    search_fields = ('=fingerprint',)
+    ordering = ('-created_at',)
+    readonly_fields = ('fingerprint', 'shape', 'sql', 'params', 'database', 'duration_ms', 'view_name', 'action',
+                       'plan', 'full_scan', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Shape')
+    def short_shape(self, obj):
+        return obj.shape[:120]
+
+    def get_urls(self):
+        return [
+            path('report/', self.admin_site.admin_view(self.report_view), name='perf_slowquery_report'),
+            *super().get_urls(),
+        ]
+
+    def report_view(self, request):
+        try:
+            hours = max(float(request.GET.get('hours') or 24), 1)
+        except ValueError:
+            hours = 24
+        view_name = request.GET.get('view', '').strip()
+        full_scans = bool(request.GET.get('full_scans'))
+        context = dict(
+            self.admin_site.each_context(request),
+            opts=self.model._meta,
+            title='Top slow queries',
+            hours=f'{hours:g}',
+            view_name=view_name,
+            full_scans=full_scans,
+            rows=top_queries(timezone.now() - timedelta(hours=hours), 50, view_name, full_scans),
+        )
+        return TemplateResponse(request, 'admin/perf/slowquery/report.html', context)
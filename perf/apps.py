@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class PerfConfig(AppConfig):
+    name = "perf"
+
+    def ready(self):
+        if settings.SLOW_QUERY_MS > 0:
+            from django.core.signals import request_finished
+            from django.db.backends.signals import connection_created
+            from .slow_queries import flush, install
+
+            connection_created.connect(install, dispatch_uid='perf.slow_queries.install')
+            request_finished.connect(flush, dispatch_uid='perf.slow_queries.flush')
@@ -0,0 +1,163 @@
+"""
+Hot endpoint benchmark cases.
+
+Each case builds a list of requests from whatever data is in the database
+(normally a generate_dataset dataset). A request is a dict with the user
+to authenticate as (None for anonymous), method, path and optional JSON
+data. Cases return an empty list when the dataset has nothing suitable.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Q
+from jobs.models import Job, Application
+from .management.commands.generate_dataset import DATASET_EMAIL_DOMAIN, DATASET_PASSWORD
+
+User = get_user_model()
+
+
+def _busiest_worker():
+    return (User.objects.filter(role='worker')
+            .annotate(application_count=Count('applications'))
+            .order_by('-application_count').first())
+
+
+def _busiest_job():
+    # The applications action only resolves jobs visible in the default open feed
+    return (Job.objects.filter(status='open').select_related('employer')
+            .annotate(application_count=Count('applications'))
+            .order_by('-application_count').first())
+
+
+def job_list(iterations):
+    worker = User.objects.filter(role='worker').first()
+    if worker is None:
+        return []
+    return [{'user': worker, 'method': 'GET', 'path': '/api/jobs/'}] * iterations
+
+
+def job_list_city(iterations):
+    worker = User.objects.filter(role='worker').exclude(city=None).first()
+    if worker is None:
+        return []
+    return [{'user': worker, 'method': 'GET', 'path': f'/api/jobs/?city={worker.city}'}] * iterations
+
+
+def job_list_closed(iterations):
+    worker = User.objects.filter(role='worker').first()
+    if worker is None:
+        return []
+    return [{'user': worker, 'method': 'GET', 'path': '/api/jobs/?status=closed&page=2'}] * iterations
+
+
+def job_list_my_jobs(iterations):
+    employer = (User.objects.filter(role='employer')
+                .annotate(job_count=Count('posted_jobs')).order_by('-job_count').first())
+    if employer is None:
+        return []
+    return [{'user': employer, 'method': 'GET', 'path': '/api/jobs/?my_jobs=true'}] * iterations
+
+
+def job_dashboard(iterations):
+    """Served from cache after the first request, as long as nothing is hired meanwhile"""
+    employer = (User.objects.filter(role='employer')
+                .annotate(job_count=Count('posted_jobs')).order_by('-job_count').first())
+    if employer is None:
+        return []
+    return [{'user': employer, 'method': 'GET', 'path': '/api/jobs/dashboard'}] * iterations
+
+
+def job_recommended(iterations):
+    worker = _busiest_worker()
+    if worker is None:
+        return []
+    return [{'user': worker, 'method': 'GET', 'path': '/api/jobs/recommended'}] * iterations
+
+
+def job_retrieve(iterations):
+    worker = User.objects.filter(role='worker').first()
+    job_ids = list(Job.objects.filter(status='open').values_list('pk', flat=True)[:iterations])
+    if worker is None or not job_ids:
+        return []
+    return [
+        {'user': worker, 'method': 'GET', 'path': f'/api/jobs/{job_ids[index % len(job_ids)]}/'}
+        for index in range(iterations)
+    ]
+
+
+def apply(iterations):
+    """Distinct (worker, open job) pairs so every request takes the insert path"""
+    jobs = list(Job.objects.filter(status='open', filled_slots__lt=F('required_workers'))
+                .values_list('pk', flat=True)[:50])
+    workers = list(User.objects.filter(role='worker')[:max(1, iterations // max(1, len(jobs)) + 1) * 2])
+    if not jobs or not workers:
+        return []
+    taken = set(Application.objects.filter(job__in=jobs, worker__in=workers)
+                .values_list('job_id', 'worker_id'))
+    requests = []
+    for worker in workers:
+        for job_id in jobs:
+            if (job_id, worker.pk) in taken:
+                continue
+            requests.append({'user': worker, 'method': 'POST', 'path': f'/api/jobs/{job_id}/apply/'})
+            if len(requests) >= iterations:
+                return requests
+    return requests
+
+
+def status_update(iterations):
+    """Alternate accept/reject on pending applications of the busiest employer"""
+    employer = (User.objects.filter(role='employer')
+                .annotate(pending=Count('posted_jobs__applications',
+                                        filter=Q(posted_jobs__status='open',
+                                                 posted_jobs__applications__status='pending')))
+                .order_by('-pending').first())
+    if employer is None:
+        return []
+    application_ids = list(Application.objects.filter(job__employer=employer, job__status='open', status='pending')
+                           .values_list('pk', flat=True)[:iterations])
+    return [
+        {'user': employer, 'method': 'PUT', 'path': '/api/applications/status',
+         'data': {'application_id': application_id, 'status': 'accepted' if index % 2 else 'rejected'}}
+        for index, application_id in enumerate(application_ids)
+    ]
+
+
+def my_applications(iterations):
+    worker = _busiest_worker()
+    if worker is None:
+        return []
+    return [{'user': worker, 'method': 'GET', 'path': '/api/applications/my'}] * iterations
+
+
+def job_applications(iterations):
+    job = _busiest_job()
+    if job is None:
+        return []
+    return [{'user': job.employer, 'method': 'GET', 'path': f'/api/jobs/{job.pk}/applications/'}] * iterations
+
+
+def login(iterations):
+    # Only generated accounts are known to use DATASET_PASSWORD
+    worker = User.objects.filter(role='worker', email__endswith=f'@{DATASET_EMAIL_DOMAIN}').first()
+    if worker is None:
+        return []
+    return [
+        {'user': None, 'method': 'POST', 'path': '/api/auth/login',
+         'data': {'email': worker.email, 'password': DATASET_PASSWORD}}
+    ] * iterations
+
+
+# name -> (builder, default iterations); password hashing makes login slow
+CASES = {
+    'job_list': (job_list, 200),
+    'job_list_city': (job_list_city, 200),
+    'job_list_closed': (job_list_closed, 200),
+    'job_list_my_jobs': (job_list_my_jobs, 200),
+    'job_dashboard': (job_dashboard, 200),
+    'job_recommended': (job_recommended, 200),
+    'job_retrieve': (job_retrieve, 200),
+    'apply': (apply, 200),
+    'status_update': (status_update, 100),
+    'my_applications': (my_applications, 100),
+    'job_applications': (job_applications, 100),
+    'login': (login, 10),
+}
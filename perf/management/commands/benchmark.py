@@ -0,0 +1,181 @@
+import json
+import logging
+import platform
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from perf.benchmarks import CASES
+from perf.stats import summarize
+
+
+class Rollback(Exception):
+    """Raised to undo every write the benchmark made"""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark hot API endpoints through the Django test client and compare against a JSON baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('cases', nargs='*', help=f"Cases to run (default: all of {', '.join(CASES)})")
+        parser.add_argument('--iterations', type=int, default=None,
+                            help='Timed requests per case (default: per-case setting)')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--save', metavar='PATH', help='Write results as a JSON baseline')
+        parser.add_argument('--compare', metavar='PATH', help='Compare results against a JSON baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed slowdown before a case counts as a regression (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        names = options['cases'] or list(CASES)
+        unknown = [name for name in names if name not in CASES]
+        if unknown:
+            raise CommandError(f"Unknown cases: {', '.join(unknown)}")
+
+        # Writes (applies, status updates, logins) are rolled back at the end,
+        # expected 4xx responses shouldn't flood the output, and the rate
+        # limiter would turn repeated requests into 429s
+        setup_test_environment()
+        no_rate_limit = override_settings(RATE_LIMIT_ENABLED=False)
+        no_rate_limit.enable()
+        request_logger = logging.getLogger('django.request')
+        previous_level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        results = {}
+        try:
+            with transaction.atomic():
+                for name in names:
+                    builder, default_iterations = CASES[name]
+                    iterations = options['iterations'] or default_iterations
+                    result = self._run_case(builder, iterations, options['warmup'])
+                    if result is None:
+                        self.stdout.write(self.style.WARNING(f'{name}: skipped, dataset has no suitable rows'))
+                        continue
+                    results[name] = result
+                    self._print(name, result)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            request_logger.setLevel(previous_level)
+            no_rate_limit.disable()
+            teardown_test_environment()
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'vendor': connection.vendor,
+            'python': platform.python_version(),
+            'cases': results,
+        }
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"Baseline written to {options['save']}")
+        if options['compare']:
+            self._compare(results, options['compare'], options['tolerance'])
+
+    def _run_case(self, builder, iterations, warmup):
+        requests = builder(warmup + iterations + 1)
+        if not requests:
+            return None
+        warmup_requests = requests[:min(warmup, len(requests) - 1)]
+        timed_requests = requests[len(warmup_requests):-1]
+        instrumented_request = requests[-1]
+
+        client = Client()
+        state = {'user': None}
+        for request in warmup_requests:
+            self._send(client, state, request)
+
+        latencies = []
+        failures = 0
+        for request in timed_requests:
+            response, latency = self._send(client, state, request)
+            latencies.append(latency)
+            if response.status_code >= 400:
+                failures += 1
+
+        # Query counts and allocations are measured on a separate request so
+        # the instrumentation doesn't skew the timings
+        tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                self._send(client, state, instrumented_request)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        total = sum(latencies)
+        return dict(
+            summarize(latencies),
+            ops_per_sec=len(latencies) / total if total else 0.0,
+            failures=failures,
+            queries=len(queries),
+            alloc_peak_kib=peak / 1024,
+        )
+
+    def _authenticate(self, client, state, request):
+        """Switch the client to the request's user outside the timed section"""
+        user = request['user']
+        if user == state['user']:
+            return
+        if user is None:
+            client.logout()
+        else:
+            client.force_login(user)
+        state['user'] = user
+
+    def _send(self, client, state, request):
+        """Send one request and return the response and its latency in seconds"""
+        self._authenticate(client, state, request)
+        data = request.get('data')
+        started = time.perf_counter()
+        if data is None:
+            response = client.generic(request['method'], request['path'])
+        else:
+            response = client.generic(request['method'], request['path'], json.dumps(data),
+                                      content_type='application/json')
+        latency = time.perf_counter() - started
+        if request['user'] is None and client.session.get('_auth_user_id'):
+            # An anonymous login request authenticated the client, undo that
+            client.logout()
+        return response, latency
+
+    def _print(self, name, result):
+        self.stdout.write(
+            f"{name:<18} {result['ops_per_sec']:>9.1f} ops/s  p50 {result['p50_ms']:>8.2f}ms  "
+            f"p99 {result['p99_ms']:>8.2f}ms  queries {result['queries']:>3}  "
+            f"alloc {result['alloc_peak_kib']:>8.1f}KiB  failures {result['failures']}"
+        )
+
+    def _compare(self, results, path, tolerance):
+        try:
+            with open(path, encoding='utf-8') as handle:
+                baseline = json.load(handle)['cases']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Could not read baseline {path}: {e}')
+
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            if result['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+                regressions.append(f"{name}: p50 {previous['p50_ms']:.2f}ms -> {result['p50_ms']:.2f}ms")
+            if result['p99_ms'] > previous['p99_ms'] * (1 + tolerance):
+                regressions.append(f"{name}: p99 {previous['p99_ms']:.2f}ms -> {result['p99_ms']:.2f}ms")
+            if result['queries'] > previous['queries']:
+                regressions.append(f"{name}: queries {previous['queries']} -> {result['queries']}")
+            if result['alloc_peak_kib'] > previous['alloc_peak_kib'] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: alloc {previous['alloc_peak_kib']:.1f}KiB -> {result['alloc_peak_kib']:.1f}KiB"
+                )
+
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            raise CommandError(f'{len(regressions)} regression(s) beyond {tolerance:.0%} tolerance')
+        self.stdout.write(self.style.SUCCESS(f'No regressions beyond {tolerance:.0%} tolerance'))
@@ -0,0 +1,142 @@
+import os
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+from django.utils.connection import ConnectionDoesNotExist
+from jobs.models import Job, Application
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare write and read throughput of the default and production SQLite profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each phase')
+        parser.add_argument('--jobs', type=int, default=2000, help='Jobs seeded into each scratch database')
+
+    def handle(self, *args, **options):
+        profiles = {
+            'default': ({}, 0),
+            'production': (settings.SQLITE_PRODUCTION_OPTIONS, 600),
+        }
+        results = {}
+        for name, (db_options, conn_max_age) in profiles.items():
+            with tempfile.TemporaryDirectory() as directory:
+                alias = f'sqlite_{name}'
+                self._add_database(alias, os.path.join(directory, 'bench.sqlite3'), db_options, conn_max_age)
+                try:
+                    self.stdout.write(f'Preparing {name} profile...')
+                    call_command('migrate', database=alias, verbosity=0)
+                    job_ids, worker_ids = self._seed(alias, options['jobs'], options['threads'])
+                    results[name] = {
+                        'write': self._measure(alias, conn_max_age, options, self._write_op(alias, job_ids, worker_ids)),
+                        'read': self._measure(alias, conn_max_age, options, self._read_op(alias)),
+                    }
+                finally:
+                    connections[alias].close()
+                    del connections.settings[alias]
+
+        self.stdout.write(f"{'profile':<12} {'phase':<6} {'ops/s':>10} {'locked':>8} {'errors':>8}")
+        for name, phases in results.items():
+            for phase, (rate, locked, errors) in phases.items():
+                self.stdout.write(f'{name:<12} {phase:<6} {rate:>10.1f} {locked:>8} {errors:>8}')
+        for phase in ('write', 'read'):
+            before, after = results['default'][phase][0], results['production'][phase][0]
+            if before:
+                self.stdout.write(f'{phase}: {after / before:.2f}x with the production profile')
+
+    def _add_database(self, alias, path, db_options, conn_max_age):
+        try:
+            connections[alias]
+        except ConnectionDoesNotExist:
+            pass
+        else:
+            raise CommandError(f'Database alias {alias} already exists')
+        connections.settings[alias] = connections.configure_settings({
+            'default': connections.settings['default'],
+            alias: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': path,
+                'OPTIONS': dict(db_options),
+                'CONN_MAX_AGE': conn_max_age,
+            }
+        })[alias]
+
+    def _seed(self, alias, job_count, thread_count):
+        employer = User.objects.db_manager(alias).create_user(
+            email='employer@bench.local', password=None, full_name='Bench Employer', role='employer', city='Pune'
+        )
+        User.objects.using(alias).bulk_create([
+            User(email=f'worker{index}@bench.local', username=f'worker{index}@bench.local',
+                 full_name=f'Worker {index}', role='worker', city='Pune')
+            for index in range(thread_count)
+        ])
+        Job.objects.using(alias).bulk_create([
+            Job(employer=employer, title=f'Job {index}', description='Benchmark job',
+                daily_wage=700, required_workers=1000000)
+            for index in range(job_count)
+        ], batch_size=1000)
+        job_ids = list(Job.objects.using(alias).values_list('pk', flat=True))
+        worker_ids = list(User.objects.using(alias).filter(role='worker').values_list('pk', flat=True))
+        return job_ids, worker_ids
+
+    def _write_op(self, alias, job_ids, worker_ids):
+        """The apply + accept write path: row lock, insert, F() slot update"""
+        def op(thread_index, counter):
+            job_id = job_ids[counter % len(job_ids)]
+            with transaction.atomic(using=alias):
+                job = Job.objects.using(alias).select_for_update().get(pk=job_id)
+                Application.objects.using(alias).update_or_create(
+                    job=job, worker_id=worker_ids[thread_index], defaults={'status': 'accepted'}
+                )
+                Job.objects.using(alias).filter(pk=job.pk).update(filled_slots=F('filled_slots') + 1)
+        return op
+
+    def _read_op(self, alias):
+        """The default job feed page"""
+        def op(thread_index, counter):
+            list(Job.objects.using(alias).select_related('employer')
+                 .filter(status='open').order_by('-created_at')[:20])
+        return op
+
+    def _measure(self, alias, conn_max_age, options, op):
+        """Run op from several threads for a fixed time, return (ops/s, locked, other errors)"""
+        deadline = time.perf_counter() + options['seconds']
+        totals = {'ops': 0, 'locked': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def run(thread_index):
+            done = locked = errors = counter = 0
+            while time.perf_counter() < deadline:
+                counter += 1
+                try:
+                    op(thread_index, counter * options['threads'] + thread_index)
+                    done += 1
+                except OperationalError as e:
+                    if 'locked' in str(e):
+                        locked += 1
+                    else:
+                        errors += 1
+                if not conn_max_age:
+                    # Without persistent connections every request reconnects
+                    connections[alias].close()
+            connections[alias].close()
+            with lock:
+                totals['ops'] += done
+                totals['locked'] += locked
+                totals['errors'] += errors
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return totals['ops'] / options['seconds'], totals['locked'], totals['errors']
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from worksite.schema import brotli, code_version, is_unversioned, write_schema
+
+
+class Command(BaseCommand):
+    help = 'Prebuild the OpenAPI schema (JSON and YAML, gzip and brotli) for the current code version'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--code-version', default=None,
+                            help='Code version to build for (default: CODE_VERSION or the git commit)')
+
+    def handle(self, *args, **options):
+        version = options['code_version'] or code_version()
+        if not options['code_version'] and is_unversioned(version):
+            # Files for the fallback version would never be served
+            raise CommandError('No code version: set CODE_VERSION or pass --code-version')
+        for path in write_schema(version):
+            self.stdout.write(f'{path} ({path.stat().st_size} bytes)')
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('brotli is not installed; only gzip variants were built'))
+        self.stdout.write(self.style.SUCCESS(f'Schema built for version {version}'))
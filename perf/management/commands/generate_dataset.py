@@ -0,0 +1,297 @@
+import csv
+import io
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from jobs.models import Job, Application
+
+User = get_user_model()
+
+DATASET_EMAIL_DOMAIN = 'bench.worksite.local'
+DATASET_PASSWORD = 'benchmark123'
+
+# City popularity is heavily skewed towards the metros, and so are wages
+CITIES = [
+    ('Mumbai', 30, 1.35), ('Pune', 18, 1.15), ('Delhi', 16, 1.30), ('Bengaluru', 12, 1.30),
+    ('Hyderabad', 8, 1.10), ('Chennai', 6, 1.10), ('Ahmedabad', 4, 0.95), ('Kolkata', 3, 0.95),
+    ('Nagpur', 1.5, 0.85), ('Nashik', 1, 0.80), ('Indore', 0.8, 0.80), ('Surat', 0.7, 0.85),
+]
+CITY_NAMES = [name for name, _, _ in CITIES]
+CITY_CUM_WEIGHTS = list(accumulate(weight for _, weight, _ in CITIES))
+CITY_WAGE_FACTOR = {name: factor for name, _, factor in CITIES}
+
+JOB_TITLES = [
+    'Mason', 'Electrician', 'Plumber', 'Carpenter', 'Painter', 'Welder', 'Helper',
+    'Bar Bender', 'Tile Fitter', 'Scaffolder', 'Crane Operator', 'Site Supervisor',
+]
+
+# Pareto shape for per-job application popularity, and its mean for xm=1
+POPULARITY_ALPHA = 1.5
+POPULARITY_MEAN = POPULARITY_ALPHA / (POPULARITY_ALPHA - 1)
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic, production-sized dataset of users, jobs and applications'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=100000)
+        parser.add_argument('--employers', type=int, default=5000)
+        parser.add_argument('--jobs', type=int, default=200000)
+        parser.add_argument('--applications', type=int, default=1000000,
+                            help='Approximate number of applications to create')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--days', type=int, default=365,
+                            help='Spread job creation over this many days before the anchor')
+        parser.add_argument('--anchor', default=None,
+                            help='ISO date the timeline ends at (default: today), fix it for reproducible timestamps')
+        parser.add_argument('--chunk-size', type=int, default=20000)
+        parser.add_argument('--method', choices=['auto', 'copy', 'executemany', 'bulk_create'], default='auto',
+                            help='Insert strategy; auto uses COPY on PostgreSQL and executemany elsewhere '
+                                 '(bulk_create stamps created_at with the current time)')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete previously generated dataset rows first')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        self.using = options['database']
+        self.connection = connections[self.using]
+        self.chunk_size = options['chunk_size']
+        self.method = options['method']
+        if self.method == 'auto':
+            self.method = 'copy' if self.connection.vendor == 'postgresql' else 'executemany'
+        if self.method == 'copy' and self.connection.vendor != 'postgresql':
+            raise CommandError('--method copy requires PostgreSQL')
+        if options['workers'] < 1 or options['employers'] < 1:
+            raise CommandError('At least one worker and one employer are required')
+
+        self.rng = random.Random(options['seed'])
+        if options['anchor']:
+            anchor = datetime.fromisoformat(options['anchor'])
+        else:
+            anchor = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        self.anchor = timezone.make_aware(anchor) if timezone.is_naive(anchor) else anchor
+        self.days = options['days']
+
+        if options['clear']:
+            self._clear()
+
+        if self.connection.vendor == 'sqlite':
+            # Durability is not needed for a throwaway dataset load
+            with self.connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+
+        started = time.monotonic()
+        city_workers, employer_cities = self._generate_users(options['workers'], options['employers'])
+        job_count, application_count = self._generate_jobs(
+            options['jobs'], options['applications'], city_workers, employer_cities
+        )
+        self._reset_sequences()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {options['workers'] + options['employers']} users, {job_count} jobs and "
+            f"{application_count} applications in {time.monotonic() - started:.1f}s "
+            f"using {self.method} (password: {DATASET_PASSWORD})"
+        ))
+
+    def _clear(self):
+        """Remove rows created by an earlier run, children first"""
+        generated = User.objects.using(self.using).filter(email__endswith=f'@{DATASET_EMAIL_DOMAIN}')
+        Application.objects.using(self.using).filter(job__employer__in=generated)._raw_delete(self.using)
+        Application.objects.using(self.using).filter(worker__in=generated)._raw_delete(self.using)
+        Job.objects.using(self.using).filter(employer__in=generated)._raw_delete(self.using)
+        generated.delete()
+
+    def _next_id(self, model):
+        return (model.objects.using(self.using).aggregate(max_id=Max('pk'))['max_id'] or 0) + 1
+
+    def _weighted_city(self):
+        return self.rng.choices(CITY_NAMES, cum_weights=CITY_CUM_WEIGHTS)[0]
+
+    def _random_time(self, not_before=None):
+        """Random aware datetime inside the dataset window, optionally after not_before"""
+        start = self.anchor - timedelta(days=self.days)
+        if not_before is not None and not_before > start:
+            start = not_before
+        span = max((self.anchor - start).total_seconds(), 1)
+        return start + timedelta(seconds=self.rng.random() * span)
+
+    def _generate_users(self, worker_count, employer_count):
+        password = make_password(DATASET_PASSWORD, salt='worksitebenchmarkdataset')
+        next_id = self._next_id(User)
+        city_workers = {name: [] for name in CITY_NAMES}
+        employer_cities = []
+        rows = []
+        for index in range(worker_count + employer_count):
+            user_id = next_id + index
+            is_worker = index < worker_count
+            role = 'worker' if is_worker else 'employer'
+            city = self._weighted_city()
+            joined = self._random_time()
+            email = f'{role}{user_id}@{DATASET_EMAIL_DOMAIN}'
+            if is_worker:
+                city_workers[city].append(user_id)
+            else:
+                employer_cities.append((user_id, city))
+            rows.append({
+                'id': user_id,
+                'password': password,
+                'username': email,
+                'email': email,
+                'full_name': f'{role.title()} {user_id}',
+                'role': role,
+                'city': city,
+                'is_oauth_complete': True,
+                'date_joined': joined,
+                'created_at': joined,
+                'updated_at': joined,
+            })
+            if len(rows) >= self.chunk_size:
+                self._insert(User, rows)
+                rows = []
+        self._insert(User, rows)
+        return city_workers, employer_cities
+
+    def _generate_jobs(self, job_count, application_target, city_workers, employer_cities):
+        all_workers = [worker for workers in city_workers.values() for worker in workers]
+        mean_applications = application_target / job_count if job_count else 0
+        next_job_id = self._next_id(Job)
+        next_application_id = self._next_id(Application)
+
+        # Employers post unevenly too: a few large contractors post most jobs
+        employer_weights = list(accumulate(self.rng.paretovariate(1.2) for _ in employer_cities))
+
+        job_rows, application_rows = [], []
+        application_count = 0
+        for index in range(job_count):
+            job_id = next_job_id + index
+            employer_id, city = self.rng.choices(employer_cities, cum_weights=employer_weights)[0]
+            wage_factor = CITY_WAGE_FACTOR[city]
+            daily_wage = Decimal(round(self.rng.lognormvariate(6.45, 0.3) * wage_factor, 2)).quantize(Decimal('0.01'))
+            required = min(int(self.rng.paretovariate(1.3)), 50)
+            created = self._random_time()
+
+            # Skewed popularity, mostly local applicants
+            wanted = round(mean_applications * self.rng.paretovariate(POPULARITY_ALPHA) / POPULARITY_MEAN)
+            local = city_workers[city]
+            pool = local if len(local) >= wanted and self.rng.random() < 0.8 else all_workers
+            applicants = self.rng.sample(pool, min(wanted, len(pool)))
+
+            age_days = (self.anchor - created).days
+            accepted = 0
+            for worker_id in applicants:
+                applied = self._random_time(not_before=created)
+                roll = self.rng.random()
+                if accepted < required and roll < 0.25:
+                    status = 'accepted'
+                    accepted += 1
+                elif roll < 0.55 or age_days > 30:
+                    status = 'rejected'
+                else:
+                    status = 'pending'
+                application_rows.append({
+                    'id': next_application_id + application_count,
+                    'job_id': job_id,
+                    'worker_id': worker_id,
+                    'status': status,
+                    'applied_at': applied,
+                    'updated_at': applied,
+                })
+                application_count += 1
+
+            # Same invariant Job.save enforces: a full job is closed
+            if accepted >= required or (age_days > 60 and self.rng.random() < 0.9):
+                status = 'closed'
+            else:
+                status = 'open'
+            job_rows.append({
+                'id': job_id,
+                'employer_id': employer_id,
+                'title': f'{self.rng.choice(JOB_TITLES)} needed in {city}',
+                'description': f'{required} workers needed for a construction site in {city}.',
+                'daily_wage': daily_wage,
+                'required_workers': required,
+                'filled_slots': accepted,
+                'status': status,
+                'city': city,
+                'created_at': created,
+                'updated_at': created,
+            })
+
+            if len(application_rows) >= self.chunk_size or len(job_rows) >= self.chunk_size:
+                self._insert(Job, job_rows)
+                self._insert(Application, application_rows)
+                job_rows, application_rows = [], []
+                self.stdout.write(f'  {index + 1}/{job_count} jobs, {application_count} applications')
+
+        self._insert(Job, job_rows)
+        self._insert(Application, application_rows)
+        return job_count, application_count
+
+    def _insert(self, model, rows):
+        """Write one chunk of row dicts with the selected strategy"""
+        if not rows:
+            return
+        if self.method == 'bulk_create':
+            with transaction.atomic(using=self.using):
+                model.objects.using(self.using).bulk_create(
+                    [model(**row) for row in rows], batch_size=self.chunk_size
+                )
+            return
+
+        fields = model._meta.concrete_fields
+        columns_spec = [(field.attname, field.get_default(), self._adapter(field)) for field in fields]
+        values = [
+            [
+                adapt(row.get(attname, default)) if adapt else row.get(attname, default)
+                for attname, default, adapt in columns_spec
+            ]
+            for row in rows
+        ]
+        table = self.connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(self.connection.ops.quote_name(field.column) for field in fields)
+
+        with transaction.atomic(using=self.using), self.connection.cursor() as cursor:
+            if self.method == 'copy':
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row in values:
+                    writer.writerow(['\\N' if value is None else value for value in row])
+                buffer.seek(0)
+                copy_sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+                raw = cursor.cursor
+                if hasattr(raw, 'copy_expert'):
+                    raw.copy_expert(copy_sql, buffer)
+                else:
+                    with raw.copy(copy_sql) as copy:
+                        copy.write(buffer.getvalue())
+            else:
+                placeholders = ', '.join(['%s'] * len(fields))
+                cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', values)
+
+    def _adapter(self, field):
+        """Return a value adapter for fields the driver can't take as-is, else None"""
+        ops = self.connection.ops
+        internal_type = field.get_internal_type()
+        if internal_type == 'DateTimeField':
+            return lambda value: None if value is None else ops.adapt_datetimefield_value(value)
+        if internal_type == 'DecimalField':
+            return lambda value: ops.adapt_decimalfield_value(value, field.max_digits, field.decimal_places)
+        return None
+
+    def _reset_sequences(self):
+        """Move PostgreSQL sequences past the explicitly assigned ids"""
+        statements = self.connection.ops.sequence_reset_sql(no_style(), [User, Job, Application])
+        if statements:
+            with self.connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
@@ -0,0 +1,224 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import User
+from perf.stats import summarize
+from .generate_dataset import DATASET_EMAIL_DOMAIN, DATASET_PASSWORD
+
+# Captured sign-ins are replayed as a sign-in with the role's account;
+# other auth requests (sign-up, sign-out, OAuth) are not replayed
+LOGIN_ROUTE = 'api/auth/login'
+AUTH_PREFIX = 'api/auth/'
+
+
+class Command(BaseCommand):
+    help = 'Replay captured requests.jsonl traffic against a running server and report per-route latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='?', default='requests.jsonl')
+        parser.add_argument('--base-url', default='http://localhost:8000')
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--ramp-up', type=float, default=0.0,
+                            help='Seconds over which worker threads are started')
+        parser.add_argument('--loops', type=int, default=1,
+                            help='Number of passes over the captured file')
+        parser.add_argument('--duration', type=float, default=None,
+                            help='Keep cycling through the file for this many seconds instead of --loops')
+        parser.add_argument('--login', action='append', default=[], metavar='ROLE=EMAIL:PASSWORD',
+                            help='Account used to replay requests captured for a role '
+                                 '(default: a generate_dataset account of that role)')
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument('--output', help='Also write the report as JSON to this path')
+
+    def handle(self, *args, **options):
+        import requests
+
+        self.requests = requests
+        self.base_url = options['base_url'].rstrip('/')
+        self.timeout = options['timeout']
+        self.credentials = {**self._dataset_logins(), **self._parse_logins(options['login'])}
+        records = self._load(options['file'])
+        if not records:
+            raise CommandError(f"No replayable requests found in {options['file']}")
+
+        concurrency = max(1, options['concurrency'])
+        deadline = None
+        total = len(records) * max(1, options['loops'])
+        if options['duration']:
+            deadline = time.monotonic() + options['ramp_up'] + options['duration']
+            total = None
+
+        self.records = records
+        self.total = total
+        self.deadline = deadline
+        self.cursor = 0
+        self.cursor_lock = threading.Lock()
+        self.results = []
+
+        threads = []
+        started = time.monotonic()
+        for index in range(concurrency):
+            delay = options['ramp_up'] * index / concurrency
+            thread = threading.Thread(target=self._worker, args=(delay,), daemon=True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        report = self._report(elapsed, concurrency)
+        self._print(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2)
+
+    def _parse_logins(self, values):
+        credentials = {}
+        for value in values:
+            try:
+                role, account = value.split('=', 1)
+                email, password = account.split(':', 1)
+            except ValueError:
+                raise CommandError(f'Invalid --login value "{value}", expected ROLE=EMAIL:PASSWORD')
+            credentials[role] = (email, password)
+        return credentials
+
+    def _dataset_logins(self):
+        """ROLE -> (email, password) for the first generated worker and employer in the database"""
+        credentials = {}
+        for role in ('worker', 'employer'):
+            email = (User.objects.filter(role=role, email__endswith=f'@{DATASET_EMAIL_DOMAIN}')
+                     .order_by('pk').values_list('email', flat=True).first())
+            if email:
+                credentials[role] = (email, DATASET_PASSWORD)
+        return credentials
+
+    def _load(self, path):
+        records = []
+        try:
+            with open(path, encoding='utf-8') as handle:
+                for line in handle:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if 'method' not in record or 'path' not in record:
+                        continue
+                    route = record.get('route') or record['path'].lstrip('/')
+                    if route.startswith(AUTH_PREFIX) and route != LOGIN_ROUTE:
+                        continue
+                    records.append(record)
+        except FileNotFoundError:
+            raise CommandError(f'File not found: {path}')
+        return records
+
+    def _next_record(self):
+        """Hand out the next record, or None once the run is over"""
+        with self.cursor_lock:
+            if self.total is not None and self.cursor >= self.total:
+                return None
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                return None
+            record = self.records[self.cursor % len(self.records)]
+            self.cursor += 1
+            return record
+
+    def _session_for(self, sessions, role):
+        """Return a logged-in session for the role, creating it on first use"""
+        if role in sessions:
+            return sessions[role]
+        session = self.requests.Session()
+        if role in self.credentials:
+            email, password = self.credentials[role]
+            session.post(f'{self.base_url}/api/auth/login',
+                         json={'email': email, 'password': password}, timeout=self.timeout)
+        sessions[role] = session
+        return session
+
+    def _worker(self, delay):
+        time.sleep(delay)
+        sessions = {}
+        while True:
+            record = self._next_record()
+            if record is None:
+                return
+            route = record.get('route') or record['path'].lstrip('/')
+            key = f"{record['method']} {route}"
+            kwargs = {'params': record.get('params') or None, 'timeout': self.timeout}
+            body = record.get('body')
+            if route == LOGIN_ROUTE:
+                # The captured body has a redacted password and a pseudonymous
+                # email: sign in the account of the role it signed in as, on a
+                # session of its own so the role's session stays signed in
+                email, password = self.credentials.get(record.get('signed_in_as'),
+                                                       next(iter(self.credentials.values()), ('', '')))
+                session = self.requests.Session()
+                body = {'email': email, 'password': password}
+                record = dict(record, content_type='application/json')
+            else:
+                session = self._session_for(sessions, record.get('role', 'anonymous'))
+            if body is not None:
+                if record.get('content_type') == 'application/json':
+                    kwargs['json'] = body
+                else:
+                    kwargs['data'] = body
+            csrf_token = session.cookies.get('csrftoken')
+            if csrf_token:
+                kwargs['headers'] = {'X-CSRFToken': csrf_token, 'Referer': self.base_url}
+
+            started = time.monotonic()
+            try:
+                response = session.request(record['method'], self.base_url + record['path'], **kwargs)
+                status_code = response.status_code
+            except self.requests.RequestException:
+                status_code = None
+            self.results.append((key, status_code, time.monotonic() - started))
+
+    def _report(self, elapsed, concurrency):
+        by_route = defaultdict(list)
+        for key, status_code, latency in self.results:
+            by_route[key].append((status_code, latency))
+
+        routes = {}
+        for key, samples in sorted(by_route.items()):
+            latencies = [latency for _, latency in samples]
+            client_errors = sum(1 for code, _ in samples if code is not None and 400 <= code < 500)
+            errors = sum(1 for code, _ in samples if code is None or code >= 500)
+            routes[key] = dict(
+                summarize(latencies),
+                rps=len(samples) / elapsed if elapsed else 0.0,
+                client_error_rate=client_errors / len(samples),
+                error_rate=errors / len(samples),
+            )
+
+        total_errors = sum(1 for _, code, _ in self.results if code is None or code >= 500)
+        return {
+            'concurrency': concurrency,
+            'elapsed_s': elapsed,
+            'requests': len(self.results),
+            'throughput_rps': len(self.results) / elapsed if elapsed else 0.0,
+            'error_rate': total_errors / len(self.results) if self.results else 0.0,
+            'latency': summarize([latency for _, _, latency in self.results]),
+            'routes': routes,
+        }
+
+    def _print(self, report):
+        self.stdout.write(
+            f"{report['requests']} requests in {report['elapsed_s']:.2f}s "
+            f"({report['throughput_rps']:.1f} req/s, concurrency {report['concurrency']}, "
+            f"errors {report['error_rate']:.2%})"
+        )
+        header = f"{'route':<55} {'count':>7} {'rps':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'4xx':>7} {'err':>7}"
+        self.stdout.write(header)
+        self.stdout.write('-' * len(header))
+        for key, row in report['routes'].items():
+            self.stdout.write(
+                f"{key[:55]:<55} {row['count']:>7} {row['rps']:>8.1f} {row['p50_ms']:>8.1f} "
+                f"{row['p90_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['client_error_rate']:>7.1%} "
+                f"{row['error_rate']:>7.1%}"
+            )
@@ -0,0 +1,34 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from perf.slow_queries import top_queries
+
+
+class Command(BaseCommand):
+    help = 'Report the slowest query shapes from the slow query log, by total time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=24, help='Report queries from the last HOURS')
+        parser.add_argument('--limit', type=int, default=20, help='Query shapes to list')
+        parser.add_argument('--view', help='Only queries run by this view (URL name, e.g. job-list)')
+        parser.add_argument('--full-scans', action='store_true', help='Only queries whose plan reads a whole table')
+        parser.add_argument('--plans', action='store_true', help='Print the latest plan of each shape')
+
+    def handle(self, *args, **options):
+        if options['limit'] < 1:
+            raise CommandError('--limit must be positive')
+        since = timezone.now() - timedelta(hours=options['hours'])
+        rows = top_queries(since, options['limit'], options['view'], options['full_scans'])
+        if not rows:
+            self.stdout.write('No slow queries recorded')
+            return
+        self.stdout.write(f"{'total ms':>10} {'count':>6} {'avg ms':>8} {'max ms':>8} {'scans':>6}  shape")
+        for row in rows:
+            self.stdout.write(
+                f"{row['total_ms']:>10.0f} {row['count']:>6} {row['avg_ms']:>8.1f} {row['max_ms']:>8.1f} "
+                f"{row['full_scans']:>6}  {row['shape'][:200]}"
+            )
+            self.stdout.write(f"{'':>43}views: {', '.join(row['views'])}")
+            if options['plans'] and row['plan']:
+                for line in row['plan'].splitlines():
+                    self.stdout.write(f"{'':>43}| {line}")
@@ -0,0 +1,148 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from perf.stats import summarize
+
+TARGETS = {'wsgi': 'worksite.wsgi', 'asgi': 'worksite.asgi'}
+
+
+class Command(BaseCommand):
+    help = 'Measure worker cold start: import time and memory per module, and total startup time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', choices=TARGETS, default='wsgi')
+        parser.add_argument('--no-urls', action='store_true',
+                            help="Don't load the URLconf (normally loaded by the first request)")
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to time')
+        parser.add_argument('--top', type=int, default=20, help='Modules to list')
+        parser.add_argument('--save', metavar='PATH', help='Write the cold-start figures as a JSON baseline')
+        parser.add_argument('--compare', metavar='PATH', help='Compare against a JSON baseline')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed slowdown or growth before it counts as a regression (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be positive')
+        module = TARGETS[options['target']]
+        probe = [module] if options['no_urls'] else [module, '--urls']
+
+        # Profiling slows imports down, so timing runs are kept separate
+        runs = [self._probe(probe)[0] for _ in range(options['runs'])]
+        _, import_times = self._probe(probe, '-X', 'importtime')
+        memory = self._probe(probe + ['--memory'])[0]['memory']
+
+        cold_start = dict(
+            summarize([run['total_ms'] / 1000 for run in runs]),
+            max_rss_kib=sorted(run['max_rss_kib'] or 0 for run in runs)[len(runs) // 2],
+            modules=runs[0]['modules'],
+        )
+        self._print_summary(module, options, cold_start)
+        packages = self._print_packages(import_times, memory)
+        self._print_modules(import_times, memory, options['top'])
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'target': module,
+            'urls': not options['no_urls'],
+            'cold_start': cold_start,
+            'packages': packages,
+        }
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(f"Baseline written to {options['save']}")
+        if options['compare']:
+            self._compare(cold_start, options['compare'], options['tolerance'])
+
+    def _probe(self, probe, *interpreter_flags):
+        """Run perf.startup in a fresh interpreter; return its report and -X importtime rows"""
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        completed = subprocess.run(
+            [sys.executable, *interpreter_flags, '-m', 'perf.startup', *probe],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise CommandError(f'Startup probe failed:\n{completed.stderr[-2000:]}')
+        report = json.loads(completed.stdout.strip().splitlines()[-1])
+        return report, self._parse_importtime(completed.stderr)
+
+    def _parse_importtime(self, output):
+        """{module: (self_us, cumulative_us)} from -X importtime output"""
+        rows = {}
+        for line in output.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            fields = line[len('import time:'):].split('|')
+            if len(fields) != 3 or not fields[0].strip().isdigit():
+                continue  # the header row
+            rows[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+        return rows
+
+    def _print_summary(self, module, options, cold_start):
+        scope = module if options['no_urls'] else f'{module} + URLconf'
+        self.stdout.write(
+            f"Cold start ({scope}), {cold_start['count']} runs: p50 {cold_start['p50_ms']:.1f}ms  "
+            f"max {cold_start['max_ms']:.1f}ms  RSS {cold_start['max_rss_kib'] / 1024:.1f}MiB  "
+            f"modules {cold_start['modules']}"
+        )
+
+    def _print_packages(self, import_times, memory):
+        packages = defaultdict(lambda: {'self_ms': 0.0, 'memory_kib': 0.0, 'modules': 0})
+        for name, (self_us, _) in import_times.items():
+            package = packages[name.split('.')[0]]
+            package['self_ms'] += self_us / 1000
+            package['modules'] += 1
+        for name, size in memory.items():
+            if name in import_times:
+                packages[name.split('.')[0]]['memory_kib'] += size / 1024
+
+        self.stdout.write('')
+        self.stdout.write(f"{'package':<28} {'self ms':>9} {'memory KiB':>11} {'modules':>8}")
+        ordered = sorted(packages.items(), key=lambda item: item[1]['self_ms'], reverse=True)
+        for name, package in ordered:
+            if package['self_ms'] < 1 and package['memory_kib'] < 64:
+                continue
+            self.stdout.write(
+                f"{name:<28} {package['self_ms']:>9.1f} {package['memory_kib']:>11.1f} {package['modules']:>8}"
+            )
+        return dict(ordered)
+
+    def _print_modules(self, import_times, memory, top):
+        self.stdout.write('')
+        self.stdout.write(f"{'slowest imports (cumulative)':<48} {'cumul ms':>9} {'self ms':>8} {'memory KiB':>11}")
+        ordered = sorted(import_times.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (self_us, cumulative_us) in ordered[:top]:
+            self.stdout.write(
+                f"{name:<48} {cumulative_us / 1000:>9.1f} {self_us / 1000:>8.1f} "
+                f"{memory.get(name, 0) / 1024:>11.1f}"
+            )
+
+    def _compare(self, cold_start, path, tolerance):
+        try:
+            with open(path, encoding='utf-8') as handle:
+                baseline = json.load(handle)['cold_start']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Could not read baseline {path}: {e}')
+
+        regressions = []
+        if cold_start['p50_ms'] > baseline['p50_ms'] * (1 + tolerance):
+            regressions.append(f"cold start p50 {baseline['p50_ms']:.1f}ms -> {cold_start['p50_ms']:.1f}ms")
+        if cold_start['max_rss_kib'] > baseline['max_rss_kib'] * (1 + tolerance):
+            regressions.append(
+                f"RSS {baseline['max_rss_kib'] / 1024:.1f}MiB -> {cold_start['max_rss_kib'] / 1024:.1f}MiB"
+            )
+        if cold_start['modules'] > baseline['modules']:
+            regressions.append(f"modules {baseline['modules']} -> {cold_start['modules']}")
+
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            raise CommandError(f'{len(regressions)} regression(s) beyond {tolerance:.0%} tolerance')
+        self.stdout.write(self.style.SUCCESS(f'No regressions beyond {tolerance:.0%} tolerance'))
@@ -0,0 +1,160 @@
+import multiprocessing
+import os
+import random
+import time
+from collections import defaultdict
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from jobs.models import Job, Application
+from perf.stats import summarize
+from perf.stress import collect_operations
+
+User = get_user_model()
+
+STRESS_EMAIL_DOMAIN = 'stress.worksite.local'
+OPERATIONS = ('apply', 'accept', 'reject', 'remove')
+
+
+class Command(BaseCommand):
+    help = 'Hammer one job with concurrent applies, accepts, rejects and removals and check the slot invariants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--workers', type=int, default=500, help='Distinct worker accounts')
+        parser.add_argument('--slots', type=int, default=20, help='required_workers of the contested job')
+        parser.add_argument('--operations', type=int, default=2000, help='Operations per run, across all processes')
+        parser.add_argument('--mix', default='apply=50,accept=25,reject=15,remove=10',
+                            help='Relative weights of apply, accept, reject and remove')
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--keep', action='store_true', help='Keep the stress accounts and jobs afterwards')
+
+    def handle(self, *args, **options):
+        weights = self._parse_mix(options['mix'])
+        rng = random.Random(options['seed'])
+        employer, worker_ids = self._create_accounts(options['workers'])
+        self.stdout.write(
+            f"Backend {connection.vendor}: {options['processes']} processes, {options['operations']} operations "
+            f"per run against a {options['slots']}-slot job"
+        )
+
+        failed_runs = 0
+        try:
+            for run in range(1, options['runs'] + 1):
+                job = Job.objects.create(
+                    employer=employer, title=f'Stress job {run}', description='Concurrency stress test',
+                    daily_wage=500, required_workers=options['slots'],
+                )
+                operations = [
+                    (rng.choices(OPERATIONS, weights=weights)[0], rng.choice(worker_ids))
+                    for _ in range(options['operations'])
+                ]
+                samples, elapsed = self._execute(job, employer, operations, options['processes'])
+                problems = self._check_invariants(job)
+                self._report(run, samples, elapsed, problems)
+                if problems:
+                    failed_runs += 1
+        finally:
+            if not options['keep']:
+                User.objects.filter(email__endswith=f'@{STRESS_EMAIL_DOMAIN}').delete()
+
+        if failed_runs:
+            raise CommandError(f'Invariant violations in {failed_runs} of {options["runs"]} runs')
+        self.stdout.write(self.style.SUCCESS('All hiring invariants held'))
+
+    def _parse_mix(self, mix):
+        weights = dict.fromkeys(OPERATIONS, 0.0)
+        try:
+            for part in mix.split(','):
+                name, weight = part.split('=')
+                if name.strip() not in weights:
+                    raise ValueError(name)
+                weights[name.strip()] = float(weight)
+        except ValueError:
+            raise CommandError(f'Invalid --mix "{mix}", expected e.g. apply=50,accept=25,reject=15,remove=10')
+        return [weights[name] for name in OPERATIONS]
+
+    def _create_accounts(self, worker_count):
+        """Create one employer and a pool of workers sharing a password hash"""
+        User.objects.filter(email__endswith=f'@{STRESS_EMAIL_DOMAIN}').delete()
+        password = make_password('stress123')
+        employer = User.objects.create(
+            email=f'employer@{STRESS_EMAIL_DOMAIN}', username=f'employer@{STRESS_EMAIL_DOMAIN}',
+            password=password, full_name='Stress Employer', role='employer', city='Pune',
+        )
+        User.objects.bulk_create([
+            User(email=f'worker{index}@{STRESS_EMAIL_DOMAIN}', username=f'worker{index}@{STRESS_EMAIL_DOMAIN}',
+                 password=password, full_name=f'Stress Worker {index}', role='worker', city='Pune')
+            for index in range(worker_count)
+        ], batch_size=1000)
+        worker_ids = list(User.objects.filter(email__endswith=f'@{STRESS_EMAIL_DOMAIN}', role='worker')
+                          .values_list('pk', flat=True))
+        return employer, worker_ids
+
+    def _execute(self, job, employer, operations, process_count):
+        """Split the operations across processes that start together and wait for them"""
+        context = multiprocessing.get_context('spawn')
+        barrier = context.Barrier(process_count + 1)
+        settings_module = os.environ.get('DJANGO_SETTINGS_MODULE', 'worksite.settings')
+        connections.close_all()
+
+        queue = context.Queue()
+        processes = [
+            context.Process(target=collect_operations, args=(queue, settings_module, job.pk, employer.pk,
+                                                             operations[index::process_count], barrier))
+            for index in range(process_count)
+        ]
+        for process in processes:
+            process.start()
+        barrier.wait()
+        started = time.perf_counter()
+        samples = []
+        for _ in processes:
+            samples.extend(queue.get())
+        elapsed = time.perf_counter() - started
+        for process in processes:
+            process.join()
+        return samples, elapsed
+
+    def _check_invariants(self, job):
+        job.refresh_from_db()
+        accepted = Application.objects.filter(job=job, status='accepted').count()
+        problems = []
+        if job.filled_slots > job.required_workers:
+            problems.append(f'overbooked: filled_slots {job.filled_slots} > required_workers {job.required_workers}')
+        if job.filled_slots < 0:
+            problems.append(f'negative filled_slots {job.filled_slots}')
+        if job.filled_slots != accepted:
+            problems.append(f'filled_slots {job.filled_slots} != {accepted} accepted applications')
+        if job.filled_slots >= job.required_workers and job.status != 'closed':
+            problems.append(f'status {job.status!r} on a full job')
+        if job.filled_slots < job.required_workers and job.status != 'open':
+            problems.append(f'status {job.status!r} with {job.available_slots} free slots')
+        return problems
+
+    def _report(self, run, samples, elapsed, problems):
+        by_op = defaultdict(list)
+        for op, status_code, latency, lock_failure in samples:
+            by_op[op].append((status_code, latency, lock_failure))
+
+        executed = sum(1 for _, status_code, _, _ in samples if status_code is not None)
+        self.stdout.write(f'Run {run}: {executed} requests in {elapsed:.2f}s ({executed / elapsed:.1f} req/s)')
+        for op in OPERATIONS:
+            rows = by_op.get(op, [])
+            sent = [row for row in rows if row[0] is not None]
+            if not rows:
+                continue
+            stats = summarize([latency for _, latency, _ in sent])
+            ok = sum(1 for code, _, _ in sent if code < 400)
+            rejected = sum(1 for code, _, _ in sent if 400 <= code < 500)
+            errors = sum(1 for code, _, _ in sent if code >= 500)
+            locks = sum(1 for _, _, lock_failure in sent if lock_failure)
+            self.stdout.write(
+                f"  {op:<7} sent {len(sent):>6}  skipped {len(rows) - len(sent):>5}  ok {ok:>6}  4xx {rejected:>6}  "
+                f"5xx {errors:>5}  lock failures {locks / len(sent) if sent else 0:>6.1%}  "
+                f"p50 {stats['p50_ms']:>7.1f}ms  p99 {stats['p99_ms']:>7.1f}ms"
+            )
+        for problem in problems:
+            self.stdout.write(self.style.ERROR(f'  INVARIANT VIOLATED: {problem}'))
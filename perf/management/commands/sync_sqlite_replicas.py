@@ -0,0 +1,40 @@
+import sqlite3
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database onto the file-based read replicas in DB_REPLICAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep re-syncing every N seconds to emulate replication lag')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('sync_sqlite_replicas only works with the SQLite backend')
+        if not settings.REPLICA_DATABASES:
+            raise CommandError('No replicas configured, set DB_REPLICAS to one or more database files')
+
+        while True:
+            self._sync(primary['NAME'])
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
+
+    def _sync(self, primary_path):
+        # The backup API takes a consistent snapshot even while the primary is written
+        source = sqlite3.connect(primary_path)
+        try:
+            for alias in settings.REPLICA_DATABASES:
+                target_path = settings.DATABASES[alias]['NAME']
+                target = sqlite3.connect(target_path)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'Synced {alias} ({target_path})')
+        finally:
+            source.close()
@@ -0,0 +1,235 @@
+import hashlib
+import hmac
+import json
+import random
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import QueryDict
+from django.utils import timezone
+from .models import RequestProfile
+from .profiling import RequestProfiler
+from .slow_queries import query_context
+
+
+REDACTED = '[REDACTED]'
+
+# Any body or query key containing one of these fragments is masked
+SECRET_KEY_FRAGMENTS = ('password', 'token', 'secret', 'csrf', 'session', 'code', 'key')
+
+# Personal data under keys containing these is replaced by a stable pseudonym
+PERSONAL_KEY_FRAGMENTS = ('email', 'phone', 'mobile', 'name', 'address')
+
+CAPTURED_CONTENT_TYPES = ('application/json', 'application/x-www-form-urlencoded')
+
+
+def pseudonym(key, value):
+    """
+    Stand-in for a personal value, keyed on SECRET_KEY: the same person
+    gets the same pseudonym across a capture, but it can't be reversed
+    """
+    if isinstance(value, list):
+        return [pseudonym(key, item) for item in value]
+    if isinstance(value, dict):
+        return redact(value)
+    if not isinstance(value, (str, int)) or isinstance(value, bool) or value == '':
+        return value
+    digest = hmac.new(settings.SECRET_KEY.encode(), str(value).encode(), hashlib.sha256).hexdigest()
+    if 'email' in key:
+        return f'user-{digest[:12]}@example.com'
+    if 'phone' in key or 'mobile' in key:
+        return '9' + str(int(digest[:16], 16))[-9:].zfill(9)
+    return f'Person {digest[:8]}'
+
+
+def redact(value):
+    """Recursively mask secret-looking keys and pseudonymise personal ones in captured request data"""
+    if isinstance(value, dict):
+        redacted = {}
+        for key, item in value.items():
+            name = str(key).lower()
+            if any(fragment in name for fragment in SECRET_KEY_FRAGMENTS):
+                redacted[key] = REDACTED
+            elif any(fragment in name for fragment in PERSONAL_KEY_FRAGMENTS):
+                redacted[key] = pseudonym(name, item)
+            else:
+                redacted[key] = redact(item)
+        return redacted
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+class TrafficCaptureMiddleware:
+    """
+    Sample real request shapes into a JSON lines file for replay.
+
+    Secrets are masked and personal data (emails, phone numbers, names,
+    addresses) pseudonymised before anything is written. A request that
+    signs someone in records the role it signed in as, so replay_traffic
+    can sign in its own account for that role instead. Disabled unless TRAFFIC_CAPTURE_RATE is above zero, in which case
+    Django drops the middleware from the chain at startup.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.rate = getattr(settings, 'TRAFFIC_CAPTURE_RATE', 0.0)
+        if self.rate <= 0:
+            raise MiddlewareNotUsed('Traffic capture disabled')
+        self.get_response = get_response
+        self.path = settings.TRAFFIC_CAPTURE_FILE
+        self.max_body = getattr(settings, 'TRAFFIC_CAPTURE_MAX_BODY', 65536)
+
+    def __call__(self, request):
+        if not request.path.startswith('/api/') or random.random() >= self.rate:
+            return self.get_response(request)
+
+        # Read the body before the view consumes the stream, and the role
+        # before login/logout can change it
+        body = self._capture_body(request)
+        user = getattr(request, 'user', None)
+        role = user.role if user is not None and user.is_authenticated else 'anonymous'
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        signed_in_as = user.role if user is not None and user.is_authenticated else 'anonymous'
+
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'route': match.route.lstrip('^').rstrip('$') if match else None,
+            'params': redact({key: request.GET.getlist(key) for key in request.GET}),
+            'body': redact(body),
+            'content_type': request.content_type,
+            'role': role,
+            'status': response.status_code,
+            'signed_in_as': signed_in_as if signed_in_as != role else None,
+            'captured_at': timezone.now().isoformat(),
+        }
+        self._write(record)
+        return response
+
+    def _capture_body(self, request):
+        """Return the parsed request body, or None if it is not worth capturing"""
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return None
+        if request.content_type not in CAPTURED_CONTENT_TYPES:
+            return None
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return None
+        if length > self.max_body:
+            return None
+        if request.content_type == 'application/json':
+            try:
+                return json.loads(request.body or b'null')
+            except ValueError:
+                return None
+        form = QueryDict(request.body)
+        return {key: form.getlist(key) for key in form}
+
+    def _write(self, record):
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as handle:
+                handle.write(line)
+
+
+class RequestProfilerMiddleware:
+    """
+    Profile requests into RequestProfile: those an admin sends with an
+    X-Profile header (the response then carries X-Profile-Id) and a share
+    of each view's requests per PROFILE_SAMPLE_RATES.
+
+    Other requests only pay for a header and dictionary lookup. With
+    PROFILING_ENABLED off Django drops the middleware at startup.
+    Streaming responses are profiled until the response object is
+    returned, not while their body is sent.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed('Request profiling disabled')
+        self.get_response = get_response
+        self.rates = settings.PROFILE_SAMPLE_RATES
+        self.interval = settings.PROFILE_INTERVAL_MS / 1000
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        profiler = getattr(request, '_profiler', None)
+        if profiler is not None:
+            profile = self._save(request, response, profiler)
+            if profile.reason == 'header':
+                response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        reason = self._reason(request)
+        if reason is not None:
+            # Samples stop at this middleware's __call__, below which is server plumbing
+            request._profiler = RequestProfiler(self.interval, type(self).__call__.__code__).start()
+            request._profile_reason = reason
+        return None
+
+    def _reason(self, request):
+        if request.META.get('HTTP_X_PROFILE'):
+            user = request.user
+            if user.is_authenticated and user.role == 'admin':
+                return 'header'
+        if not self.rates:
+            return None
+        view_name = request.resolver_match.view_name
+        rate = self.rates.get(view_name, self.rates.get('*', 0))
+        return 'sampled' if rate > 0 and random.random() < rate else None
+
+    def _save(self, request, response, profiler):
+        stacks = profiler.stop()
+        user = request.user
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=request.path[:500],
+            view_name=request.resolver_match.view_name,
+            status_code=response.status_code,
+            user=user if user.is_authenticated else None,
+            reason=request._profile_reason,
+            duration_ms=profiler.seconds * 1000,
+            queries=profiler.queries,
+            query_ms=profiler.query_seconds * 1000,
+            samples=profiler.samples,
+            interval_ms=self.interval * 1000,
+            stacks=stacks,
+        )
+        RequestProfile.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=settings.PROFILE_RETENTION_DAYS)
+        ).delete()
+        return profile
+
+
+class QueryContextMiddleware:
+    """
+    Tag slow queries with the view and action that ran them: the URL name
+    and, for viewsets, the action (else the HTTP method).
+
+    Removed from the chain at startup when the slow query log is off.
+    """
+
+    def __init__(self, get_response):
+        if settings.SLOW_QUERY_MS <= 0:
+            raise MiddlewareNotUsed('Slow query log disabled')
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = query_context.set(('', ''))
+        try:
+            return self.get_response(request)
+        finally:
+            query_context.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(request.method.lower(), request.method)
+        query_context.set((request.resolver_match.view_name, action))
+        return None
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500)),
+                ('view_name', models.CharField(blank=True, default='', max_length=200)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('reason', models.CharField(choices=[('header', 'Requested with X-Profile'), ('sampled', 'Sampled')], max_length=10)),
+                ('duration_ms', models.FloatField()),
+                ('queries', models.PositiveIntegerField()),
+                ('query_ms', models.FloatField()),
+                ('samples', models.PositiveIntegerField()),
+                ('interval_ms', models.FloatField()),
+                ('stacks', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_profiles', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'request_profiles',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['view_name', 'created_at'], name='request_pro_view_na_9aea7e_idx')],
+            },
+        ),
+    ]
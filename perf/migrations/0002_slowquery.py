@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 03:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('perf', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=16)),
+                ('shape', models.TextField()),
+                ('sql', models.TextField()),
+                ('params', models.TextField(blank=True, default='')),
+                ('database', models.CharField(max_length=50)),
+                ('duration_ms', models.FloatField()),
+                ('view_name', models.CharField(blank=True, default='', max_length=200)),
+                ('action', models.CharField(blank=True, default='', max_length=50)),
+                ('plan', models.TextField(blank=True, default='')),
+                ('full_scan', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'db_table': 'slow_queries',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['fingerprint', 'created_at'], name='slow_querie_fingerp_2c76bc_idx')],
+            },
+        ),
+    ]
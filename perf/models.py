@@ -0,0 +1,70 @@
+from django.db import models
+from django.conf import settings
+
+
+class RequestProfile(models.Model):
+    """Stack samples of one profiled request (see perf/middleware.py)"""
+
+    REASON_CHOICES = (
+        ('header', 'Requested with X-Profile'),
+        ('sampled', 'Sampled'),
+    )
+
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=200, blank=True, default='')
+    status_code = models.PositiveSmallIntegerField()
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='request_profiles'
+    )
+    reason = models.CharField(max_length=10, choices=REASON_CHOICES)
+    duration_ms = models.FloatField()
+    queries = models.PositiveIntegerField()
+    query_ms = models.FloatField()
+    samples = models.PositiveIntegerField()
+    interval_ms = models.FloatField()
+    # Collapsed stacks: "frame;frame;frame count" per line
+    stacks = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+    class Meta:
+        db_table = 'request_profiles'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['view_name', 'created_at']),
+        ]
+
+
+class SlowQuery(models.Model):
+    """A query that took at least SLOW_QUERY_MS (see perf/slow_queries.py)"""
+
+    # Hash of the SQL shape: the SQL with its values replaced by ?
+    fingerprint = models.CharField(max_length=16)
+    shape = models.TextField()
+    sql = models.TextField()
+    params = models.TextField(blank=True, default='')
+    database = models.CharField(max_length=50)
+    duration_ms = models.FloatField()
+    view_name = models.CharField(max_length=200, blank=True, default='')
+    action = models.CharField(max_length=50, blank=True, default='')
+    # EXPLAIN output for a sample of queries
+    plan = models.TextField(blank=True, default='')
+    full_scan = models.BooleanField(default=False)
+    created_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.duration_ms:.0f} ms: {self.shape[:80]}"
+
+    class Meta:
+        db_table = 'slow_queries'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['fingerprint', 'created_at']),
+        ]
@@ -0,0 +1,161 @@
+"""
+Per-request stack sampling for ``RequestProfilerMiddleware``.
+
+While a request is profiled, a background thread wakes every
+PROFILE_INTERVAL_MS and records the request thread's Python stack, from
+the middleware down through the DRF view, serializers and ORM to
+whatever runs at that moment. Identical stacks are counted, which gives
+the collapsed-stack format (``frame;frame;frame count`` per line) read by
+flamegraph.pl, speedscope and ``render_flamegraph``. Queries on every
+database are counted and timed alongside.
+
+Nothing here runs for requests that are not profiled.
+"""
+import html
+import sys
+import threading
+import time
+import zlib
+from collections import Counter
+from django.db import connections
+
+FRAME_HEIGHT = 16
+
+
+class StackSampler:
+    """Count the stacks of the calling thread every interval seconds until stop()"""
+
+    def __init__(self, interval, root_code=None):
+        self.interval = interval
+        # Frames below root_code (the server and handler plumbing) are left out
+        self.root_code = root_code
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            # stop() may have been called while this thread was waking up
+            if frame is not None and not self._stopped.is_set():
+                self.stacks[self._stack(frame)] += 1
+
+    def _stack(self, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}")
+            if code is self.root_code:
+                break
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+
+class RequestProfiler:
+    """Stack samples, query count and query time of one request"""
+
+    def __init__(self, interval, root_code=None):
+        self.sampler = StackSampler(interval, root_code)
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.seconds = 0.0
+
+    @property
+    def samples(self):
+        return sum(self.sampler.stacks.values())
+
+    def __call__(self, execute, sql, params, many, context):
+        # Database execute wrapper, installed on every connection while profiling
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_seconds += time.perf_counter() - started
+
+    def start(self):
+        self._connections = connections.all()
+        for connection in self._connections:
+            connection.execute_wrappers.append(self)
+        self._started = time.perf_counter()
+        self.sampler.start()
+        return self
+
+    def stop(self):
+        """Stop sampling; returns the collapsed stacks"""
+        self.seconds = time.perf_counter() - self._started
+        stacks = self.sampler.stop()
+        for connection in self._connections:
+            connection.execute_wrappers.remove(self)
+        return collapse(stacks)
+
+
+def collapse(stacks):
+    """Collapsed-stack text of a Counter of stacks"""
+    return '\n'.join(f'{stack} {count}' for stack, count in sorted(stacks.items()))
+
+
+def _tree(collapsed):
+    root = {'samples': 0, 'children': {}}
+    for line in collapsed.splitlines():
+        stack, _, count = line.rpartition(' ')
+        if not stack or not count.isdigit():
+            continue
+        node = root
+        node['samples'] += int(count)
+        for name in stack.split(';'):
+            node = node['children'].setdefault(name, {'samples': 0, 'children': {}})
+            node['samples'] += int(count)
+    return root
+
+
+def _color(name):
+    # Warm colours, stable per function
+    value = zlib.crc32(name.encode())
+    return f'rgb({205 + value % 50},{(value >> 8) % 230},{(value >> 16) % 55})'
+
+
+def render_flamegraph(collapsed, title='', width=1200):
+    """SVG flamegraph of collapsed stacks; hover a frame for its share of the samples"""
+    root = _tree(collapsed)
+    total = root['samples'] or 1
+    frames = []
+
+    def place(node, x, depth):
+        for name, child in sorted(node['children'].items()):
+            frame_width = child['samples'] / total * width
+            if frame_width >= 0.5:
+                frames.append((name, child['samples'], x, depth, frame_width))
+                place(child, x, depth + 1)
+            x += frame_width
+
+    place(root, 0.0, 0)
+    depth = max((frame[3] for frame in frames), default=0) + 1
+    height = depth * FRAME_HEIGHT + 30
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'font-family="monospace" font-size="11">',
+        f'<text x="4" y="16">{html.escape(title)} ({root["samples"]} samples)</text>',
+    ]
+    for name, samples, x, level, frame_width in frames:
+        y = height - (level + 1) * FRAME_HEIGHT
+        label = name if len(name) * 7 <= frame_width - 6 else name[:int((frame_width - 6) / 7) - 2] + '..'
+        parts.append(
+            f'<g><title>{html.escape(name)} ({samples} samples, {samples / total:.1%})</title>'
+            f'<rect x="{x:.1f}" y="{y}" width="{frame_width:.1f}" height="{FRAME_HEIGHT - 1}" '
+            f'fill="{_color(name)}"/>'
+            + (f'<text x="{x + 3:.1f}" y="{y + 11}">{html.escape(label)}</text>' if frame_width > 30 else '')
+            + '</g>'
+        )
+    parts.append('</svg>')
+    return '\n'.join(parts)
@@ -0,0 +1,11 @@
+from rest_framework import serializers
+from .models import RequestProfile
+
+
+class RequestProfileSerializer(serializers.ModelSerializer):
+    """Serializer for profiled requests, without their stacks"""
+
+    class Meta:
+        model = RequestProfile
+        fields = ('id', 'method', 'path', 'view_name', 'status_code', 'user', 'reason', 'duration_ms',
+                  'queries', 'query_ms', 'samples', 'interval_ms', 'created_at')
@@ -0,0 +1,208 @@
+"""
+Slow query log.
+
+With SLOW_QUERY_MS above zero, every database connection gets an execute
+wrapper that times its queries. A query taking at least that long is
+recorded as a SlowQuery with its SQL, its shape (literals and
+placeholders replaced by ``?``, IN lists collapsed) and the view and
+action it ran under (set by ``QueryContextMiddleware``). The first
+occurrence of a shape in each process, and SLOW_QUERY_EXPLAIN_RATE of the
+rest, also get their plan from ``EXPLAIN`` (``EXPLAIN QUERY PLAN`` on
+SQLite) run on the same connection, in a savepoint (or a transaction of
+its own) so a failing EXPLAIN cannot break the caller's transaction.
+Queries that failed are not explained. Plans that read a whole table are
+flagged as full scans.
+
+Records are written to default as soon as no transaction is open there,
+so they never join (or break) the transaction of the code being
+measured; otherwise they wait for the next slow query or the end of the
+request. ``top_queries`` aggregates them per shape for the
+``slow_query_report`` command and the admin report.
+"""
+import hashlib
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Avg, Count, Max, Q, Sum
+from django.utils import timezone
+from .models import SlowQuery
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_VALUES = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_ROWS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+
+# Plan lines that read a whole table
+_FULL_SCAN = {
+    'sqlite': re.compile(r'^\s*SCAN (?!.*\bUSING\b)', re.MULTILINE),
+    'postgresql': re.compile(r'\bSeq Scan on\b'),
+}
+
+# Shapes explained at least once in this process (bounded; cleared when full)
+EXPLAINED_LIMIT = 10000
+
+MAX_SQL_LENGTH = 10000
+MAX_PARAMS_LENGTH = 1000
+
+# (view name, action) of the request being served
+query_context = ContextVar('query_context', default=('', ''))
+
+_local = threading.local()
+_explained = set()
+_last_prune = [0.0]
+
+
+def sql_shape(sql):
+    """sql with literals and placeholders replaced by ? and value lists collapsed"""
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape.replace('%s', '?'))
+    shape = _ROWS.sub('(...), ...', _VALUES.sub('(...)', shape))
+    return ' '.join(shape.split())
+
+
+def fingerprint(shape):
+    return hashlib.sha1(shape.encode()).hexdigest()[:16]
+
+
+@contextmanager
+def _quiet():
+    """Don't time the log's own queries"""
+    _local.busy = True
+    try:
+        yield
+    finally:
+        _local.busy = False
+
+
+def _pending():
+    if not hasattr(_local, 'pending'):
+        _local.pending = []
+    return _local.pending
+
+
+def explain(connection, sql, params):
+    """The query plan of sql on connection, or '' when it cannot be explained"""
+    prefix = 'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+    if connection.needs_rollback:
+        return ''
+    try:
+        with _quiet(), transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            rows = cursor.fetchall()
+    except DatabaseError:
+        return ''
+    if connection.vendor != 'sqlite':
+        return '\n'.join(row[0] for row in rows)
+    # SQLite: (id, parent, notused, detail) rows of a tree
+    depth = {}
+    lines = []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node] + detail)
+    return '\n'.join(lines)
+
+
+class SlowQueryLogger:
+    """Database execute wrapper recording queries slower than SLOW_QUERY_MS"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'busy', False):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        succeeded = False
+        try:
+            result = execute(sql, params, many, context)
+            succeeded = True
+            return result
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            if elapsed >= settings.SLOW_QUERY_MS:
+                self.record(sql, params, many, elapsed, succeeded)
+
+    def record(self, sql, params, many, elapsed, succeeded=True):
+        shape = sql_shape(sql)
+        key = fingerprint(shape)
+        plan = ''
+        if succeeded and not many and sql.lstrip()[:6].upper() in ('SELECT', 'WITH') and (
+                key not in _explained or random.random() < settings.SLOW_QUERY_EXPLAIN_RATE):
+            if len(_explained) >= EXPLAINED_LIMIT:
+                _explained.clear()
+            _explained.add(key)
+            plan = explain(self.connection, sql, params)
+        view_name, action = query_context.get()
+        full_scan = _FULL_SCAN.get(self.connection.vendor)
+        if many and params:
+            params = f'{len(params)} rows, first {params[0]!r}'
+        _pending().append(SlowQuery(
+            fingerprint=key,
+            shape=shape[:MAX_SQL_LENGTH],
+            sql=sql[:MAX_SQL_LENGTH],
+            params=(params if isinstance(params, str) else repr(params))[:MAX_PARAMS_LENGTH],
+            database=self.connection.alias,
+            duration_ms=elapsed,
+            view_name=view_name,
+            action=action,
+            plan=plan,
+            full_scan=bool(plan and full_scan and full_scan.search(plan)),
+            created_at=timezone.now(),
+        ))
+        if not connections['default'].in_atomic_block:
+            flush()
+
+
+def flush(**kwargs):
+    """Write pending slow queries to default (also a request_finished receiver)"""
+    pending = _pending()
+    if not pending or connections['default'].in_atomic_block:
+        return
+    _local.pending = []
+    with _quiet():
+        try:
+            SlowQuery.objects.bulk_create(pending)
+            if time.monotonic() - _last_prune[0] > 3600:
+                _last_prune[0] = time.monotonic()
+                SlowQuery.objects.filter(
+                    created_at__lt=timezone.now() - timedelta(days=settings.SLOW_QUERY_RETENTION_DAYS)
+                ).delete()
+        except DatabaseError:
+            # The log must never fail the code it measures
+            pass
+
+
+def install(connection, **kwargs):
+    """Add the slow query wrapper to a connection (a connection_created receiver)"""
+    if not any(isinstance(wrapper, SlowQueryLogger) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(SlowQueryLogger(connection))
+
+
+def top_queries(since, limit=20, view_name=None, full_scans=False):
+    """The slowest query shapes since a time, by total time, with their views and latest plan"""
+    queries = SlowQuery.objects.filter(created_at__gte=since)
+    if view_name:
+        queries = queries.filter(view_name=view_name)
+    if full_scans:
+        queries = queries.filter(full_scan=True)
+    rows = list(
+        queries.order_by().values('fingerprint').annotate(
+            count=Count('pk'), total_ms=Sum('duration_ms'), avg_ms=Avg('duration_ms'),
+            max_ms=Max('duration_ms'), full_scans=Count('pk', filter=Q(full_scan=True)),
+            shape=Max('shape'), last_seen=Max('created_at'),
+        ).order_by('-total_ms')[:limit]
+    )
+    for row in rows:
+        same_shape = queries.filter(fingerprint=row['fingerprint'])
+        row['views'] = sorted(
+            f'{view} {action}'.strip() or '(no request)'
+            for view, action in same_shape.order_by().values_list('view_name', 'action').distinct()
+        )
+        row['plan'] = same_shape.exclude(plan='').order_by('-created_at').values_list('plan', flat=True).first() or ''
+    return rows
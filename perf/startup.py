@@ -0,0 +1,67 @@
+"""
+Cold-start probe, run in a fresh interpreter by ``startup_profile``.
+
+    python [-X importtime] -m perf.startup worksite.wsgi [--urls] [--memory]
+
+Imports the entry point (which runs django.setup()), optionally loads the
+URLconf the way the first request would, and prints a JSON report on the
+last line of stdout: wall time, peak RSS, module count and, with
+--memory, memory still allocated by each module's code.
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+
+def _module_files():
+    files = {}
+    for name, module in list(sys.modules.items()):
+        path = getattr(module, '__file__', None)
+        if path:
+            files[path] = name
+    return files
+
+
+def main(argv):
+    target = argv[0]
+    trace_memory = '--memory' in argv
+    if trace_memory:
+        tracemalloc.start()
+
+    started = time.perf_counter()
+    __import__(target)
+    imported = time.perf_counter()
+    if '--urls' in argv:
+        from django.urls import get_resolver
+        get_resolver().url_patterns
+    finished = time.perf_counter()
+
+    report = {
+        'import_ms': (imported - started) * 1000,
+        'total_ms': (finished - started) * 1000,
+        'modules': len(sys.modules),
+    }
+    try:
+        import resource
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        scale = 1024 if sys.platform == 'darwin' else 1
+        report['max_rss_kib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    except ImportError:  # Windows
+        report['max_rss_kib'] = None
+
+    if trace_memory:
+        files = _module_files()
+        memory = {}
+        for stat in tracemalloc.take_snapshot().statistics('filename'):
+            name = files.get(stat.traceback[0].filename)
+            if name is not None:
+                memory[name] = memory.get(name, 0) + stat.size
+        tracemalloc.stop()
+        report['memory'] = memory
+
+    print(json.dumps(report))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,26 @@
+"""Small statistics helpers shared by the load and benchmark tools"""
+import math
+
+
+def percentile(sorted_values, pct):
+    """Return the pct-th percentile of an already sorted list (nearest rank)"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies):
+    """Summarize a list of latencies (seconds) into milliseconds"""
+    values = sorted(latencies)
+    if not values:
+        return {'count': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p90_ms': 0.0,
+                'p99_ms': 0.0, 'max_ms': 0.0}
+    return {
+        'count': len(values),
+        'mean_ms': sum(values) / len(values) * 1000,
+        'p50_ms': percentile(values, 50) * 1000,
+        'p90_ms': percentile(values, 90) * 1000,
+        'p99_ms': percentile(values, 99) * 1000,
+        'max_ms': values[-1] * 1000,
+    }
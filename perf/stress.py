@@ -0,0 +1,79 @@
+"""
+Worker process for the stress_hiring command.
+
+Runs in a spawned process so every worker has its own interpreter and
+database connection, and drives the hiring endpoints through the Django
+test client exactly as real requests would.
+"""
+import json
+import os
+import time
+
+
+def run_operations(settings_module, job_id, employer_id, operations, barrier):
+    """Execute (op, worker_id) pairs against one job and return raw samples"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    from django.test.utils import override_settings, setup_test_environment
+    from jobs.models import Application
+    import logging
+
+    logging.getLogger('django.request').setLevel(logging.CRITICAL)
+    setup_test_environment()
+    # Hammering one job is the point here, not something to throttle
+    override_settings(RATE_LIMIT_ENABLED=False).enable()
+    User = get_user_model()
+
+    worker_clients = {}
+    employer_client = Client()
+    employer_client.force_login(User.objects.get(pk=employer_id))
+
+    def client_for(worker_id):
+        if worker_id not in worker_clients:
+            client = Client()
+            client.force_login(User.objects.get(pk=worker_id))
+            worker_clients[worker_id] = client
+        return worker_clients[worker_id]
+
+    # Log everyone in before the barrier so only the hiring calls overlap
+    for op, worker_id in operations:
+        if op == 'apply':
+            client_for(worker_id)
+
+    barrier.wait()
+    samples = []
+    for op, worker_id in operations:
+        started = time.perf_counter()
+        if op == 'apply':
+            response = client_for(worker_id).post(f'/api/jobs/{job_id}/apply/')
+        elif op in ('accept', 'reject'):
+            application_id = (Application.objects.filter(job_id=job_id, worker_id=worker_id)
+                              .values_list('pk', flat=True).first())
+            if application_id is None:
+                samples.append((op, None, 0.0, False))
+                continue
+            response = employer_client.put(
+                '/api/applications/status',
+                json.dumps({'application_id': application_id,
+                            'status': 'accepted' if op == 'accept' else 'rejected'}),
+                content_type='application/json',
+            )
+        else:
+            response = employer_client.delete(f'/api/jobs/{job_id}/applications/{worker_id}')
+        latency = time.perf_counter() - started
+
+        lock_failure = False
+        if response.status_code >= 500:
+            body = response.content.decode(errors='replace').lower()
+            lock_failure = any(marker in body for marker in ('locked', 'deadlock', 'could not serialize', 'busy'))
+        samples.append((op, response.status_code, latency, lock_failure))
+    return samples
+
+
+def collect_operations(queue, *args):
+    """Process entry point: run the operations and hand the samples back"""
+    queue.put(run_operations(*args))
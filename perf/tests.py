@@ -0,0 +1,158 @@
+import json
+import os
+import tempfile
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from accounts.models import User
+from . import slow_queries
+from .management.commands.generate_dataset import DATASET_PASSWORD
+from .management.commands.replay_traffic import Command as ReplayTraffic
+from .models import RequestProfile, SlowQuery
+
+
+@override_settings(TRAFFIC_CAPTURE_RATE=1.0, RATE_LIMIT_ENABLED=False,
+                   PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class TrafficCaptureTests(TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.jsonl')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        patcher = override_settings(TRAFFIC_CAPTURE_FILE=self.path)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def captured(self):
+        with open(self.path, encoding='utf-8') as handle:
+            return [json.loads(line) for line in handle]
+
+    def register(self, email):
+        return self.client.post('/api/auth/register', {
+            'email': email, 'password': 'Secret-pass-91', 'password2': 'Secret-pass-91',
+            'full_name': 'Asha Patil', 'role': 'worker', 'city': 'Pune',
+        }, content_type='application/json')
+
+    def test_personal_data_is_pseudonymised(self):
+        self.assertEqual(self.register('asha@example.org').status_code, 201)
+        self.client.logout()
+        self.register('asha@example.org')
+        first, second = self.captured()
+        raw = json.dumps(first)
+        for value in ('asha@example.org', 'Asha Patil', 'Secret-pass-91'):
+            self.assertNotIn(value, raw)
+        self.assertEqual(first['body']['password'], '[REDACTED]')
+        self.assertEqual(first['body']['city'], 'Pune')
+        # Stable: the same person gets the same pseudonym
+        self.assertEqual(first['body']['email'], second['body']['email'])
+        self.assertTrue(first['body']['email'].endswith('@example.com'))
+
+    def test_sign_ins_record_the_role(self):
+        User.objects.create_user(email='employer@example.com', password='x', full_name='Employer',
+                                 role='employer')
+        self.client.post('/api/auth/login', {'email': 'employer@example.com', 'password': 'x'},
+                         content_type='application/json')
+        [record] = self.captured()
+        self.assertEqual((record['role'], record['signed_in_as']), ('anonymous', 'employer'))
+
+
+class ReplayTrafficTests(TestCase):
+
+    def test_auth_requests_other_than_sign_ins_are_not_replayed(self):
+        records = [
+            {'method': 'POST', 'path': '/api/auth/login', 'route': 'api/auth/login'},
+            {'method': 'POST', 'path': '/api/auth/register', 'route': 'api/auth/register'},
+            {'method': 'POST', 'path': '/api/auth/logout', 'route': 'api/auth/logout'},
+            {'method': 'GET', 'path': '/api/jobs/', 'route': 'api/jobs/'},
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            handle.write(''.join(json.dumps(record) + '\n' for record in records))
+        self.addCleanup(os.remove, handle.name)
+        self.assertEqual([record['path'] for record in ReplayTraffic()._load(handle.name)],
+                         ['/api/auth/login', '/api/jobs/'])
+
+    def test_roles_default_to_dataset_accounts(self):
+        User.objects.create_user(email='employer7@bench.worksite.local', password='x', full_name='Employer 7',
+                                 role='employer')
+        User.objects.create_user(email='worker@example.com', password='x', full_name='Worker', role='worker')
+        self.assertEqual(ReplayTraffic()._dataset_logins(),
+                         {'employer': ('employer7@bench.worksite.local', DATASET_PASSWORD)})
+
+
+@override_settings(PROFILING_ENABLED=True, PROFILE_SAMPLE_RATES={}, PROFILE_INTERVAL_MS=1)
+class RequestProfilerTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(email='admin@example.com', password='x', full_name='Admin',
+                                              role='admin')
+        self.worker = User.objects.create_user(email='worker@example.com', password='x', full_name='Worker',
+                                               role='worker')
+
+    def test_admins_profile_a_request_with_the_header(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/api/jobs/', HTTP_X_PROFILE='1')
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((profile.view_name, profile.reason, profile.status_code), ('job-list', 'header', 200))
+        self.assertGreater(profile.queries, 0)
+
+        response = self.client.get(f'/api/profiles/{profile.pk}.folded')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode(), profile.stacks + '\n')
+
+    def test_the_header_is_ignored_for_everyone_else(self):
+        self.client.force_login(self.worker)
+        response = self.client.get('/api/jobs/', HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.client.get('/api/jobs/')
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILE_SAMPLE_RATES={'job-list': 1.0})
+    def test_sampled_views_are_profiled_for_any_user(self):
+        self.client.force_login(self.worker)
+        response = self.client.get('/api/jobs/')
+        self.assertNotIn('X-Profile-Id', response)
+        self.client.get('/api/applications/my')
+        profile = RequestProfile.objects.get()
+        self.assertEqual((profile.view_name, profile.reason, profile.user), ('job-list', 'sampled', self.worker))
+
+
+@override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_EXPLAIN_RATE=0)
+class SlowQueryLogTests(TransactionTestCase):
+
+    def setUp(self):
+        slow_queries._local.pending = []
+        slow_queries._explained.clear()
+        self.addCleanup(slow_queries._explained.clear)
+
+    def logged(self):
+        return connection.execute_wrapper(slow_queries.SlowQueryLogger(connection))
+
+    def test_queries_in_a_transaction_are_written_after_it(self):
+        with transaction.atomic():
+            with self.logged():
+                list(SlowQuery.objects.filter(params='secret').order_by())
+            self.assertFalse(SlowQuery.objects.exists())
+        slow_queries.flush()
+        query = SlowQuery.objects.get()
+        self.assertIn('"slow_queries"."params" = ?', query.shape)
+        self.assertIn('SCAN', query.plan)
+        self.assertTrue(query.full_scan)
+
+    def test_a_failing_explain_leaves_the_transaction_usable(self):
+        with transaction.atomic():
+            User.objects.create_user(email='worker@example.com', password='x', full_name='Worker',
+                                     role='worker')
+            self.assertEqual(slow_queries.explain(connection, 'SELECT * FROM missing_table', []), '')
+            self.assertFalse(connection.needs_rollback)
+            self.assertEqual(User.objects.count(), 1)
+        self.assertTrue(User.objects.filter(email='worker@example.com').exists())
+
+    def test_failed_queries_are_not_explained(self):
+        with transaction.atomic(), self.logged():
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                connection.cursor().execute('SELECT * FROM missing_table')
+            list(User.objects.all())
+        slow_queries.flush()
+        plans = dict(SlowQuery.objects.values_list('sql', 'plan'))
+        self.assertEqual(plans['SELECT * FROM missing_table'], '')
+        self.assertIn('SCAN', plans[str(User.objects.all().query)])
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    # Request profiles (admin only)
+    path('profiles', views.request_profiles, name='request-profiles'),
+    path('profiles/<int:profile_id>.<slug:fmt>', views.request_profile_stacks, name='request-profile-stacks'),
+    # Rate limit rejections per scope and rule (admin only)
+    path('rate-limits', views.rate_limit_rejections, name='rate-limit-rejections'),
+]
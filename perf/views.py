@@ -0,0 +1,63 @@
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from django.http import HttpResponse
+from accounts.permissions import IsAdmin
+from worksite.ratelimit import rejection_counts
+from .models import RequestProfile
+from .profiling import render_flamegraph
+from .serializers import RequestProfileSerializer
+
+PROFILE_FORMATS = {
+    'svg': 'image/svg+xml',
+    'folded': 'text/plain; charset=utf-8',
+}
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def request_profiles(request):
+    """List profiled requests, newest first, optionally for one view (?view=)"""
+    profiles = RequestProfile.objects.defer('stacks')
+    view_name = request.query_params.get('view')
+    if view_name:
+        profiles = profiles.filter(view_name=view_name)
+    paginator = PageNumberPagination()
+    page = paginator.paginate_queryset(profiles, request)
+    serializer = RequestProfileSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def request_profile_stacks(request, profile_id, fmt):
+    """A profile as an SVG flamegraph or a collapsed-stack file"""
+    if fmt not in PROFILE_FORMATS:
+        return Response({
+            'error': f"Format not found; formats: {', '.join(PROFILE_FORMATS)}"
+        }, status=status.HTTP_404_NOT_FOUND)
+    profile = RequestProfile.objects.filter(pk=profile_id).first()
+    if profile is None:
+        return Response({
+            'error': 'Profile not found'
+        }, status=status.HTTP_404_NOT_FOUND)
+    if fmt == 'svg':
+        title = (f'{profile.method} {profile.path} {profile.status_code}, {profile.duration_ms:.0f} ms, '
+                 f'{profile.queries} queries ({profile.query_ms:.0f} ms)')
+        return HttpResponse(render_flamegraph(profile.stacks, title), content_type=PROFILE_FORMATS[fmt])
+    response = HttpResponse(profile.stacks + '\n', content_type=PROFILE_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="profile-{profile.pk}.folded"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def rate_limit_rejections(request):
+    """Requests rejected with 429 today (or on ?day=, days since the epoch), per scope and rule"""
+    day = request.query_params.get('day')
+    if day is not None and not day.isdigit():
+        return Response({
+            'error': 'day must be a number of days since 1970-01-01'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'rejections': rejection_counts(int(day) if day else None)}, status=status.HTTP_200_OK)
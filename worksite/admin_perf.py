@@ -0,0 +1,71 @@
+"""
+Admin change lists that stay fast on tables with millions of rows.
+
+With ADMIN_PERFORMANCE_MODE on, a PerformanceModeAdmin change list:
+
+- takes its row count from the planner's statistics (see
+  ``worksite.counting``) and only counts exactly below
+  ADMIN_EXACT_COUNT_BELOW rows; the extra unfiltered "(N total)" count
+  is skipped
+- searches with one indexed lookup picked from the shape of the term
+  (id, exact email, or title prefix) instead of OR-ing ``LIKE '%term%'``
+  over every search field
+- leaves out date filters, whose ranges scan the whole table
+
+With it off, the admins behave like stock Django admins.
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.db.models import DateField
+from .counting import EstimatedCountPaginator
+
+
+class PerformanceModeAdmin(admin.ModelAdmin):
+    """ModelAdmin whose change list avoids full-table queries in ADMIN_PERFORMANCE_MODE"""
+
+    # Lookups for the indexed search: 'email' for terms containing '@', 'text'
+    # for anything else; all-digit terms match the primary key
+    indexed_search = {}
+
+    @property
+    def show_full_result_count(self):
+        return not settings.ADMIN_PERFORMANCE_MODE
+
+    @property
+    def search_help_text(self):
+        if not settings.ADMIN_PERFORMANCE_MODE or not self.indexed_search:
+            return None
+        kinds = ['an id']
+        if 'email' in self.indexed_search:
+            kinds.append('an exact email')
+        if 'text' in self.indexed_search:
+            kinds.append('the start of the title')
+        return f"Search by {', '.join(kinds[:-1])} or {kinds[-1]}" if len(kinds) > 1 else 'Search by id'
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        if not settings.ADMIN_PERFORMANCE_MODE:
+            return super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+        return EstimatedCountPaginator(queryset, per_page, orphans, allow_empty_first_page,
+                                       exact_below=settings.ADMIN_EXACT_COUNT_BELOW)
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if not settings.ADMIN_PERFORMANCE_MODE:
+            return list_filter
+        return [
+            name for name in list_filter
+            if not (isinstance(name, str) and isinstance(self.model._meta.get_field(name), DateField))
+        ]
+
+    def get_search_results(self, request, queryset, search_term):
+        if not settings.ADMIN_PERFORMANCE_MODE or not self.indexed_search:
+            return super().get_search_results(request, queryset, search_term)
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=term), False
+        lookup = self.indexed_search.get('email' if '@' in term else 'text')
+        if lookup is None:
+            return queryset.none(), False
+        return queryset.filter(**{lookup: term}), False
@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "worksite.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once apps are loaded; serves /api/events without Django's handler
+from jobs.streams import EventStreamApp  # noqa: E402
+
+application = EventStreamApp(django_application)
@@ -0,0 +1,107 @@
+"""
+Row counts without ``COUNT(*)`` over large tables.
+
+``estimate_count`` asks the database's planner statistics: ``reltuples``
+or the EXPLAIN row estimate on PostgreSQL, ``sqlite_stat1`` (filled in by
+ANALYZE) on SQLite. ``EstimatedCountPaginator`` uses an estimate when it
+is large and counts exactly when it is small or missing, so small result
+sets stay exact. ``CountModePagination`` offers that to API list views as
+``?count=estimated``; a view can supply better estimates (e.g. maintained
+counters) through an ``estimate_count(queryset)`` method.
+"""
+import json
+from functools import partial
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+
+def estimate_count(queryset):
+    """Planner estimate of a queryset's row count, or None when the database has none"""
+    if not isinstance(queryset, QuerySet):
+        return None
+    connection = connections[queryset.db]
+    queryset = queryset.order_by()
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                if not queryset.query.where:
+                    cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                                   [queryset.model._meta.db_table])
+                    row = cursor.fetchone()
+                    # -1 until the table is first vacuumed or analyzed
+                    return row[0] if row and row[0] >= 0 else None
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]['Plan']['Plan Rows'])
+            if connection.vendor == 'sqlite' and not queryset.query.where:
+                # The first number is the table's row count
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                               [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+    except DatabaseError:
+        return None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts an estimate of at least exact_below rows and counts exactly otherwise"""
+
+    def __init__(self, object_list, per_page, orphans=0, allow_empty_first_page=True,
+                 estimate=estimate_count, exact_below=10000):
+        super().__init__(object_list, per_page, orphans, allow_empty_first_page)
+        self.estimate = estimate
+        self.exact_below = exact_below
+        self.count_is_exact = True
+
+    @cached_property
+    def count(self):
+        estimate = self.estimate(self.object_list)
+        if estimate is None or estimate < self.exact_below:
+            return super().count
+        self.count_is_exact = False
+        return estimate
+
+
+class CountModePagination(PageNumberPagination):
+    """Page number pagination with ``?count=estimated``; responses carry count_type"""
+
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get(self.count_query_param) == 'estimated':
+            self.django_paginator_class = partial(
+                EstimatedCountPaginator,
+                estimate=getattr(view, 'estimate_count', estimate_count),
+                exact_below=settings.COUNT_EXACT_BELOW,
+            )
+        else:
+            self.django_paginator_class = Paginator
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        paginator = self.page.paginator
+        return Response({
+            'count': paginator.count,
+            'count_type': 'exact' if getattr(paginator, 'count_is_exact', True) else 'estimated',
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_type'] = {
+            'type': 'string',
+            'enum': ['exact', 'estimated'],
+            'example': 'exact',
+        }
+        return response_schema
@@ -0,0 +1,87 @@
+"""
+Primary/replica database routing.
+
+Reads go to a random replica from REPLICA_DATABASES; writes, row locks
+(select_for_update is routed as a write) and anything read inside a
+transaction on the primary stay on ``default``. After a client writes,
+its reads stick to the primary for REPLICA_PIN_SECONDS so it always sees
+its own changes despite replication lag.
+"""
+import random
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+PRIMARY = 'default'
+PIN_COOKIE = 'db_pin'
+
+# Apps whose tables must always be read from the primary; a session
+# written at login has to be visible on the very next request
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_pinned = ContextVar('db_pinned', default=False)
+_wrote = ContextVar('db_wrote', default=False)
+_replica = ContextVar('db_replica', default=None)
+
+
+class PrimaryReplicaRouter:
+    """Route reads to replicas and writes to the primary"""
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.REPLICA_DATABASES
+        if not replicas or _pinned.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        # One replica per request keeps its reads mutually consistent
+        return _replica.get() or random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        _pinned.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        return db == PRIMARY
+
+
+class ReplicaPinningMiddleware:
+    """
+    Track read-your-writes stickiness per client.
+
+    Unsafe requests read from the primary for their whole duration. A
+    request that wrote sets a short-lived signed cookie, and requests that
+    carry it keep reading from the primary until it expires.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES:
+            raise MiddlewareNotUsed('No read replicas configured')
+        self.get_response = get_response
+        self.replicas = settings.REPLICA_DATABASES
+        self.window = settings.REPLICA_PIN_SECONDS
+
+    def __call__(self, request):
+        pinned = request.method not in ('GET', 'HEAD', 'OPTIONS') or bool(
+            request.get_signed_cookie(PIN_COOKIE, default=None, max_age=self.window)
+        )
+        pinned_token = _pinned.set(pinned)
+        wrote_token = _wrote.set(False)
+        replica_token = _replica.set(random.choice(self.replicas))
+        try:
+            response = self.get_response(request)
+            if _wrote.get():
+                response.set_signed_cookie(PIN_COOKIE, '1', max_age=self.window, httponly=True, samesite='Lax')
+            return response
+        finally:
+            _pinned.reset(pinned_token)
+            _wrote.reset(wrote_token)
+            _replica.reset(replica_token)
@@ -0,0 +1,215 @@
+"""
+Sliding-window rate limiting for the write and auth endpoints.
+
+A view opts in with ``throttle_classes = [SlidingWindowThrottle]`` and a
+scope: ``throttle_scope`` on the view or ``throttle_scopes``
+({action: scope}) on a viewset, or ``@throttle_classes([scoped('login')])``
+on a function view; other views never touch the limiter. RATE_LIMITS
+maps each scope to a per-user and/or per-IP rate such as ``'10/min'``.
+The client IP is REMOTE_ADDR, or the address NUM_PROXIES proxies back in
+X-Forwarded-For when the app runs behind that many; a client-supplied
+X-Forwarded-For is never trusted otherwise.
+
+Each rule is a counter per fixed window in the ``ratelimit`` cache; the
+request count over the last window is estimated from the current count
+plus the previous window's, weighted by how much of it still overlaps.
+Each rule that applies to a request costs one atomic increment (the
+previous window's count is read once per window and remembered). If the shared cache is
+unreachable the limiter falls back to process-local memory rather than
+failing open or shutting the API down.
+
+Rejections are answered with 429 and ``Retry-After``, counted per day,
+scope and rule in the same cache (``rejection_counts`` reads them back,
+for ``GET /api/rate-limits``), and logged to the ``worksite.ratelimit``
+logger with scope, rule and client.
+"""
+import logging
+import math
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger('worksite.ratelimit')
+
+UNITS = {
+    's': 1, 'sec': 1, 'second': 1,
+    'm': 60, 'min': 60, 'minute': 60,
+    'h': 3600, 'hour': 3600,
+    'd': 86400, 'day': 86400,
+}
+
+# Seconds to limit per process after the shared cache fails, before retrying it
+FALLBACK_SECONDS = 30
+
+_fallback = LocMemCache('ratelimit-fallback', {'OPTIONS': {'MAX_ENTRIES': 100000}})
+_fallback_until = 0.0
+
+# Rejection counters are kept this long, so yesterday's can still be read
+REJECTIONS_TIMEOUT = 2 * 86400
+
+# Final counts of closed windows: cache key -> count
+_previous_counts = {}
+_PREVIOUS_COUNTS_MAX = 50000
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60)"""
+    count, _, unit = rate.partition('/')
+    if not count.isdigit() or unit not in UNITS:
+        raise ValueError(f"Invalid rate '{rate}', expected e.g. 10/min or 100/hour")
+    return int(count), UNITS[unit]
+
+
+def _incr(cache, key, timeout):
+    """Atomically count one hit on key, creating it with timeout"""
+    if isinstance(cache, RedisCache):
+        # INCR + EXPIRE pipelined: one round trip whether or not the key exists
+        key = cache.make_and_validate_key(key)
+        pipeline = cache._cache.get_client(key, write=True).pipeline()
+        pipeline.incr(key)
+        pipeline.expire(key, timeout)
+        return pipeline.execute()[0]
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # First hit of the window
+        if cache.add(key, 1, timeout):
+            return 1
+        return cache.incr(key)
+
+
+def _previous_count(cache, key):
+    count = _previous_counts.get(key)
+    if count is None:
+        if len(_previous_counts) >= _PREVIOUS_COUNTS_MAX:
+            _previous_counts.clear()
+        count = _previous_counts[key] = cache.get(key, 0)
+    return count
+
+
+def _count(cache, key, window, index):
+    # Kept two windows, so it can serve as the next window's previous count
+    current = _incr(cache, f'rl:{key}:{index}', 2 * window)
+    return current, _previous_count(cache, f'rl:{key}:{index - 1}')
+
+
+def _shared_cache(now):
+    """The ratelimit cache, or the process-local fallback while it is down"""
+    return _fallback if now < _fallback_until else caches['ratelimit']
+
+
+def _rejections_key(scope, rule, day):
+    return f'rl:rejected:{day}:{scope}:{rule}'
+
+
+def count_rejection(scope, rule, now=None):
+    """Add one to today's rejections for (scope, rule)"""
+    now = time.time() if now is None else now
+    key = _rejections_key(scope, rule, int(now // 86400))
+    try:
+        _incr(_shared_cache(now), key, REJECTIONS_TIMEOUT)
+    except Exception:
+        _incr(_fallback, key, REJECTIONS_TIMEOUT)
+
+
+def rejection_counts(day=None):
+    """Rejections on day (days since the epoch, UTC; default today): {scope: {rule: count}}"""
+    now = time.time()
+    day = int(now // 86400) if day is None else day
+    keys = {
+        _rejections_key(scope, rule, day): (scope, rule)
+        for scope, rules in settings.RATE_LIMITS.items() for rule in rules
+    }
+    try:
+        found = _shared_cache(now).get_many(list(keys))
+    except Exception:
+        found = _fallback.get_many(list(keys))
+    counts = {}
+    for key, (scope, rule) in keys.items():
+        counts.setdefault(scope, {})[rule] = found.get(key, 0)
+    return counts
+
+
+def hit(key, limit, window, now=None):
+    """
+    Count a request against limit per window seconds.
+
+    Returns 0 when allowed, otherwise the seconds until a request would be.
+    """
+    global _fallback_until
+    now = time.time() if now is None else now
+    index, offset = divmod(now, window)
+    index = int(index)
+
+    if now < _fallback_until:
+        current, previous = _count(_fallback, key, window, index)
+    else:
+        try:
+            current, previous = _count(caches['ratelimit'], key, window, index)
+        except Exception:
+            logger.exception('Rate limit cache unavailable, limiting per process for %ss', FALLBACK_SECONDS)
+            _fallback_until = now + FALLBACK_SECONDS
+            current, previous = _count(_fallback, key, window, index)
+
+    overlap = 1 - offset / window
+    if previous * overlap + current <= limit:
+        return 0
+    # Time until the estimate, with no further requests, is back within the limit
+    if current > limit:
+        return (window - offset) + window * (1 - limit / current)
+    return window * (overlap - (limit - current) / previous)
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """Applies the RATE_LIMITS rules of the view's scope; views without one are not limited"""
+
+    scope = None
+
+    def get_scope(self, view):
+        if self.scope:
+            return self.scope
+        scopes = getattr(view, 'throttle_scopes', None)
+        if scopes and getattr(view, 'action', None) in scopes:
+            return scopes[view.action]
+        return getattr(view, 'throttle_scope', None)
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        if not settings.RATE_LIMIT_ENABLED:
+            return True
+        scope = self.get_scope(view)
+        rules = settings.RATE_LIMITS.get(scope) if scope else None
+        if not rules:
+            return True
+
+        for kind, rate in rules.items():
+            if not rate:
+                continue
+            if kind == 'user':
+                if not request.user.is_authenticated:
+                    continue
+                ident = request.user.pk
+            else:
+                ident = self.get_ident(request)
+            limit, window = parse_rate(rate)
+            wait = hit(f'{scope}:{kind}:{ident}', limit, window)
+            if wait:
+                self.retry_after = wait
+                count_rejection(scope, kind)
+                logger.warning(
+                    'Rate limited %s by %s %s (%s)', scope, kind, ident, rate,
+                    extra={'scope': scope, 'rule': kind, 'rate': rate, 'client': str(ident)},
+                )
+                return False
+        return True
+
+    def wait(self):
+        return math.ceil(self.retry_after) if self.retry_after else None
+
+
+def scoped(scope):
+    """SlidingWindowThrottle fixed to one scope, for @throttle_classes on function views"""
+    return type('ScopedSlidingWindowThrottle', (SlidingWindowThrottle,), {'scope': scope})
@@ -0,0 +1,197 @@
+"""
+Prebuilt OpenAPI schema.
+
+Generating the schema introspects every view and serializer, so it is done
+once per code version: at deploy time by ``manage.py build_schema``, or
+lazily by the first request in each process. The rendered JSON/YAML and
+their gzip/brotli variants are then served from memory with an ETag.
+
+Without CODE_VERSION or a git checkout the version is just 'dev', which
+says nothing about the code, so prebuilt files are not used for it.
+"""
+import functools
+import gzip
+import hashlib
+import threading
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.module_loading import import_string
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is always available
+    brotli = None
+
+# drf_spectacular is imported only when the schema is actually generated
+# (or the docs are opened), so it stays out of worker cold starts.
+# format -> (renderer, content type), as served by SpectacularAPIView
+FORMATS = {
+    'yaml': ('drf_spectacular.renderers.OpenApiYamlRenderer', 'application/vnd.oai.openapi; charset=utf-8'),
+    'json': ('drf_spectacular.renderers.OpenApiJsonRenderer', 'application/vnd.oai.openapi+json; charset=utf-8'),
+}
+ENCODINGS = ('br', 'gzip')
+FILE_SUFFIXES = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+# code_version() when the version is unknown
+UNVERSIONED = 'dev'
+
+_cache = {}
+_lock = threading.Lock()
+
+
+@functools.cache
+def code_version():
+    """CODE_VERSION if set, else the checked-out git commit, else UNVERSIONED"""
+    if settings.CODE_VERSION:
+        return settings.CODE_VERSION
+    git_dir = Path(settings.BASE_DIR) / '.git'
+    try:
+        head = (git_dir / 'HEAD').read_text().strip()
+        if head.startswith('ref: '):
+            ref = head[5:]
+            ref_file = git_dir / ref
+            if ref_file.exists():
+                return ref_file.read_text().strip()[:12]
+            for line in (git_dir / 'packed-refs').read_text().splitlines():
+                if line.endswith(' ' + ref):
+                    return line.split()[0][:12]
+            return UNVERSIONED
+        return head[:12]
+    except OSError:
+        return UNVERSIONED
+
+
+def is_unversioned(version):
+    """Whether version is the fallback rather than a real (or explicitly set) code version"""
+    return version == UNVERSIONED and not settings.CODE_VERSION
+
+
+def render_schema():
+    """Generate the schema once and render it in every format"""
+    from drf_spectacular.settings import spectacular_settings
+    
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    return {
+        fmt: import_string(renderer)().render(schema, renderer_context={})
+        for fmt, (renderer, _) in FORMATS.items()
+    }
+
+
+def compress(body):
+    """Body keyed by content encoding"""
+    variants = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(body, quality=11)
+    return variants
+
+
+def schema_path(version, fmt, encoding='identity'):
+    return Path(settings.OPENAPI_SCHEMA_DIR) / f'openapi-{version}.{fmt}{FILE_SUFFIXES[encoding]}'
+
+
+def write_schema(version):
+    """Render and compress every variant into OPENAPI_SCHEMA_DIR; returns the paths written"""
+    Path(settings.OPENAPI_SCHEMA_DIR).mkdir(parents=True, exist_ok=True)
+    written = []
+    for fmt, body in render_schema().items():
+        for encoding, data in compress(body).items():
+            path = schema_path(version, fmt, encoding)
+            path.write_bytes(data)
+            written.append(path)
+    return written
+
+
+def _load(version):
+    """Variants for this version: prebuilt files if present (and versioned), otherwise generated now"""
+    entries = {}
+    rendered = None
+    prebuilt = not is_unversioned(version)
+    for fmt in FORMATS:
+        path = schema_path(version, fmt)
+        if prebuilt and path.exists():
+            variants = {'identity': path.read_bytes()}
+            for encoding in ENCODINGS:
+                compressed = schema_path(version, fmt, encoding)
+                if compressed.exists():
+                    variants[encoding] = compressed.read_bytes()
+        else:
+            if rendered is None:
+                rendered = render_schema()
+            variants = compress(rendered[fmt])
+        digest = hashlib.sha256(variants['identity']).hexdigest()[:32]
+        entries[fmt] = {
+            encoding: (data, f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"')
+            for encoding, data in variants.items()
+        }
+    return entries
+
+
+def get_schema_variants(version):
+    """Per-process cache; only a new code version causes a rebuild"""
+    entries = _cache.get(version)
+    if entries is None:
+        with _lock:
+            entries = _cache.get(version)
+            if entries is None:
+                entries = _load(version)
+                _cache.clear()
+                _cache[version] = entries
+    return entries
+
+
+def _negotiate_format(request):
+    fmt = request.GET.get('format')
+    if fmt in FORMATS:
+        return fmt
+    return 'json' if 'json' in request.headers.get('Accept', '') else 'yaml'
+
+
+def _negotiate_encoding(request, available):
+    accepted = {
+        part.split(';')[0].strip()
+        for part in request.headers.get('Accept-Encoding', '').split(',')
+        if not part.strip().endswith(';q=0')
+    }
+    for encoding in ENCODINGS:
+        if encoding in accepted and encoding in available:
+            return encoding
+    return 'identity'
+
+
+@functools.cache
+def _spectacular_view(name, **initkwargs):
+    return import_string(f'drf_spectacular.views.{name}').as_view(**initkwargs)
+
+
+def schema_view(request):
+    """Serve the cached schema; lang/version variants are still generated per request"""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponse(status=405, headers={'Allow': 'GET, HEAD'})
+    if request.GET.get('lang') or request.GET.get('version'):
+        return _spectacular_view('SpectacularAPIView')(request)
+
+    fmt = _negotiate_format(request)
+    variants = get_schema_variants(code_version())[fmt]
+    encoding = _negotiate_encoding(request, variants)
+    body, etag = variants[encoding]
+
+    if_none_match = request.headers.get('If-None-Match', '')
+    if etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type=FORMATS[fmt][1])
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+        title = settings.SPECTACULAR_SETTINGS.get('TITLE') or 'schema'
+        response['Content-Disposition'] = f'inline; filename="{title}.{fmt}"'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, no-cache'
+    patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+    return response
+
+
+def docs_view(request, *args, **kwargs):
+    """Swagger UI, loaded on first use"""
+    return _spectacular_view('SpectacularSwaggerView', url_name='schema')(request, *args, **kwargs)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 from pathlib import Path
 from decouple import config, Csv
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -35,6 +36,8 @@ ALLOWED_HOSTS = config('ALLOWED_HOSTS', default='localhost,127.0.0.1', cast=Csv(
 INSTALLED_APPS = [
     'accounts',
     'jobs',
+    'notifications',
+    'perf',
     "django.contrib.admin",
     "django.contrib.auth",
     "django.contrib.contenttypes",
@@ -48,11 +51,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "worksite.db_router.ReplicaPinningMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "perf.middleware.TrafficCaptureMiddleware",
+    "perf.middleware.RequestProfilerMiddleware",
+    "perf.middleware.QueryContextMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -102,6 +109,71 @@ else:
         }
     }
 
+# SQLite performance profile ('default' or 'production'). The production
+# profile switches to WAL journaling, waits on a busy timeout instead of
+# failing with "database is locked", starts write transactions with
+# BEGIN IMMEDIATE and keeps connections open per worker.
+SQLITE_PROFILE = config('SQLITE_PROFILE', default='default')
+SQLITE_BUSY_TIMEOUT = config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int)  # milliseconds
+SQLITE_PRODUCTION_OPTIONS = {
+    'timeout': SQLITE_BUSY_TIMEOUT / 1000,
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT};'
+        f"PRAGMA mmap_size={config('SQLITE_MMAP_SIZE', default=268435456, cast=int)};"
+        f"PRAGMA cache_size=-{config('SQLITE_CACHE_SIZE_KB', default=65536, cast=int)};"
+        'PRAGMA temp_store=MEMORY'
+    ),
+}
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3' and SQLITE_PROFILE == 'production':
+    DATABASES['default']['OPTIONS'] = SQLITE_PRODUCTION_OPTIONS
+    DATABASES['default']['CONN_MAX_AGE'] = config('DB_CONN_MAX_AGE', default=600, cast=int)
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Read replicas: comma-separated hosts for PostgreSQL, or database files for
+# SQLite (kept in sync locally with `manage.py sync_sqlite_replicas`)
+DB_REPLICAS = config('DB_REPLICAS', default='', cast=Csv())
+REPLICA_DATABASES = []
+for index, replica in enumerate(DB_REPLICAS, start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+        DATABASES[alias]['HOST'] = replica
+    else:
+        DATABASES[alias]['NAME'] = BASE_DIR / replica
+    REPLICA_DATABASES.append(alias)
+
+# Seconds a client keeps reading from the primary after it writes
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+
+# City shards for jobs and applications: extra hosts (PostgreSQL) or database
+# files (SQLite), comma-separated; `default` is always the first shard
+DB_SHARDS = config('DB_SHARDS', default='', cast=Csv())
+JOB_SHARDS = ['default']
+for index, shard in enumerate(DB_SHARDS, start=1):
+    alias = f'shard{index}'
+    DATABASES[alias] = dict(DATABASES['default'])
+    if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+        DATABASES[alias]['HOST'] = shard
+    else:
+        DATABASES[alias]['NAME'] = BASE_DIR / shard
+    JOB_SHARDS.append(alias)
+
+# Cities pinned to a shard, e.g. "Pune=shard1,Mumbai=default"; other cities
+# are spread over the shards by a hash of their name
+SHARD_CITIES = dict(
+    (city.strip(), alias.strip())
+    for city, _, alias in (entry.partition('=') for entry in config('SHARD_CITIES', default='', cast=Csv()))
+)
+
+DATABASE_ROUTERS = (
+    (['worksite.sharding.ShardRouter'] if len(JOB_SHARDS) > 1 else [])
+    + (['worksite.db_router.PrimaryReplicaRouter'] if REPLICA_DATABASES else [])
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -157,6 +229,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # No DEFAULT_THROTTLE_CLASSES: rate limited views set their own (worksite/ratelimit.py)
+    # Proxies in front of the app that append to X-Forwarded-For; per-IP rate
+    # limits use the address the last of them saw (REMOTE_ADDR with 0)
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -171,6 +247,9 @@ CORS_ALLOWED_ORIGINS = config(
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Browser clients may send Idempotency-Key on the hiring writes, and admins X-Profile
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'x-profile')
+
 # CSRF Trusted Origins
 CSRF_TRUSTED_ORIGINS = config(
     'CORS_ALLOWED_ORIGINS',
@@ -190,6 +269,88 @@ EMAIL_PORT = config('EMAIL_PORT', default=587, cast=int)
 EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=True, cast=bool)
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='WorkSite <noreply@worksite.local>')
+
+# Closed jobs untouched this many days move to the archive tables (archive_jobs)
+JOB_ARCHIVE_AFTER_DAYS = config('JOB_ARCHIVE_AFTER_DAYS', default=90, cast=int)
+
+# Most jobs accepted by one POST /api/jobs/bulk
+JOB_BULK_CREATE_LIMIT = config('JOB_BULK_CREATE_LIMIT', default=1000, cast=int)
+
+# Size of each worker's precomputed recommended-jobs list
+RECOMMENDATIONS_PER_WORKER = config('RECOMMENDATIONS_PER_WORKER', default=100, cast=int)
+
+# Cache for employer dashboards. The local-memory default is per process, so
+# with several workers point it at a shared cache (database, Redis, memcached).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    }
+}
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=300, cast=int)  # seconds
+
+# Nested employer/worker blocks in API responses (accounts/fragments.py) are
+# memoized per request; name a cache here to also share them between requests
+USER_FRAGMENT_CACHE = config('USER_FRAGMENT_CACHE', default='')
+USER_FRAGMENT_CACHE_TIMEOUT = config('USER_FRAGMENT_CACHE_TIMEOUT', default=3600, cast=int)  # seconds
+
+# Hours a hiring write's response is replayed for retries with the same Idempotency-Key
+IDEMPOTENCY_KEY_TTL_HOURS = config('IDEMPOTENCY_KEY_TTL_HOURS', default=24, cast=int)
+# Seconds a duplicate waits for the in-flight request with its key before answering 409
+IDEMPOTENCY_WAIT_SECONDS = config('IDEMPOTENCY_WAIT_SECONDS', default=10, cast=float)
+
+# Rate limits per scope (worksite/ratelimit.py): a per-user and/or per-IP
+# sliding window such as '10/min'; an empty rate turns that rule off.
+# Counters live in the 'ratelimit' cache, which needs atomic increments to be
+# shared between workers: Redis or memcached, not the database cache.
+CACHES['ratelimit'] = {
+    'BACKEND': config('RATE_LIMIT_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+    'LOCATION': config('RATE_LIMIT_CACHE_LOCATION', default='ratelimit'),
+}
+RATE_LIMIT_ENABLED = config('RATE_LIMIT_ENABLED', default=True, cast=bool)
+RATE_LIMITS = {
+    'login': {'ip': config('RATE_LIMIT_LOGIN', default='10/min')},
+    'register': {'ip': config('RATE_LIMIT_REGISTER', default='20/hour')},
+    'jobs.apply': {'user': config('RATE_LIMIT_APPLY', default='30/min')},
+    'jobs.create': {'user': config('RATE_LIMIT_JOB_CREATE', default='30/min')},
+    'applications.update': {'user': config('RATE_LIMIT_APPLICATION_UPDATE', default='120/min')},
+}
+
+# Logging: Django's defaults, plus rate limit rejections (one WARNING each,
+# with scope, rule, rate and client as record attributes) on the console
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'worksite.ratelimit': {
+            'handlers': ['console'],
+            'level': config('RATE_LIMIT_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
+# Live events (GET /api/events, ASGI only): events buffered per stream before
+# a slow client is told to resync, idle keep-alive interval, jobs per stream
+EVENTS_QUEUE_SIZE = config('EVENTS_QUEUE_SIZE', default=64, cast=int)
+EVENTS_HEARTBEAT_SECONDS = config('EVENTS_HEARTBEAT_SECONDS', default=20, cast=int)
+EVENTS_MAX_JOBS = config('EVENTS_MAX_JOBS', default=50, cast=int)
+
+# ?count=estimated on list endpoints (worksite/counting.py): listings estimated
+# below COUNT_EXACT_BELOW rows are still counted exactly; job counters older
+# than JOB_COUNTS_MAX_AGE_MINUTES (refresh_job_counts) are not used
+COUNT_EXACT_BELOW = config('COUNT_EXACT_BELOW', default=1000, cast=int)
+JOB_COUNTS_MAX_AGE_MINUTES = config('JOB_COUNTS_MAX_AGE_MINUTES', default=60, cast=int)
+
+# Admin change lists for huge tables (worksite/admin_perf.py), off by default:
+# estimated counts, indexed search only, no date filters. Below
+# ADMIN_EXACT_COUNT_BELOW estimated rows the count is exact.
+ADMIN_PERFORMANCE_MODE = config('ADMIN_PERFORMANCE_MODE', default=False, cast=bool)
+ADMIN_EXACT_COUNT_BELOW = config('ADMIN_EXACT_COUNT_BELOW', default=10000, cast=int)
 
 # API Documentation
 SPECTACULAR_SETTINGS = {
@@ -197,4 +358,33 @@ SPECTACULAR_SETTINGS = {
     'DESCRIPTION': 'Construction Workforce Job Portal API',
     'VERSION': '1.0.0',
     'SERVE_INCLUDE_SCHEMA': False,
-}
\ No newline at end of file
+}
+
+# Prebuilt schema (manage.py build_schema); rebuilt whenever CODE_VERSION
+# changes. Defaults to the checked-out git commit when unset.
+CODE_VERSION = config('CODE_VERSION', default='')
+OPENAPI_SCHEMA_DIR = config('OPENAPI_SCHEMA_DIR', default=str(BASE_DIR / 'openapi'))
+
+# Traffic capture (sampled request shapes for replay_traffic)
+TRAFFIC_CAPTURE_RATE = config('TRAFFIC_CAPTURE_RATE', default=0.0, cast=float)
+TRAFFIC_CAPTURE_FILE = config('TRAFFIC_CAPTURE_FILE', default=str(BASE_DIR / 'requests.jsonl'))
+
+# Request profiling (perf/middleware.py): admins profile a request by sending
+# "X-Profile: 1"; PROFILE_SAMPLE_RATES profiles a share of a view's requests,
+# e.g. "job-list=0.01,my-applications=0.05" ("*" for every other view).
+# Stored profiles are deleted after PROFILE_RETENTION_DAYS.
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=True, cast=bool)
+PROFILE_SAMPLE_RATES = dict(
+    (view.strip(), float(rate))
+    for view, _, rate in (entry.partition('=') for entry in config('PROFILE_SAMPLE_RATES', default='', cast=Csv()))
+)
+PROFILE_INTERVAL_MS = config('PROFILE_INTERVAL_MS', default=5, cast=float)
+PROFILE_RETENTION_DAYS = config('PROFILE_RETENTION_DAYS', default=7, cast=int)
+
+# Slow query log (perf/slow_queries.py), off by default: queries taking at
+# least SLOW_QUERY_MS (0 disables) are stored with their view; the first of
+# each SQL shape per process and SLOW_QUERY_EXPLAIN_RATE of the rest also get
+# their EXPLAIN plan
+SLOW_QUERY_MS = config('SLOW_QUERY_MS', default=0, cast=float)
+SLOW_QUERY_EXPLAIN_RATE = config('SLOW_QUERY_EXPLAIN_RATE', default=0.1, cast=float)
+SLOW_QUERY_RETENTION_DAYS = config('SLOW_QUERY_RETENTION_DAYS', default=7, cast=int)
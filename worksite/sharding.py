@@ -0,0 +1,230 @@
+"""
+City sharding of jobs and applications.
+
+With DB_SHARDS set, jobs are spread over ``default`` and the
+``shard1``..``shardN`` databases by the job's city (copied from the
+employer when it is posted): SHARD_CITIES pins cities to a shard, any
+other city goes to the shard picked by a hash of its name. Applications
+always live with their job. Users, history, the archive, recommendations
+and notifications stay on ``default``.
+
+``ShardRouter`` sends a job or application to the database it was loaded
+from, a new job to its city's shard and a new application to its job's.
+Queries that have no instance to go by run inside ``use_shard`` or
+``shard_transaction``. A listing filtered by city reads one shard; admin
+and global queries (exports, sweepers, a worker's own applications) read
+every shard through ``fan_out``. Relations into users cannot be joined on
+a shard, so ``select_users`` prefetches them from ``default`` instead.
+
+Ids stay unique across shards: new rows take theirs from the ``default``
+database's sequence (``allocate_ids``), and ``locate`` finds the shard
+holding an id, remembering it in the cache.
+
+Without DB_SHARDS there is a single shard, ``default``, and everything
+here reduces to plain single-database behaviour.
+"""
+import zlib
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
+
+PRIMARY = 'default'
+
+# Models stored on the shards, as app_label.model_name
+SHARDED_MODELS = {'jobs.job', 'jobs.application'}
+
+# Seconds a located id is remembered; rebalancing forgets the ids it moves
+LOCATION_TIMEOUT = 24 * 3600
+
+_current = ContextVar('job_shard', default=None)
+
+
+def shards():
+    return settings.JOB_SHARDS
+
+
+def is_sharded():
+    return len(settings.JOB_SHARDS) > 1
+
+
+def is_sharded_model(model):
+    """Whether a model (or model instance) is stored on the shards"""
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def _extra_shard(alias):
+    """alias if it is a shard other than default, else None"""
+    return alias if alias != PRIMARY and alias in settings.JOB_SHARDS else None
+
+
+def shard_for_city(city):
+    """The database a city's jobs belong on"""
+    if not city or not is_sharded():
+        return PRIMARY
+    alias = settings.SHARD_CITIES.get(city)
+    if alias is not None:
+        return alias
+    return settings.JOB_SHARDS[zlib.crc32(city.encode()) % len(settings.JOB_SHARDS)]
+
+
+def shard_of(instance):
+    """The shard a job or application was loaded from or saved to"""
+    return _extra_shard(instance._state.db) or PRIMARY
+
+
+def on_shard(queryset, alias):
+    """queryset on alias; default is left to the other routers, so replicas still serve reads"""
+    return queryset if alias == PRIMARY else queryset.using(alias)
+
+
+def fan_out(queryset):
+    """queryset on every shard (just queryset when there is one)"""
+    if not is_sharded():
+        return [queryset]
+    return [queryset.using(alias) for alias in settings.JOB_SHARDS]
+
+
+def select_users(queryset, *fields):
+    """select_related for relations into users: a join on one database, a prefetch from default across shards"""
+    if not is_sharded():
+        return queryset.select_related(*fields)
+    return queryset.prefetch_related(*fields)
+
+
+def _location_key(model, pk):
+    return f'shard:{model._meta.db_table}:{pk}'
+
+
+def locate(model, pk):
+    """The shard holding model's row pk; default when it is on none"""
+    if not is_sharded() or not str(pk).isdigit():
+        return PRIMARY
+    key = _location_key(model, pk)
+    alias = cache.get(key)
+    if alias in settings.JOB_SHARDS:
+        return alias
+    for alias in settings.JOB_SHARDS:
+        if model._base_manager.using(alias).filter(pk=pk).exists():
+            cache.set(key, alias, LOCATION_TIMEOUT)
+            return alias
+    return PRIMARY
+
+
+def forget_locations(model, pks):
+    cache.delete_many([_location_key(model, pk) for pk in pks])
+
+
+def allocate_ids(model, count=1):
+    """
+    count new primary keys for a sharded model, from the sequence of its
+    table on default. Rows on the other shards never use their own
+    sequences, so ids stay unique wherever rows are created or moved.
+    """
+    table, column = model._meta.db_table, model._meta.pk.column
+    connection = connections[PRIMARY]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+                           [table, column, count])
+            return [row[0] for row in cursor.fetchall()]
+    # SQLite: AUTOINCREMENT never reuses an id at or below sqlite_sequence.seq
+    with transaction.atomic(using=PRIMARY), connection.cursor() as cursor:
+        cursor.execute('UPDATE sqlite_sequence SET seq = seq + %s WHERE name = %s', [count, table])
+        if not cursor.rowcount:
+            cursor.execute(f'INSERT INTO sqlite_sequence (name, seq) SELECT %s, COALESCE(MAX({column}), 0) + %s '
+                           f'FROM {table}', [table, count])
+        cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+        last = cursor.fetchone()[0]
+    return list(range(last - count + 1, last + 1))
+
+
+def reserve_ids(model, up_to):
+    """Move the id sequence on default past up_to, e.g. the highest id found on any shard"""
+    table, column = model._meta.db_table, model._meta.pk.column
+    connection = connections[PRIMARY]
+    with transaction.atomic(using=PRIMARY), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, column])
+            sequence = cursor.fetchone()[0]
+            cursor.execute(f'SELECT setval(%s, GREATEST(%s, last_value)) FROM {sequence}', [sequence, up_to])
+            return
+        cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s', [up_to, table])
+        if not cursor.rowcount:
+            cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, up_to])
+
+
+@contextmanager
+def use_shard(alias):
+    """Route job and application queries that have no instance to go by to alias"""
+    token = _current.set(alias)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def shard_transaction(alias):
+    """
+    use_shard(alias) inside a transaction on alias and, for another shard,
+    one on default for the history, notifications and other rows written
+    alongside. The shard commits first; the two commits are separate, so
+    a crash in between can lose the default side (never the reverse).
+    """
+    with ExitStack() as stack:
+        if alias != PRIMARY:
+            stack.enter_context(transaction.atomic(using=PRIMARY))
+        stack.enter_context(transaction.atomic(using=alias))
+        stack.enter_context(use_shard(alias))
+        yield
+
+
+class ShardRouter:
+    """Route jobs and applications to their shard, and their users to default"""
+
+    def __init__(self):
+        for city, alias in settings.SHARD_CITIES.items():
+            if alias not in settings.JOB_SHARDS:
+                raise ImproperlyConfigured(
+                    f"SHARD_CITIES maps {city} to '{alias}', which is not one of {', '.join(settings.JOB_SHARDS)}"
+                )
+
+    def _route(self, model, instance):
+        if not is_sharded_model(model):
+            # e.g. a job's employer: users only live on default
+            if instance is not None and is_sharded_model(instance) and _extra_shard(instance._state.db):
+                return PRIMARY
+            return None
+        if instance is not None and is_sharded_model(instance):
+            if not instance._state.adding:
+                return _extra_shard(instance._state.db)
+            # A new application goes with its job, a new job to its city's shard
+            for related in instance._state.fields_cache.values():
+                if related is not None and is_sharded_model(related) and not related._state.adding:
+                    return _extra_shard(related._state.db)
+            if _current.get() is None and hasattr(instance, 'city'):
+                return _extra_shard(shard_for_city(instance.city))
+        # default falls through to the replica router (or default itself)
+        return _extra_shard(_current.get())
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Jobs and applications refer to users on default
+        if is_sharded_model(obj1) or is_sharded_model(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Every shard has the whole schema, so migrations and delete cascades
+        # run unchanged there; only jobs and applications hold rows
+        if _extra_shard(db):
+            return True
+        return None
@@ -0,0 +1,102 @@
+import gzip
+import tempfile
+from pathlib import Path
+from unittest import mock
+from django.contrib.sessions.models import Session
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from accounts.models import User
+from . import db_router, schema
+
+
+@override_settings(REPLICA_DATABASES=['replica1'], REPLICA_PIN_SECONDS=5)
+class ReplicaPinningTests(SimpleTestCase):
+    """Reads go to the replica unless the client wrote recently"""
+
+    def setUp(self):
+        self.router = db_router.PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def serve(self, request, write=False):
+        """Run request through the middleware; returns (response, database its reads went to)"""
+        seen = []
+
+        def view(request):
+            if write:
+                self.router.db_for_write(User)
+            seen.append(self.router.db_for_read(User))
+            return HttpResponse()
+
+        response = db_router.ReplicaPinningMiddleware(view)(request)
+        return response, seen[0]
+
+    def test_reads_go_to_the_replica(self):
+        response, database = self.serve(self.factory.get('/api/jobs/'))
+        self.assertEqual(database, 'replica1')
+        self.assertNotIn(db_router.PIN_COOKIE, response.cookies)
+
+    def test_a_write_pins_the_next_reads_to_the_primary(self):
+        response, database = self.serve(self.factory.post('/api/jobs/'), write=True)
+        self.assertEqual(database, db_router.PRIMARY)
+        cookie = response.cookies[db_router.PIN_COOKIE]
+
+        request = self.factory.get('/api/jobs/')
+        request.COOKIES[db_router.PIN_COOKIE] = cookie.value
+        self.assertEqual(self.serve(request)[1], db_router.PRIMARY)
+        # A forged cookie does not pin
+        request = self.factory.get('/api/jobs/')
+        request.COOKIES[db_router.PIN_COOKIE] = '1'
+        self.assertEqual(self.serve(request)[1], 'replica1')
+
+    def test_reads_inside_a_transaction_and_sessions_use_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Session), db_router.PRIMARY)
+        with mock.patch.object(connections[db_router.PRIMARY], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(User), db_router.PRIMARY)
+
+
+class SchemaTests(SimpleTestCase):
+    """GET /api/schema/ served from prebuilt files or memory, with an ETag"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        for version in ('v1', schema.UNVERSIONED):
+            (self.directory / f'openapi-{version}.json').write_bytes(b'{"prebuilt": true}')
+            (self.directory / f'openapi-{version}.yaml').write_bytes(b'prebuilt: true')
+        (self.directory / 'openapi-v1.json.gz').write_bytes(gzip.compress(b'{"prebuilt": true}'))
+        schema._cache.clear()
+        self.addCleanup(schema._cache.clear)
+        self.render = mock.patch('worksite.schema.render_schema',
+                                 return_value={'json': b'{"generated": true}', 'yaml': b'generated: true'}).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def get(self, version, **headers):
+        with override_settings(OPENAPI_SCHEMA_DIR=str(self.directory),
+                               CODE_VERSION='' if version == schema.UNVERSIONED else version), \
+                mock.patch('worksite.schema.code_version', return_value=version):
+            return self.client.get('/api/schema/', {'format': 'json'}, **headers)
+
+    def test_prebuilt_schema_is_served_with_an_etag(self):
+        response = self.get('v1')
+        self.assertEqual(response.content, b'{"prebuilt": true}')
+        self.render.assert_not_called()
+        etag = response['ETag']
+
+        response = self.get('v1', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.content), (304, b''))
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.get('v1', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), b'{"prebuilt": true}')
+        self.assertEqual(response['ETag'], etag[:-1] + '-gzip"')
+
+    def test_the_dev_version_ignores_prebuilt_files(self):
+        response = self.get(schema.UNVERSIONED)
+        self.assertEqual(response.content, b'{"generated": true}')
+        self.render.assert_called_once()
+        # Generated once per process
+        self.assertEqual(self.get(schema.UNVERSIONED).content, b'{"generated": true}')
+        self.render.assert_called_once()
@@ -16,7 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from .schema import docs_view, schema_view
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -24,8 +24,9 @@ urlpatterns = [
     # API endpoints
     path("api/", include('accounts.urls')),
     path("api/", include('jobs.urls')),
+    path("api/", include('perf.urls')),
     
     # API Documentation
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    path('api/schema/', schema_view, name='schema'),
+    path('api/docs/', docs_view, name='swagger-ui'),
 ]